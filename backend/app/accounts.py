@@ -0,0 +1,83 @@
+"""
+Account (lifter) come dimensione dei dati: Workout/ExerciseSet hanno user_id, gli esercizi
+sono condivisi (user_id None) o dell'account che li ha introdotti.
+
+- ogni richiesta lavora su un account: header X-Account-Id (o ?account=), default l'account 1,
+  così il frontend single-user e i DB esistenti funzionano come prima; un id che non esiste
+  (o di un account disattivato) è un 404, mai un account "nuovo" creato al volo
+- ogni account ha la sua chiave API e la sua riga di SyncState; solo l'account di default
+  può usare HEVY_API_KEY del .env (api_key None)
+- backfill_accounts() all'avvio crea l'account di default e assegna a lui le righe senza user_id
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import HEVY_API_KEY
+from app.db import get_db
+from app.models import DEFAULT_ACCOUNT_ID, Account, Exercise, ExerciseSet, Workout
+
+ACCOUNT_HEADER = "X-Account-Id"
+
+
+class UnknownAccount(LookupError):
+    """account inesistente, o senza una chiave API sua"""
+
+
+def current_account(request: Request, db: Session = Depends(get_db)) -> int:
+    """Dipendenza FastAPI: account della richiesta (stessa sessione della route)"""
+    raw = request.headers.get(ACCOUNT_HEADER) or request.query_params.get("account")
+    if not raw:
+        return DEFAULT_ACCOUNT_ID
+    try:
+        account_id = int(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {ACCOUNT_HEADER}")
+    if account_id < 1:
+        raise HTTPException(status_code=400, detail=f"Invalid {ACCOUNT_HEADER}")
+    if account_id != DEFAULT_ACCOUNT_ID:
+        account = db.get(Account, account_id)
+        if account is None or not account.active:
+            raise HTTPException(status_code=404, detail="Account not found")
+    return account_id
+
+
+def api_key_for(user_id: int, account: Optional[Account]) -> str:
+    """Chiave Hevy dell'account: il fallback su HEVY_API_KEY vale solo per l'account di default"""
+    if account is not None and account.api_key:
+        return account.api_key
+    if user_id == DEFAULT_ACCOUNT_ID:
+        return HEVY_API_KEY
+    raise UnknownAccount(f"account {user_id}: inesistente o senza api_key")
+
+
+def visible_exercises(account_id: int):
+    """condizione sul catalogo: esercizi condivisi + quelli dell'account"""
+    return or_(Exercise.user_id.is_(None), Exercise.user_id == account_id)
+
+
+def backfill_accounts(db: Session) -> int:
+    """Crea l'account di default e gli assegna workout/set senza user_id. Ritorna le righe aggiornate."""
+    if db.get(Account, DEFAULT_ACCOUNT_ID) is None:
+        db.add(Account(id=DEFAULT_ACCOUNT_ID, name="default", api_key=None, active=True))
+        db.flush()
+
+    updated = 0
+    for model in (Workout, ExerciseSet):
+        res = db.execute(
+            update(model).where(model.user_id.is_(None)).values(user_id=DEFAULT_ACCOUNT_ID)
+            .execution_options(synchronize_session=False)
+        )
+        updated += res.rowcount or 0
+    db.commit()
+    if updated:
+        print(f"[ACCOUNTS] {updated} righe assegnate all'account {DEFAULT_ACCOUNT_ID}")
+    return updated
+
+
+def active_account_ids(db: Session) -> list[int]:
+    return list(db.execute(select(Account.id).where(Account.active == True).order_by(Account.id)).scalars())  # noqa: E712
@@ -0,0 +1,299 @@
+"""
+Calcoli analitici puri su batch colonnari: niente DB, niente cache; stdlib, più NumPy (opzionale)
+per i trend.
+
+Girano nei processi di app/compute.py: input e output devono essere picklable (array, liste,
+classi di questo modulo) e il modulo leggero da importare. I loop lunghi chiamano checkpoint()
+così un job annullato (timeout, client andato) si ferma presto.
+"""
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.compute import checkpoint
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dipendenza opzionale
+    np = None
+
+CHECK_EVERY = 4096
+
+# trend e1RM (exercise_trends)
+TREND_MIN_SESSIONS = 3  # sotto, niente pendenza né plateau
+PLATEAU_SLOPE_PCT = 0.25  # crescita sotto lo 0,25% dell'e1RM medio a settimana...
+PLATEAU_WEEKS = 4  # ...e nessun PR da almeno 4 settimane
+
+
+def group_for_radar(muscle: str) -> str:
+    m = muscle.lower().strip()
+
+    if m == "petto":
+        return "petto"
+    if m == "schiena":
+        return "schiena"
+    if m == "spalle":
+        return "spalle"
+    if m == "addome":
+        return "addome"
+
+    # BRACCIA
+    if m in {"bicipiti", "tricipiti", "avambracci"}:
+        return "braccia"
+
+    # GAMBE
+    if m in {"quadricipiti", "femorali", "glutei", "polpacci"}:
+        return "gambe"
+
+    # se arriva roba non prevista, ignoriamo
+    return "altro"
+
+
+@dataclass
+class SetBatch:
+    """set aggregati per (workout, esercizio), una colonna per campo; giorni come ordinali"""
+    workout_ids: array = field(default_factory=lambda: array("q"))  # Workout.pk
+    days: array = field(default_factory=lambda: array("l"))
+    masks: List[int] = field(default_factory=list)  # bitmask muscoli (app.muscle_map)
+    sets: array = field(default_factory=lambda: array("l"))
+    reps: array = field(default_factory=lambda: array("q"))
+    tonnage: array = field(default_factory=lambda: array("d"))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+
+class RangeStats:
+    """Accumulatori per un range di date (attuale o precedente)"""
+
+    def __init__(self) -> None:
+        self.workout_masks: Dict[int, int] = {}  # Workout.pk -> OR dei muscoli toccati
+        self.muscles: Dict[str, List[float]] = {}  # muscolo -> [sets, reps, tonnage]
+        self.groups: Dict[str, List[float]] = {}  # gruppo radar -> [sets, reps, tonnage]
+        self.weeks: Dict[str, Dict[str, Dict[str, List[float]]]] = {}  # lunedì ISO -> {"muscles"/"groups": ...}
+
+
+def _add(acc: Dict[str, List[float]], key: str, share: float, sets: int, reps: int, tonnage: float) -> None:
+    v = acc.get(key)
+    if v is None:
+        v = acc[key] = [0.0, 0.0, 0.0]
+    v[0] += sets * share
+    v[1] += reps * share
+    v[2] += tonnage * share
+
+
+def _muscle_names(names: List[str], mask: int) -> List[str]:
+    out = []
+    i = 0
+    while mask:
+        if mask & 1:
+            out.append(names[i])
+        mask >>= 1
+        i += 1
+    return out
+
+
+def aggregate_muscles(
+    batch: SetBatch,
+    names: List[str],
+    ranges: List[Tuple[date, date]],
+    weighting: str = "full",
+) -> List[RangeStats]:
+    """\
+    Statistiche per muscolo e gruppo radar, totali e per settimana ISO, per ogni range [start, end).
+
+    - un muscolo conta max 1 volta per workout (OR delle maschere)
+    - weighting="full": ogni muscolo dell'esercizio prende tutto il volume del set;
+      weighting="split": il volume si divide in parti uguali tra i muscoli
+    """
+    bounds = [(a.toordinal(), b.toordinal()) for a, b in ranges]
+    stats = [RangeStats() for _ in ranges]
+
+    # per ogni maschera: [(muscolo, quota)], {gruppo: quota}
+    mask_info: Dict[int, Tuple[List[Tuple[str, float]], Dict[str, float]]] = {}
+    week_of: Dict[int, str] = {}
+
+    for i in range(len(batch)):
+        if i % CHECK_EVERY == 0:
+            checkpoint()
+        mask = batch.masks[i]
+        if not mask:
+            continue
+
+        info = mask_info.get(mask)
+        if info is None:
+            muscles = _muscle_names(names, mask)
+            share = 1.0 / len(muscles) if weighting == "split" else 1.0
+            groups: Dict[str, float] = {}
+            for m in muscles:
+                g = group_for_radar(m)
+                groups[g] = (groups.get(g, 0.0) + share) if weighting == "split" else 1.0
+            info = mask_info[mask] = ([(m, share) for m in muscles], groups)
+        muscle_shares, group_shares = info
+
+        day = batch.days[i]
+        week = week_of.get(day)
+        if week is None:
+            # l'ordinale 1 (1/1/0001) è un lunedì
+            week = week_of[day] = date.fromordinal(day - (day - 1) % 7).isoformat()
+        pk = batch.workout_ids[i]
+        n_sets, n_reps, tonnage = batch.sets[i], batch.reps[i], batch.tonnage[i]
+
+        for (start_d, end_d), st in zip(bounds, stats):
+            if not (start_d <= day < end_d):
+                continue
+            st.workout_masks[pk] = st.workout_masks.get(pk, 0) | mask
+            wk = st.weeks.get(week)
+            if wk is None:
+                wk = st.weeks[week] = {"muscles": {}, "groups": {}}
+            for m, share in muscle_shares:
+                _add(st.muscles, m, share, n_sets, n_reps, tonnage)
+                _add(wk["muscles"], m, share, n_sets, n_reps, tonnage)
+            for g, share in group_shares.items():
+                _add(st.groups, g, share, n_sets, n_reps, tonnage)
+                _add(wk["groups"], g, share, n_sets, n_reps, tonnage)
+
+    return stats
+
+
+@dataclass
+class BestBatch:
+    """\
+    Miglior e1RM per (esercizio, workout), righe ordinate per esercizio e giorno: ogni esercizio
+    è un segmento contiguo che parte da starts[i]. Giorni come ordinali.
+    """
+    templates: List[str] = field(default_factory=list)
+    starts: array = field(default_factory=lambda: array("q"))
+    days: array = field(default_factory=lambda: array("q"))
+    e1rm: array = field(default_factory=lambda: array("d"))
+
+    def add(self, template_id: str, day: int, e1rm: float) -> None:
+        if not self.templates or self.templates[-1] != template_id:
+            self.templates.append(template_id)
+            self.starts.append(len(self.days))
+        self.days.append(day)
+        self.e1rm.append(e1rm)
+
+
+def _trend_row(
+    template_id: str,
+    best: float,
+    window_best: Optional[float],
+    sessions: int,
+    slope: Optional[float],
+    mean: Optional[float],
+    last_pr: int,
+    last_day: int,
+    today: int,
+) -> Dict[str, Any]:
+    weeks_since_pr = (today - last_pr) // 7
+    pct = slope / mean * 100.0 if slope is not None and mean else None
+    return {
+        "exercise_template_id": template_id,
+        "best_e1rm_kg": round(best, 2),
+        "window_best_e1rm_kg": round(window_best, 2) if window_best is not None else None,
+        "sessions": sessions,
+        "slope_kg_per_week": round(slope, 3) if slope is not None else None,
+        "slope_pct_per_week": round(pct, 3) if pct is not None else None,
+        "last_pr_date": date.fromordinal(last_pr).isoformat(),
+        "weeks_since_pr": weeks_since_pr,
+        "last_session_date": date.fromordinal(last_day).isoformat(),
+        "plateau": pct is not None and pct < PLATEAU_SLOPE_PCT and weeks_since_pr >= PLATEAU_WEEKS,
+    }
+
+
+def _trends_numpy(batch: BestBatch, today: int, since: int) -> List[Dict[str, Any]]:
+    days = np.asarray(batch.days, dtype=np.int64)
+    y = np.asarray(batch.e1rm, dtype=np.float64)
+    starts = np.asarray(batch.starts, dtype=np.int64)
+    n_seg = len(starts)
+    seg = np.repeat(np.arange(n_seg), np.diff(np.append(starts, len(days))))
+
+    # massimo progressivo per segmento in un solo accumulate: e1RM >= 0, quindi spostando ogni
+    # segmento sopra il massimo del precedente il running max non "passa" da un esercizio all'altro
+    shifted = y + seg * (float(y.max()) + 1.0)
+    running = np.maximum.accumulate(shifted)
+    is_pr = np.ones(len(y), dtype=bool)
+    is_pr[1:] = shifted[1:] > running[:-1]
+    is_pr[starts] = True
+    last_pr = np.maximum.reduceat(np.where(is_pr, days, 0), starts)
+    best = np.maximum.reduceat(y, starts)
+    last_day = days[np.append(starts[1:], len(days)) - 1]
+
+    # minimi quadrati per segmento sulla finestra: somme con bincount, x in settimane da oggi
+    w = (days >= since).astype(np.float64)
+    x = (days - today) / 7.0
+    n = np.bincount(seg, weights=w, minlength=n_seg)
+    sx = np.bincount(seg, weights=w * x, minlength=n_seg)
+    sy = np.bincount(seg, weights=w * y, minlength=n_seg)
+    sxx = np.bincount(seg, weights=w * x * x, minlength=n_seg)
+    sxy = np.bincount(seg, weights=w * x * y, minlength=n_seg)
+    den = n * sxx - sx * sx
+    ok = (n >= TREND_MIN_SESSIONS) & (den > 1e-12)
+    slope = np.where(ok, (n * sxy - sx * sy) / np.where(ok, den, 1.0), np.nan)
+    mean = np.where(n > 0, sy / np.maximum(n, 1.0), np.nan)
+    window_best = np.full(n_seg, -np.inf)
+    np.maximum.at(window_best, seg[days >= since], y[days >= since])
+
+    out = []
+    for i, t in enumerate(batch.templates):
+        s = float(slope[i])
+        wb = float(window_best[i])
+        out.append(_trend_row(
+            t, float(best[i]), wb if wb != -np.inf else None, int(n[i]),
+            None if s != s else s, None if not ok[i] else float(mean[i]),
+            int(last_pr[i]), int(last_day[i]), today,
+        ))
+    return out
+
+
+def _trends_python(batch: BestBatch, today: int, since: int) -> List[Dict[str, Any]]:
+    out = []
+    bounds = list(batch.starts) + [len(batch.days)]
+    for i, t in enumerate(batch.templates):
+        if i % 64 == 0:
+            checkpoint()
+        best = -1.0
+        last_pr = 0
+        pts: List[Tuple[float, float]] = []
+        for j in range(bounds[i], bounds[i + 1]):
+            d, v = batch.days[j], batch.e1rm[j]
+            if v > best:
+                best, last_pr = v, d
+            if d >= since:
+                pts.append(((d - today) / 7.0, v))
+        n = len(pts)
+        slope = mean = None
+        if n >= TREND_MIN_SESSIONS:
+            sx = sum(p[0] for p in pts)
+            sy = sum(p[1] for p in pts)
+            den = n * sum(p[0] * p[0] for p in pts) - sx * sx
+            if den > 1e-12:
+                slope = (n * sum(p[0] * p[1] for p in pts) - sx * sy) / den
+                mean = sy / n
+        out.append(_trend_row(
+            t, best, max((p[1] for p in pts), default=None), n, slope, mean,
+            last_pr, batch.days[bounds[i + 1] - 1], today,
+        ))
+    return out
+
+
+def exercise_trends(batch: BestBatch, today: date, weeks: int) -> List[Dict[str, Any]]:
+    """\
+    Per ogni esercizio: pendenza (minimi quadrati) del miglior e1RM per workout nelle ultime
+    `weeks` settimane, miglior e1RM di sempre e della finestra, ultimo PR e flag di plateau.
+
+    Tutti gli esercizi in una passata: con NumPy operazioni per segmento (bincount, reduceat),
+    senza un loop Python per esercizio; senza NumPy lo stesso calcolo in puro Python.
+    """
+    if not batch.templates:
+        return []
+    checkpoint()
+    t = today.toordinal()
+    since = t - weeks * 7 + 1
+    if np is not None:
+        return _trends_numpy(batch, t, since)
+    return _trends_python(batch, t, since)
@@ -0,0 +1,77 @@
+"""
+Cache dei risultati legata alla "generazione" dei dati.
+
+Ogni modifica ai dati (sync con novità, ignore/ripristino, tipo assegnato, muscoli di un
+esercizio cambiati) chiama bump_generation(): le voci calcolate con una generazione
+precedente non vengono più restituite, senza dover sapere quali chiavi invalidare.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.metrics import record_cache
+
+MAX_ENTRIES = 512
+
+_lock = threading.Lock()
+_generation = 0
+_entries: Dict[Hashable, Tuple[int, Any]] = {}
+
+
+def data_generation() -> int:
+    return _generation
+
+
+def bump_generation() -> int:
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+        return _generation
+
+
+def invalidate(*names: str) -> None:
+    """Toglie le voci di queste cache senza cambiare generazione (le altre restano valide)"""
+    with _lock:
+        for k in [k for k in _entries if k[0] in names]:
+            del _entries[k]
+
+
+def _lookup(name: str, full_key: Tuple[str, Hashable], gen: int) -> Tuple[bool, Any]:
+    hit = _entries.get(full_key)
+    if hit is not None and hit[0] == gen:
+        record_cache(name, True)
+        return True, hit[1]
+    record_cache(name, False)
+    return False, None
+
+
+def _store(full_key: Tuple[str, Hashable], gen: int, value: Any) -> None:
+    with _lock:
+        if gen == _generation:  # se nel frattempo i dati sono cambiati non salviamo roba vecchia
+            if len(_entries) >= MAX_ENTRIES:
+                _entries.pop(next(iter(_entries)))
+            _entries[full_key] = (gen, value)
+
+
+def get_or_compute(name: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+    """Ritorna il valore in cache per (name, key) alla generazione corrente, altrimenti lo calcola"""
+    full_key = (name, key)
+    gen = _generation
+    found, value = _lookup(name, full_key, gen)
+    if not found:
+        value = compute()
+        _store(full_key, gen, value)
+    return value
+
+
+async def get_or_compute_async(name: str, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Come get_or_compute, per calcoli asincroni (es. job del pool di app/compute.py)"""
+    full_key = (name, key)
+    gen = _generation
+    found, value = _lookup(name, full_key, gen)
+    if not found:
+        value = await compute()
+        _store(full_key, gen, value)
+    return value
@@ -0,0 +1,260 @@
+"""
+Executor per i calcoli analitici pesanti (CPU), fuori dal processo di uvicorn.
+
+- il job (funzione a livello di modulo) gira in un ProcessPoolExecutor: legge dal DB con una
+  sessione del processo figlio (worker_session, stesso URL dell'engine del server) in batch
+  colonnari e li aggrega con le funzioni pure di app/analytics.py. Lettura e calcolo non
+  tengono il GIL del worker uvicorn, che resta libero per le richieste interattive
+- le cache per generazione (app/cache.py) vivono solo nel processo del server: quello che
+  serve al job (es. la mappa muscoli) si calcola prima e si passa negli argomenti
+- backpressure: al massimo COMPUTE_WORKERS job in esecuzione + COMPUTE_MAX_QUEUE in attesa;
+  oltre si risponde subito 503 con Retry-After invece di accodare all'infinito
+- timeout per richiesta (COMPUTE_TIMEOUT_SECONDS o quello passato a run): 504
+- cancellazione: a timeout o se il client chiude la connessione il job si annulla. Se è ancora
+  in coda non parte; se sta girando, il suo flag condiviso (uno slot per job) lo ferma al
+  prossimo checkpoint() del calcolo
+- COMPUTE_WORKERS=0: i job girano in un thread (stessi limiti), per macchine piccole e debug
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import multiprocessing
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, List, Optional
+
+from fastapi import HTTPException, Request
+
+from app import metrics
+from app.config import COMPUTE_MAX_QUEUE, COMPUTE_TIMEOUT_SECONDS, COMPUTE_WORKERS
+
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class ComputeCancelled(Exception):
+    """sollevata da checkpoint() nel job annullato"""
+
+
+# --- lato worker (processo figlio, o thread con COMPUTE_WORKERS=0) ---
+
+_flags = None  # array condiviso: flag di annullamento per slot
+_job = threading.local()
+_db_url: Optional[str] = None  # None = stesso processo del server (COMPUTE_WORKERS=0)
+_engine = None
+
+
+def _init_worker(flags, db_url: Optional[str] = None) -> None:
+    global _flags, _db_url
+    _flags = flags
+    _db_url = db_url
+
+
+def worker_session():
+    """Sessione DB per i job: engine proprio nel processo figlio, quello del server nel thread"""
+    global _engine
+    from app.db import SessionLocal, get_engine
+
+    if _db_url is None:
+        get_engine()
+        return SessionLocal()
+    if _engine is None:
+        from sqlalchemy import create_engine
+
+        _engine = create_engine(_db_url, pool_size=1, pool_pre_ping=True, pool_recycle=1800)
+        SessionLocal.configure(bind=_engine)
+    return SessionLocal()
+
+
+def _run_job(slot: int, fn: Callable[..., Any], args: tuple) -> Any:
+    _job.slot = slot
+    try:
+        return fn(*args)
+    finally:
+        _job.slot = None
+
+
+def checkpoint() -> None:
+    """Da chiamare ogni tanto nei loop dei calcoli: esce se il job è stato annullato"""
+    slot = getattr(_job, "slot", None)
+    if slot is not None and _flags is not None and _flags[slot]:
+        raise ComputeCancelled()
+
+
+# --- lato server ---
+
+class ComputeExecutor:
+    def __init__(self, workers: int, max_queue: int, timeout: float):
+        self.workers = max(0, workers)
+        self.timeout = timeout
+        self._slots = max(1, self.workers) + max(0, max_queue)
+        self._lock = threading.Lock()
+        self._free: List[int] = list(range(self._slots))
+        self._pool: Optional[Executor] = None
+        self._flags = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._slots - len(self._free)
+
+    def _executor(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.workers > 0:
+                    # spawn: niente fork di un processo con thread (uvicorn, pool DB) e stesso
+                    # comportamento su Linux, macOS e Windows (app desktop)
+                    from app.db import get_engine
+
+                    ctx = multiprocessing.get_context("spawn")
+                    self._flags = ctx.RawArray("b", self._slots)
+                    db_url = get_engine().url.render_as_string(hide_password=False)
+                    self._pool = ProcessPoolExecutor(
+                        self.workers, mp_context=ctx, initializer=_init_worker, initargs=(self._flags, db_url)
+                    )
+                else:
+                    self._flags = [0] * self._slots
+                    _init_worker(self._flags)
+                    self._pool = ThreadPoolExecutor(1, thread_name_prefix="compute")
+            return self._pool
+
+    def warm(self, *modules: str) -> None:
+        """\
+        Avvia i processi in anticipo (all'avvio dell'app) e ci importa i moduli dei job:
+        la prima richiesta non paga spawn e import
+        """
+        pool = self._executor()
+        for _ in range(self.workers):
+            for m in modules:
+                pool.submit(importlib.import_module, m)
+
+    def shutdown(self, pool: Optional[Executor] = None) -> None:
+        """Chiude il pool (o solo `pool`, se è ancora quello attuale); il prossimo job ne crea uno nuovo"""
+        with self._lock:
+            if pool is not None and pool is not self._pool:
+                return
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _take_slot(self, task: str) -> int:
+        with self._lock:
+            if not self._free:
+                metrics.compute_jobs.inc(task=task, result="rejected")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Analytics busy, retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            return self._free.pop()
+
+    def _release(self, slot: int) -> None:
+        with self._lock:
+            self._free.append(slot)
+
+    def _submit(self, pool: Executor, fn: Callable[..., Any], args: tuple) -> tuple[int, Future]:
+        slot = self._take_slot(fn.__name__)
+        self._flags[slot] = 0
+        try:
+            cf: Future = pool.submit(_run_job, slot, fn, args)
+        except Exception:
+            self._release(slot)
+            raise
+        # lo slot si libera quando il job finisce davvero, non quando la richiesta smette di aspettarlo
+        cf.add_done_callback(lambda _: self._release(slot))
+        return slot, cf
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        request: Optional[Request] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Esegue fn(*args) nel pool; fn deve essere una funzione a livello di modulo (picklable)"""
+        pool = self._executor()
+        task = fn.__name__
+        t0 = time.perf_counter()
+        slot, cf = self._submit(pool, fn, args)
+
+        result = "ok"
+        try:
+            waiters = [asyncio.wrap_future(cf)]
+            if request is not None:
+                waiters.append(asyncio.ensure_future(_disconnected(request)))
+            done, pending = await asyncio.wait(
+                waiters, timeout=timeout or self.timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            for p in pending:
+                if p is not waiters[0]:
+                    p.cancel()
+            if waiters[0] in done:
+                return waiters[0].result()
+
+            self._flags[slot] = 1
+            waiters[0].cancel()  # annulla anche cf se non è ancora partito
+            if done:
+                result = "disconnected"
+                raise HTTPException(status_code=499, detail="Client closed request")
+            result = "timeout"
+            raise HTTPException(status_code=504, detail="Analytics computation timed out")
+        except ComputeCancelled:
+            result = "cancelled"
+            raise HTTPException(status_code=499, detail="Computation cancelled")
+        except asyncio.CancelledError:
+            # la richiesta stessa è stata annullata (shutdown, client andato): ferma il job
+            self._flags[slot] = 1
+            cf.cancel()
+            result = "cancelled"
+            raise
+        except HTTPException:
+            raise
+        except BrokenExecutor:
+            # un processo figlio è morto (OOM, kill): pool da rifare, la richiesta si può ripetere
+            result = "error"
+            self.shutdown(pool)
+            raise HTTPException(status_code=503, detail="Analytics worker crashed, retry", headers={"Retry-After": "1"})
+        except Exception:
+            result = "error"
+            raise
+        finally:
+            metrics.compute_jobs.inc(task=task, result=result)
+            metrics.compute_duration.observe(time.perf_counter() - t0, task=task)
+
+    def run_blocking(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """Come run, ma da un thread che può bloccare (warm-up): stessi slot, timeout e metriche"""
+        pool = self._executor()
+        task = fn.__name__
+        t0 = time.perf_counter()
+        slot, cf = self._submit(pool, fn, args)
+
+        result = "ok"
+        try:
+            return cf.result(timeout or self.timeout)
+        except FutureTimeout:
+            self._flags[slot] = 1
+            cf.cancel()
+            result = "timeout"
+            raise
+        except BrokenExecutor:
+            result = "error"
+            self.shutdown(pool)
+            raise
+        except ComputeCancelled:
+            result = "cancelled"
+            raise
+        except Exception:
+            result = "error"
+            raise
+        finally:
+            metrics.compute_jobs.inc(task=task, result=result)
+            metrics.compute_duration.observe(time.perf_counter() - t0, task=task)
+
+
+async def _disconnected(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+compute = ComputeExecutor(COMPUTE_WORKERS, COMPUTE_MAX_QUEUE, COMPUTE_TIMEOUT_SECONDS)
@@ -1,7 +1,6 @@
 import os
-from dotenv import load_dotenv
-
 from pathlib import Path
+
 from dotenv import load_dotenv
 
 ENV_PATH = Path(__file__).resolve().parents[1] / ".env"
@@ -11,10 +10,24 @@ DATABASE_URL = os.getenv("DATABASE_URL", "")
 HEVY_API_KEY = os.getenv("HEVY_API_KEY", "")
 TZ = os.getenv("TZ", "Europe/Rome")
 SYNC_COOLDOWN_SECONDS = int(os.getenv("SYNC_COOLDOWN_SECONDS", "300"))
-
-HEVY_API_KEY = os.getenv("HEVY_API_KEY", "")
-DATABASE_URL = os.getenv("DATABASE_URL", "")
-TZ = os.getenv("TZ", "Europe/Rome")
-SYNC_COOLDOWN_SECONDS = int(os.getenv("SYNC_COOLDOWN_SECONDS", "300"))
-HEVY_BASE_URL = "https://api.hevyapp.com"
+HEVY_BASE_URL = os.getenv("HEVY_BASE_URL", "https://api.hevyapp.com")
 DEFAULT_PAGE_SIZE = 10
+# sync multi-account (app/sync_pool.py): worker concorrenti e richieste/s per account verso Hevy
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "8"))
+SYNC_ACCOUNT_RPS = float(os.getenv("SYNC_ACCOUNT_RPS", "2"))
+# calcoli analitici pesanti in processi separati (app/compute.py): 0 = in un thread
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", "2"))
+COMPUTE_MAX_QUEUE = int(os.getenv("COMPUTE_MAX_QUEUE", "8"))
+COMPUTE_TIMEOUT_SECONDS = float(os.getenv("COMPUTE_TIMEOUT_SECONDS", "30"))
+# precalcolo in background delle viste di default dopo sync e avvio (app/warmup.py)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1").lower() in {"1", "true", "yes"}
+# risposte più grandi di così vengono compresse (gzip), 0 = mai
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+# 9 (default di starlette) costa ~5x il livello 5 per pochi punti di rapporto in più
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+
+# profiling per-request (vedi app/profiling.py)
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0").lower() in {"1", "true", "yes"}
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.1"))
+PROFILE_KEEP_SLOWEST = int(os.getenv("PROFILE_KEEP_SLOWEST", "20"))
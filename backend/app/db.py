@@ -1,32 +1,118 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.config import DATABASE_URL
+from app.metrics import db_pool_checkout_wait
 
 class Base(DeclarativeBase):
     pass
 
 
-from app.config import DATABASE_URL
-print("DB CONNECT URL =", repr(DATABASE_URL))
+# l'engine si crea al primo uso (lifespan o script), non all'import:
+# l'import di app.main resta veloce e senza side effect
+engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+SessionLocal = sessionmaker(autoflush=False, autocommit=False)
+
+def get_engine() -> Engine:
+    global engine
+    if engine is None:
+        with _engine_lock:
+            if engine is None:
+                if not DATABASE_URL:
+                    raise RuntimeError("DATABASE_URL mancante (env o .env)")
+                from app.profiling import install_sql_hooks
+
+                eng = create_engine(
+                    DATABASE_URL,
+                    pool_pre_ping=True,
+                    pool_recycle=1800,
+                )
+                install_sql_hooks(eng)
+                SessionLocal.configure(bind=eng)
+                engine = eng
+    return engine
+
+class WriteGate:
+    """\
+    Scritture sulle tabelle workouts/exercise_sets: condivise tra loro, esclusive col freeze del
+    rebuild (app/rebuild.py), che copia le righe vive nelle tabelle nuove e le scambia.
+    Solo nel processo: la CLI di import gira fuori e non lo vede.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._writers = 0
+        self._frozen = False
 
+    def try_enter(self) -> bool:
+        """Come enter ma senza attendere: False se c'è un freeze in corso"""
+        with self._cond:
+            if self._frozen:
+                return False
+            self._writers += 1
+            return True
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=1800,
-)
+    def enter(self) -> None:
+        with self._cond:
+            while self._frozen:
+                self._cond.wait()
+            self._writers += 1
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    def exit(self) -> None:
+        with self._cond:
+            self._writers -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        self.enter()
+        try:
+            yield
+        finally:
+            self.exit()
+
+    @contextmanager
+    def frozen(self) -> Iterator[None]:
+        """Aspetta la fine delle scritture in corso e blocca le nuove fino all'uscita"""
+        with self._cond:
+            while self._frozen:
+                self._cond.wait()
+            self._frozen = True
+            while self._writers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._frozen = False
+                self._cond.notify_all()
+
+
+live_writes = WriteGate()
 
 def init_db():
     from app import models  # noqa: F401
-    Base.metadata.create_all(bind=engine)
+    from app.migrations import upgrade
+
+    eng = get_engine()
+    Base.metadata.create_all(bind=eng)
+    upgrade(eng)  # colonne/indici nuovi sulle tabelle già esistenti
 
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
+        # checkout esplicito: misura l'attesa sul pool (la prima query l'avrebbe fatto comunque)
+        t0 = time.perf_counter()
+        db.connection()
+        db_pool_checkout_wait.observe(time.perf_counter() - t0)
         yield db
     finally:
         db.close()
-
-
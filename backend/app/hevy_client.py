@@ -1,13 +1,85 @@
+import asyncio
+import time
+from typing import Optional
+
 import httpx
 from app.config import HEVY_API_KEY
+from app.metrics import hevy_api_duration, hevy_api_retries
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Token bucket: al massimo `rate` richieste/s in media, con raffiche fino a `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._last = time.monotonic()
+                self._tokens = 0.0
+            else:
+                self._tokens -= 1
+
 
 class HevyClient:
-    def __init__(self, base_url: str):
+    def __init__(
+        self,
+        base_url: str,
+        max_retries: int = 5,
+        backoff_seconds: float = 0.5,
+        api_key: Optional[str] = None,
+        limiter: Optional[RateLimiter] = None,
+        http: Optional[httpx.AsyncClient] = None,
+    ):
         self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.api_key = api_key or HEVY_API_KEY
+        self.limiter = limiter  # limite per account (pool di sync), None = nessun limite
+        self.retries = 0  # totale retry fatti da questo client (per statistiche sync)
+        self.http = http  # client httpx condiviso (connessioni riusate), None = uno per chiamata
 
     async def get(self, path: str, params: dict):
-        headers = {"api-key": HEVY_API_KEY, "accept": "application/json"}
+        if self.http is not None:
+            return await self._get(self.http, path, params)
         async with httpx.AsyncClient(timeout=30) as client:
+            return await self._get(client, path, params)
+
+    async def _get(self, client: httpx.AsyncClient, path: str, params: dict):
+        headers = {"api-key": self.api_key, "accept": "application/json"}
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            t0 = time.perf_counter()
             resp = await client.get(f"{self.base_url}{path}", headers=headers, params=params)
-            resp.raise_for_status()
-            return resp.json()
+            hevy_api_duration.observe(time.perf_counter() - t0, path=path, status=str(resp.status_code))
+            if resp.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                resp.raise_for_status()
+                return resp.json()
+
+            # 429 / 5xx: aspetta (Retry-After se c'è, altrimenti backoff esponenziale) e riprova
+            attempt += 1
+            self.retries += 1
+            hevy_api_retries.inc(status=str(resp.status_code))
+            await asyncio.sleep(_retry_delay(resp, self.backoff_seconds * 2 ** (attempt - 1)))
+
+
+def _retry_delay(resp: httpx.Response, default: float) -> float:
+    try:
+        return max(0.0, float(resp.headers.get("retry-after", default)))
+    except ValueError:
+        return default
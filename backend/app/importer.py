@@ -0,0 +1,369 @@
+"""
+Import dello storico da un export CSV dell'app Hevy (Profilo > Impostazioni > Esporta dati),
+per il primo caricamento di account con anni di allenamenti senza paginare l'API.
+
+- il file si legge in streaming (csv.DictReader): le righe (una per set) di uno stesso workout
+  sono consecutive e diventano un payload con la stessa forma di quelli dell'API, poi passano
+  per le stesse funzioni di normalizzazione del sync (app.normalizer, firma di similarità)
+- scrittura a blocchi di BATCH_WORKOUTS workout con insert multi-riga e un commit per blocco:
+  in memoria c'è al massimo un blocco, qualunque sia la dimensione del file
+- il CSV non ha id: il workout prende un id deterministico IMPORT_PREFIX + hash(account, titolo, inizio),
+  quindi reimportare lo stesso file non duplica nulla; i template si risolvono per titolo sul
+  catalogo esercizi (i titoli mancanti si aggiungono senza template)
+
+Riconciliazione col sync API (niente doppioni sotto uq_set_key):
+- import dopo il sync: un workout con stesso titolo e inizio (± MATCH_WINDOW) già presente si salta
+- sync dopo l'import: take_imported() toglie il workout importato (e i suoi set) e il sync lo
+  reinserisce con l'id vero, ereditando ignored/tipo; gli esercizi senza template prendono quello
+  dell'API al primo sync che li vede
+
+Uso da riga di comando:
+    python -m app.importer workouts.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
+from typing import IO, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.db import live_writes
+from app.keys import workout_pk
+from app.localtime import LOCAL_TZ, local_date_of
+from app.accounts import visible_exercises
+from app.models import DEFAULT_ACCOUNT_ID, Exercise, ExerciseSet, Workout
+from app.normalizer import (
+    exercise_fields, exercise_sets, iso_to_dt, set_fields, to_float, to_int, workout_exercises, workout_fields,
+)
+from app.similarity import payload_signature
+
+IMPORT_PREFIX = "csv-"
+BATCH_WORKOUTS = 200
+# il CSV ha l'inizio al minuto e in ora locale: margine per il confronto con l'API
+MATCH_WINDOW = timedelta(minutes=2)
+
+REQUIRED_COLUMNS = {"title", "start_time", "exercise_title"}
+# formati di start_time/end_time visti negli export ("17 Jan 2024, 18:03")
+_TIME_FORMATS = ("%d %b %Y, %H:%M", "%d %b %Y %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M")
+LBS_TO_KG = 0.45359237
+MILE_TO_M = 1609.344
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    rows_invalid: int = 0
+    workouts_imported: int = 0
+    workouts_skipped: int = 0
+    sets_imported: int = 0
+    exercises_created: int = 0
+    days: Set[date] = field(default_factory=set, repr=False)
+
+    def as_dict(self) -> dict:
+        out = asdict(self)
+        out.pop("days")
+        return out
+
+
+def _parse_local(v: Optional[str]) -> Optional[datetime]:
+    """orario dell'export (ora locale del telefono, fuso config.TZ) -> datetime aware"""
+    v = (v or "").strip()
+    if not v:
+        return None
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(v, fmt).replace(tzinfo=LOCAL_TZ)
+        except ValueError:
+            pass
+    dt = iso_to_dt(v)
+    if dt is not None and dt.tzinfo is None:
+        dt = dt.replace(tzinfo=LOCAL_TZ)
+    return dt
+
+
+def _set_payload(row: dict) -> dict:
+    weight = to_float(row.get("weight_kg"))
+    if weight is None and to_float(row.get("weight_lbs")) is not None:
+        weight = round(to_float(row.get("weight_lbs")) * LBS_TO_KG, 3)
+    distance = to_float(row.get("distance_km"))
+    distance = distance * 1000 if distance is not None else None
+    if distance is None and to_float(row.get("distance_miles")) is not None:
+        distance = round(to_float(row.get("distance_miles")) * MILE_TO_M, 1)
+    return {
+        "type": (row.get("set_type") or "").strip() or None,
+        "weight_kg": weight,
+        "reps": to_int(row.get("reps")),
+        "distance": distance,
+        "duration_seconds": to_int(row.get("duration_seconds")),
+        "rpe": to_float(row.get("rpe")),
+    }
+
+
+def _workout_payload(row: dict, start: datetime, user_id: int) -> dict:
+    title = (row.get("title") or "").strip()
+    end = _parse_local(row.get("end_time"))
+    key = f"{user_id}|{title}|{start.isoformat()}".encode("utf-8")
+    return {
+        "id": IMPORT_PREFIX + hashlib.sha1(key).hexdigest()[:32],
+        "title": title,
+        "start_time": start.isoformat(),
+        "end_time": end.isoformat() if end else None,
+        "description": row.get("description") or None,
+        "exercises": [],
+        "source": "csv",
+    }
+
+
+def read_hevy_csv(
+    f: IO[str], stats: Optional[ImportStats] = None, user_id: int = DEFAULT_ACCOUNT_ID
+) -> Iterator[dict]:
+    """Payload in forma API, un workout alla volta; le righe senza inizio valido si contano e si saltano"""
+    stats = stats if stats is not None else ImportStats()
+    reader = csv.DictReader(f)
+    missing = REQUIRED_COLUMNS - set(reader.fieldnames or [])
+    if missing:
+        raise ValueError(f"Not a Hevy CSV export: missing columns {sorted(missing)}")
+
+    current: Optional[dict] = None
+    current_key: Optional[Tuple[str, str]] = None
+    last_index = -1
+    for row in reader:
+        stats.rows += 1
+        key = (row.get("title") or "", row.get("start_time") or "")
+        if key != current_key:
+            start = _parse_local(row.get("start_time"))
+            if start is None:
+                stats.rows_invalid += 1
+                continue
+            if current is not None:
+                yield current
+            current, current_key, last_index = _workout_payload(row, start, user_id), key, -1
+
+        ex_title = (row.get("exercise_title") or "").strip()
+        set_index = to_int(row.get("set_index"))
+        exercises = current["exercises"]
+        # nuovo esercizio quando cambia il titolo o l'indice del set riparte
+        if (
+            not exercises
+            or exercises[-1]["title"] != ex_title
+            or (set_index is not None and set_index <= last_index)
+        ):
+            exercises.append({
+                "title": ex_title,
+                "superset_id": to_int(row.get("superset_id")),
+                "notes": row.get("exercise_notes") or None,
+                "sets": [],
+            })
+        exercises[-1]["sets"].append(_set_payload(row))
+        last_index = set_index if set_index is not None else last_index + 1
+    if current is not None:
+        yield current
+
+
+def has_imported(db: Session, user_id: int = DEFAULT_ACCOUNT_ID) -> bool:
+    q = select(Workout.id).where(Workout.user_id == user_id, Workout.id.like(IMPORT_PREFIX + "%")).limit(1)
+    return db.execute(q).first() is not None
+
+
+def take_imported(db: Session, user_id: int, title: str, started: Optional[datetime]) -> Optional[Workout]:
+    """\
+    Workout importato da CSV che corrisponde a uno arrivato dall'API (titolo + inizio): lo cancella
+    con i suoi set e lo ritorna, così il sync lo reinserisce con l'id vero.
+    """
+    if started is None:
+        return None
+    w = db.execute(
+        select(Workout)
+        .where(
+            Workout.user_id == user_id,
+            Workout.title == title,
+            Workout.date.between(started - MATCH_WINDOW, started + MATCH_WINDOW),
+            Workout.id.like(IMPORT_PREFIX + "%"),
+        )
+        .limit(1)
+    ).scalar_one_or_none()
+    if w is None:
+        return None
+    db.execute(delete(ExerciseSet).where(ExerciseSet.workout_id == w.id))
+    db.delete(w)
+    db.flush()
+    return w
+
+
+def _already_present(db: Session, rows: List[dict], user_id: int) -> Set[str]:
+    """id del blocco già nel DB: stesso id (reimport) o stesso titolo/inizio arrivato dall'API"""
+    ids = [r["id"] for r in rows]
+    present = set(db.execute(select(Workout.id).where(Workout.id.in_(ids))).scalars())
+    dated = [r for r in rows if r["date"] is not None]
+    if not dated:
+        return present
+    lo = min(r["date"] for r in dated) - MATCH_WINDOW
+    hi = max(r["date"] for r in dated) + MATCH_WINDOW
+    by_title: Dict[str, List[datetime]] = {}
+    for title, started in db.execute(
+        select(Workout.title, Workout.date).where(
+            Workout.user_id == user_id,
+            Workout.title.in_({r["title"] for r in dated}),
+            Workout.date.between(lo, hi),
+            Workout.id.not_like(IMPORT_PREFIX + "%"),
+        )
+    ):
+        by_title.setdefault(title, []).append(started)
+    for r in dated:
+        if any(abs(r["date"] - d) <= MATCH_WINDOW for d in by_title.get(r["title"], ())):
+            present.add(r["id"])
+    return present
+
+
+def _flush(
+    db: Session,
+    batch: Dict[str, dict],
+    catalog: Dict[str, Tuple[Optional[str], int]],
+    stats: ImportStats,
+    user_id: int,
+) -> None:
+    # template dal catalogo prima della firma: stesse chiavi dei workout arrivati dall'API
+    for payload in batch.values():
+        for ex in workout_exercises(payload):
+            template_id = catalog.get(ex["title"], (None, None))[0]
+            if template_id:
+                ex["exercise_template_id"] = template_id
+
+    workout_rows = []
+    for wid, payload in batch.items():
+        fields = workout_fields(payload)
+        workout_rows.append({
+            "id": wid,
+            "pk": workout_pk(wid, fields["date"]),
+            "user_id": user_id,
+            **fields,
+            "local_date": local_date_of(fields["date"]),
+            "raw_json": json.dumps(payload, ensure_ascii=False),
+            "signature": payload_signature(workout_exercises(payload)),
+        })
+    present = _already_present(db, workout_rows, user_id)
+    workout_rows = [r for r in workout_rows if r["id"] not in present]
+    stats.workouts_skipped += len(present)
+    if not workout_rows:
+        return
+
+    set_rows = []
+    new_titles: Set[str] = set()
+    for r in workout_rows:
+        keys: Set[Tuple[str, int]] = set()
+        for ex in workout_exercises(batch[r["id"]]):
+            ex_title, template_id = exercise_fields(ex)
+            if ex_title and ex_title not in catalog:
+                new_titles.add(ex_title)
+            for idx, s in enumerate(exercise_sets(ex)):
+                # stesso esercizio due volte nel workout: come nel sync vale il primo (uq_set_key)
+                if template_id is not None:
+                    if (template_id, idx + 1) in keys:
+                        continue
+                    keys.add((template_id, idx + 1))
+                set_rows.append({
+                    "workout_id": r["id"],
+                    "workout_pk": r["pk"],
+                    "user_id": user_id,
+                    "exercise_title": ex_title,
+                    "exercise_template_id": template_id,
+                    "set_index": idx + 1,
+                    "raw_json": json.dumps(s, ensure_ascii=False),
+                    **set_fields(s),
+                })
+
+    if new_titles:
+        db.execute(insert(Exercise), [
+            {"user_id": user_id, "exercise_title": t, "exercise_template_id": None} for t in sorted(new_titles)
+        ])
+        catalog.update((t, (None, ex_id)) for t, ex_id in db.execute(
+            select(Exercise.exercise_title, Exercise.id).where(
+                Exercise.user_id == user_id,
+                Exercise.exercise_template_id.is_(None),
+                Exercise.exercise_title.in_(new_titles),
+            )
+        ))
+        stats.exercises_created += len(new_titles)
+    for r in set_rows:
+        r["exercise_id"] = catalog[r["exercise_title"]][1] if r["exercise_title"] else None
+    # insert Core sulle tabelle: executemany diretto, senza il giro per-riga dei bulk insert ORM
+    db.execute(insert(Workout.__table__), workout_rows)
+    if set_rows:
+        db.execute(insert(ExerciseSet.__table__), set_rows)
+    db.commit()
+
+    stats.workouts_imported += len(workout_rows)
+    stats.sets_imported += len(set_rows)
+    stats.days.update(r["local_date"] for r in workout_rows if r["local_date"] is not None)
+
+
+def import_hevy_csv(
+    db: Session, f: IO[str], batch_size: int = BATCH_WORKOUTS, user_id: int = DEFAULT_ACCOUNT_ID
+) -> ImportStats:
+    from app import warmup
+    from app.cache import bump_generation
+    from app.training_load import training_load
+
+    stats = ImportStats()
+    # titolo -> (template_id, id dell'esercizio); template None per gli esercizi noti solo per titolo
+    catalog: Dict[str, Tuple[Optional[str], int]] = {}
+    for title, template_id, ex_id in db.execute(
+        select(Exercise.exercise_title, Exercise.exercise_template_id, Exercise.id).where(visible_exercises(user_id))
+    ):
+        if template_id or title not in catalog:
+            catalog[title] = (template_id, ex_id)
+
+    batch: Dict[str, dict] = {}
+    try:
+        for payload in read_hevy_csv(f, stats, user_id):
+            if payload["id"] in batch:
+                stats.workouts_skipped += 1  # righe dello stesso workout non consecutive
+                continue
+            batch[payload["id"]] = payload
+            if len(batch) >= batch_size:
+                with live_writes.writing():
+                    _flush(db, batch, catalog, stats, user_id)
+                batch = {}
+        if batch:
+            with live_writes.writing():
+                _flush(db, batch, catalog, stats, user_id)
+    finally:
+        # anche se un blocco fallisce, quelli già committati devono invalidare cache e carico
+        if stats.workouts_imported:
+            bump_generation()
+            training_load.mark_dirty(stats.days, user_id)
+            warmup.schedule(user_id, "import")
+    print(f"[IMPORT] {stats.as_dict()}")
+    return stats
+
+
+def import_file(
+    db: Session, path: str, batch_size: int = BATCH_WORKOUTS, user_id: int = DEFAULT_ACCOUNT_ID
+) -> ImportStats:
+    # utf-8-sig: gli export aperti e risalvati con Excel hanno il BOM
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return import_hevy_csv(db, f, batch_size, user_id)
+
+
+def main() -> None:
+    from app.db import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Importa un export CSV di Hevy")
+    parser.add_argument("path")
+    parser.add_argument("--batch", type=int, default=BATCH_WORKOUTS, help="workout per commit")
+    parser.add_argument("--account", type=int, default=DEFAULT_ACCOUNT_ID)
+    args = parser.parse_args()
+
+    init_db()
+    with SessionLocal() as db:
+        import_file(db, args.path, args.batch, args.account)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Chiavi intere di workout ed esercizi sui set, al posto delle stringhe nelle join:
+
+- Workout.pk / ExerciseSet.workout_pk: intero a 63 bit ricavato da inizio e id del workout
+  (workout_pk(): secondi dall'epoch nei 32 bit alti, blake2b dell'id nei 31 bassi). Chi scrive
+  (sync, import CSV, rebuild) lo calcola da sé, senza sequenze né giri sul DB: il pool di sync
+  scrive in parallelo e il rebuild copia le righe com'erano. L'ordine per data tiene vicini
+  nell'indice dei set i workout che si leggono insieme (anni, range), cosa che l'id (UUID di
+  Hevy) non fa. Una collisione (stesso secondo e stesso hash a 31 bit) finirebbe nell'indice
+  unique ix_workouts_pk
+- ExerciseSet.exercise_id: FK su exercises.id, l'esercizio del catalogo a cui il set appartiene
+  (per template, altrimenti per titolo tra quelli visibili all'account)
+
+I router fanno la join set -> workout su workout_pk (indice ix_exercise_sets_workout_pk) invece
+che sulla stringa workout_id. backfill_keys() riempie le colonne all'avvio sui DB esistenti.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import inspect, or_, select, text, update
+from sqlalchemy.orm import Session
+
+BACKFILL_BATCH = 1000
+NO_DATE = (1 << 32) - 1  # workout senza data: in fondo all'indice
+
+
+def workout_pk(workout_id: str, date: Optional[datetime]) -> int:
+    """date come Workout.date (naive UTC); 63 bit, positivo: sta in un BIGINT con segno"""
+    digest = hashlib.blake2b(workout_id.encode("utf-8"), digest_size=4).digest()
+    if date is None:
+        seconds = NO_DATE
+    else:
+        seconds = min(max(int(date.replace(tzinfo=timezone.utc).timestamp()), 0), NO_DATE - 1)
+    return seconds << 31 | int.from_bytes(digest, "big") >> 1
+
+
+def backfill_keys(db: Session) -> int:
+    """Riempie pk / workout_pk / exercise_id dove mancano (DB esistenti). Ritorna le righe aggiornate."""
+    from app.models import Exercise, ExerciseSet, Workout
+
+    updated = 0
+    q = select(Workout.id, Workout.date).where(Workout.pk.is_(None)).order_by(Workout.id)
+    last_id = None
+    while True:
+        page = q if last_id is None else q.where(Workout.id > last_id)
+        rows = db.execute(page.limit(BACKFILL_BATCH)).all()
+        if not rows:
+            break
+        db.execute(update(Workout), [{"id": wid, "pk": workout_pk(wid, d)} for wid, d in rows])
+        updated += len(rows)
+        last_id = rows[-1][0]
+
+    s = ExerciseSet
+    by_template = (
+        select(Exercise.id).where(Exercise.exercise_template_id == s.exercise_template_id).scalar_subquery()
+    )
+    by_title = (
+        select(Exercise.id)
+        .where(
+            Exercise.exercise_template_id.is_(None),
+            Exercise.exercise_title == s.exercise_title,
+            or_(Exercise.user_id == s.user_id, Exercise.user_id.is_(None)),
+        )
+        .limit(1)
+        .scalar_subquery()
+    )
+    for stmt in (
+        update(s).where(s.workout_pk.is_(None)).values(
+            workout_pk=select(Workout.pk).where(Workout.id == s.workout_id).scalar_subquery()
+        ),
+        update(s).where(s.exercise_id.is_(None), s.exercise_template_id.is_not(None)).values(exercise_id=by_template),
+        update(s).where(s.exercise_id.is_(None), s.exercise_template_id.is_(None)).values(exercise_id=by_title),
+    ):
+        updated += db.execute(stmt.execution_options(synchronize_session=False)).rowcount or 0
+    db.commit()
+    if updated:
+        print(f"[KEYS] chiavi intere calcolate per {updated} righe")
+    _require_workout_pk(db)
+    return updated
+
+
+def _require_workout_pk(db: Session) -> None:
+    """\
+    Workout.pk è NOT NULL nel modello ma la migrazione la aggiunge nullable: su MySQL il vincolo
+    si mette qui, a colonna piena (tabella piccola). SQLite non sa cambiarlo con un ALTER: ci
+    arriva col primo rebuild (POST /api/sync?rebuild=true: app/rebuild.py crea le tabelle dal modello)
+    """
+    from app.models import Workout
+
+    bind = db.get_bind()
+    if bind.dialect.name != "mysql":
+        return
+    col = next(c for c in inspect(bind).get_columns(Workout.__tablename__) if c["name"] == "pk")
+    if col["nullable"]:
+        db.execute(text(f"ALTER TABLE {Workout.__tablename__} MODIFY pk BIGINT NOT NULL"))
+        db.commit()
+        print("[KEYS] workouts.pk ora NOT NULL")
@@ -0,0 +1,101 @@
+"""
+Giorni di calendario nel fuso configurato (config.TZ).
+
+Nel DB Workout.date è UTC naive: un allenamento alle 00:30 di Roma cade il giorno prima in UTC.
+Il giorno locale si calcola una volta sola (al sync) e si salva in Workout.local_date (indicizzata):
+filtri per anno/range e raggruppamenti per giorno/mese/settimana lavorano su quella colonna,
+lato SQL, senza convertire ogni riga in Python e senza CONVERT_TZ (che su MySQL vuole le
+tabelle dei fusi caricate e non usa l'indice).
+
+Se TZ cambia, all'avvio backfill_local_dates() ricalcola la colonna per tutti i workout.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.config import TZ
+
+BACKFILL_BATCH = 1000
+
+
+def _load_tz(name: str):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"[TZ] fuso '{name}' non valido, uso UTC")
+        return timezone.utc
+
+
+LOCAL_TZ = _load_tz(TZ)
+
+
+def local_date_of(dt: Optional[datetime]) -> Optional[date]:
+    """datetime UTC (naive o aware) -> giorno di calendario locale"""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(LOCAL_TZ).date()
+
+
+def local_today() -> date:
+    return datetime.now(LOCAL_TZ).date()
+
+
+def year_bounds(year: int) -> tuple[date, date]:
+    """[1 gennaio, 1 gennaio dell'anno dopo) da confrontare con Workout.local_date"""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def week_start(d: date) -> date:
+    """lunedì della settimana ISO"""
+    return d - timedelta(days=d.weekday())
+
+
+def backfill_local_dates(db: Session) -> int:
+    """\
+    Riempie Workout.local_date dove manca (DB esistenti, import diretti) oppure la ricalcola
+    tutta se il fuso è cambiato rispetto all'ultimo backfill. Ritorna i workout aggiornati.
+    """
+    from app.models import SyncState, Workout
+
+    state = db.get(SyncState, 1)
+    if state is None:
+        state = SyncState(id=1, last_sync_ts=None)
+        db.add(state)
+
+    tz_changed = state.local_tz != TZ
+    q = select(Workout.id, Workout.date).where(Workout.date.is_not(None)).order_by(Workout.id)
+    if not tz_changed:
+        q = q.where(Workout.local_date.is_(None))
+
+    updated = 0
+    last_id = None
+    while True:
+        page = q if last_id is None else q.where(Workout.id > last_id)
+        rows = db.execute(page.limit(BACKFILL_BATCH)).all()
+        if not rows:
+            break
+        db.execute(
+            update(Workout),
+            [{"id": wid, "local_date": local_date_of(w_date)} for wid, w_date in rows],
+        )
+        updated += len(rows)
+        last_id = rows[-1][0]
+
+    state.local_tz = TZ
+    db.commit()
+
+    if updated:
+        from app.cache import bump_generation
+        from app.training_load import training_load
+
+        bump_generation()
+        training_load.mark_dirty(None)
+        print(f"[TZ] local_date ricalcolata per {updated} workout ({TZ})")
+    return updated
@@ -1,42 +1,167 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import health, smoke
-from app.routers import sync
-from app.routers import exercises
-from app.routers.exercise_detail import router as exercise_detail_router
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+
+from app.config import GZIP_LEVEL, GZIP_MIN_BYTES, PROFILE_REQUESTS
+from app.metrics import MetricsMiddleware
+from app.responses import FastJSONResponse
+
+_T0 = time.perf_counter()
+
+
+class _Startup:
+    """Stato dell'avvio: router + engine + create_all girano in background dopo il bind"""
+
+    def __init__(self):
+        self.future: asyncio.Future | None = None
+        self.routers_loaded = False
+        self.ready = False
+        self.error: str | None = None
+        self.seconds: float | None = None
+
+
+startup = _Startup()
+
+
+def _include_routers(app: FastAPI) -> None:
+    # import qui dentro: sqlalchemy/modelli/router non pesano sull'import di app.main
+    # (import statici, così PyInstaller li trova comunque)
+    from app.routers import health, smoke, metrics
+    from app.routers import sync
+    from app.routers import exercises
+    from app.routers.exercise_detail import router as exercise_detail_router
+    from app.routers import workouts, ignored, records, dashboard, analysis
+    from app.routers import search, export, imports, accounts, batch
+
+    app.include_router(workouts.router, prefix="/api", tags=["workouts"])
+    app.include_router(ignored.router, prefix="/api", tags=["ignored"])
+    app.include_router(records.router, prefix="/api", tags=["records"])
+    app.include_router(dashboard.router, prefix="/api", tags=["dashboard"])
+    app.include_router(search.router, prefix="/api", tags=["search"])
+    app.include_router(health.router)
+    app.include_router(smoke.router)
+    app.include_router(metrics.router)
+    app.include_router(sync.router)
+    app.include_router(exercises.router)
+    app.include_router(analysis.router)
+    app.include_router(export.router)
+    app.include_router(imports.router)
+    app.include_router(accounts.router)
+    app.include_router(batch.router)
+    app.include_router(exercise_detail_router)
+
 
+def _startup_work(app: FastAPI) -> None:
+    from app.db import SessionLocal, init_db
+    from app.accounts import backfill_accounts
+    from app.compute import compute
+    from app.keys import backfill_keys
+    from app.localtime import backfill_local_dates
+    from app.set_metrics import backfill_set_metrics
+    from app.similarity import backfill_signatures
+    from app.warmup import schedule_startup
 
+    try:
+        if not startup.routers_loaded:
+            _include_routers(app)
+            startup.routers_loaded = True
+        init_db()
+        with SessionLocal() as db:
+            backfill_accounts(db)
+            backfill_keys(db)  # prima di tutto quello che legge i set con le join
+            backfill_local_dates(db)
+            backfill_set_metrics(db)  # prima delle firme, che sommano volume_kg
+            backfill_signatures(db)
+        compute.warm("app.routers.analysis")
+        schedule_startup()  # in background, a bassa priorità: /ready non lo aspetta
+    except Exception as e:
+        startup.error = f"{type(e).__name__}: {e}"
+        raise
+    startup.seconds = time.perf_counter() - _T0
+    startup.ready = True
+    print(f"[STARTUP] ready in {startup.seconds:.2f}s")
 
 
-from app.routers import workouts, ignored, records, dashboard, analysis
-from app.db import init_db
+def _ensure_startup(app: FastAPI) -> asyncio.Future:
+    # (il check sul loop serve per i TestClient, che creano un loop per ogni "with";
+    # se l'avvio è fallito, ad es. DB non ancora su, la richiesta successiva riprova)
+    fut = startup.future
+    if (
+        fut is None
+        or fut.get_loop() is not asyncio.get_running_loop()
+        or (fut.done() and not fut.cancelled() and fut.exception() is not None)
+    ):
+        startup.future = asyncio.get_running_loop().run_in_executor(None, _startup_work, app)
+    return startup.future
 
-app = FastAPI(title="Hevy Analytics API", version="0.1")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # non aspettiamo: il server fa il bind subito e /ready dice quando è tutto pronto
+    if not startup.ready:
+        _ensure_startup(app)
+    yield
+    if startup.ready:
+        from app.compute import compute
+
+        compute.shutdown()
+
+
+class _StartupGate:
+    """Le richieste arrivate prima della fine dell'avvio aspettano invece di prendersi un 404"""
+
+    OPEN_PATHS = {"/ready"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not startup.ready and scope["path"] not in self.OPEN_PATHS:
+            try:
+                await asyncio.shield(_ensure_startup(scope["app"]))
+            except Exception:
+                resp = JSONResponse({"ready": False, "error": startup.error}, status_code=503)
+                await resp(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+app = FastAPI(
+    title="Hevy Analytics API",
+    version="0.1",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
+
+app.add_middleware(_StartupGate)
+if GZIP_MIN_BYTES > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-@app.on_event("startup")
-def on_startup():
-    init_db()
-
-app.include_router(workouts.router, prefix="/api", tags=["workouts"])
-app.include_router(ignored.router, prefix="/api", tags=["ignored"])
-app.include_router(records.router, prefix="/api", tags=["records"])
-app.include_router(dashboard.router, prefix="/api", tags=["dashboard"])
-app.include_router(health.router)
-app.include_router(smoke.router)
-app.include_router(sync.router)
-app.include_router(exercises.router)
-app.include_router(analysis.router)
-app.include_router(exercise_detail_router)
-
-@app.get("/health")
-def health():
-    return {"ok": True}
+if PROFILE_REQUESTS:
+    from app.profiling import ProfilingMiddleware
+
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 
+@app.get("/ready")
+async def ready():
+    # readiness per la shell desktop: 200 solo quando router e DB sono pronti
+    if startup.ready:
+        return {"ready": True, "startup_seconds": round(startup.seconds or 0.0, 3)}
+    if startup.error:
+        _ensure_startup(app)  # es. MySQL non ancora su al primo tentativo: riprova
+    return JSONResponse({"ready": False, "error": startup.error}, status_code=503)
@@ -0,0 +1,297 @@
+"""
+Metriche in formato Prometheus (text exposition 0.0.4), esposte su GET /metrics.
+
+Registry minimale in-process (niente dipendenze): Counter, Gauge e Histogram con label.
+I valori "istantanei" (pool del DB, ritardo del sync) sono calcolati al momento dello scrape.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SYNC_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_fmt_labels(self.label_names, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), fn: Optional[Callable[[], Optional[float]]] = None):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._fn = fn  # se presente, il valore è calcolato allo scrape
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        if self._fn is not None:
+            return self._fn() or 0.0
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        if self._fn is not None:
+            v = self._fn()
+            return self.header() + ([f"{self.name} {_fmt_value(v)}"] if v is not None else [])
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_fmt_labels(self.label_names, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+            counts[i] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = [(k, list(c), self._sums[k]) for k, c in self._counts.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for le, c in zip(self.buckets, counts):
+                cumulative += c
+                le_label = 'le="%s"' % _fmt_value(le)
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.label_names, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.label_names, key)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+_REGISTRY: List[_Metric] = []
+
+
+def _register(m: _Metric):
+    _REGISTRY.append(m)
+    return m
+
+
+def render_all() -> str:
+    lines: List[str] = []
+    for m in _REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- API ---
+
+http_request_duration = _register(Histogram(
+    "hevy_http_request_duration_seconds", "Latenza delle richieste HTTP per route",
+    labels=("method", "route", "status"),
+))
+http_requests_in_progress = _register(Gauge(
+    "hevy_http_requests_in_progress", "Richieste HTTP in corso",
+))
+
+# --- DB pool ---
+
+db_pool_checkout_wait = _register(Histogram(
+    "hevy_db_pool_checkout_wait_seconds", "Attesa per ottenere una connessione dal pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+))
+
+
+def _pool_stat(name: str) -> Callable[[], Optional[float]]:
+    def read() -> Optional[float]:
+        from app import db
+
+        if db.engine is None:  # engine non ancora creato
+            return None
+        fn = getattr(db.engine.pool, name, None)
+        return float(fn()) if callable(fn) else None
+    return read
+
+
+_register(Gauge("hevy_db_pool_size", "Dimensione configurata del pool", fn=_pool_stat("size")))
+_register(Gauge("hevy_db_pool_checked_out", "Connessioni attualmente in uso", fn=_pool_stat("checkedout")))
+_register(Gauge("hevy_db_pool_checked_in", "Connessioni libere nel pool", fn=_pool_stat("checkedin")))
+_register(Gauge("hevy_db_pool_overflow", "Connessioni in overflow oltre pool_size", fn=_pool_stat("overflow")))
+
+# --- sync ---
+
+sync_duration = _register(Histogram(
+    "hevy_sync_duration_seconds", "Durata di full_sync", labels=("result",), buckets=SYNC_BUCKETS,
+))
+sync_pages = _register(Counter("hevy_sync_pages_total", "Pagine /v1/workouts processate"))
+sync_workouts = _register(Counter("hevy_sync_workouts_total", "Workout processati dal sync"))
+sync_sets_seen = _register(Counter("hevy_sync_sets_seen_total", "Set letti dal sync"))
+sync_sets_inserted = _register(Counter("hevy_sync_sets_inserted_total", "Set nuovi inseriti dal sync"))
+sync_rebuild_phase = _register(Histogram(
+    "hevy_sync_rebuild_phase_seconds", "Durata delle fasi del rebuild con tabelle ombra (load, freeze, swap)",
+    labels=("phase",), buckets=SYNC_BUCKETS,
+))
+sync_last_success = _register(Gauge(
+    "hevy_sync_last_success_timestamp_seconds", "Unix time dell'ultimo full_sync completato",
+))
+_register(Gauge(
+    "hevy_sync_seconds_since_last_success", "Secondi dall'ultimo full_sync completato (per alert)",
+    fn=lambda: (time.time() - _last_sync_ok[0]) if _last_sync_ok[0] else None,
+))
+_last_sync_ok: List[float] = [0.0]
+
+
+def mark_sync_success() -> None:
+    now = time.time()
+    _last_sync_ok[0] = now
+    sync_last_success.set(now)
+
+
+# --- Hevy API ---
+
+hevy_api_duration = _register(Histogram(
+    "hevy_api_request_duration_seconds", "Latenza delle chiamate all'API Hevy", labels=("path", "status"),
+))
+hevy_api_retries = _register(Counter(
+    "hevy_api_retries_total", "Retry verso l'API Hevy (429 / 5xx)", labels=("status",),
+))
+
+# --- compute executor (app/compute.py) ---
+
+compute_jobs = _register(Counter(
+    "hevy_compute_jobs_total", "Job analitici nel pool di processi", labels=("task", "result"),
+))
+compute_duration = _register(Histogram(
+    "hevy_compute_duration_seconds", "Durata dei job analitici (attesa in coda compresa)", labels=("task",),
+))
+
+
+def _compute_in_flight() -> Optional[float]:
+    from app.compute import compute
+
+    return float(compute.in_flight)
+
+
+_register(Gauge("hevy_compute_in_flight", "Job analitici in esecuzione o in coda", fn=_compute_in_flight))
+
+# --- cache ---
+
+cache_requests = _register(Counter(
+    "hevy_cache_requests_total", "Lookup nelle cache dei risultati", labels=("cache", "result"),
+))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+warmup_duration = _register(Histogram(
+    "hevy_warmup_duration_seconds", "Durata del warm-up delle viste di default per account",
+    labels=("trigger",),
+))
+warmup_views = _register(Counter(
+    "hevy_warmup_views_total", "Viste precalcolate dal warm-up", labels=("view", "result"),
+))
+
+
+# --- middleware ASGI ---
+
+class MetricsMiddleware:
+    def __init__(self, app):  # noqa: ANN001
+        self.app = app
+
+    async def __call__(self, scope, receive, send):  # noqa: ANN001
+        if scope["type"] != "http" or scope.get("path") == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):  # noqa: ANN001
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_progress.dec()
+            # template della route (es. /api/workouts/{workout_id}), non il path: cardinalità bassa
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - t0,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            )
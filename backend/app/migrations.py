@@ -0,0 +1,65 @@
+"""
+Migrazioni minime per DB già esistenti.
+
+create_all crea le tabelle mancanti ma non tocca quelle che ci sono già: qui si aggiungono
+le colonne e gli indici dichiarati nei modelli e assenti nel DB. Solo colonne nullable
+(o con default lato server), così l'ALTER non fallisce sulle righe esistenti. Gli indici
+tolti dai modelli (OBSOLETE_INDEXES) si cancellano.
+"""
+from __future__ import annotations
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+
+# SQLite: i nomi degli indici sono unici nel DB, il rebuild (app/rebuild.py) costruisce gli indici
+# delle tabelle nuove col suffisso se il nome è ancora preso dalla tabella viva (e viceversa)
+REBUILD_INDEX_SUFFIX = "__r"
+
+# NOT NULL nei modelli ma senza default: sui DB esistenti si aggiungono nullable e le riempie un
+# backfill all'avvio (app/keys.py, che su MySQL poi mette il vincolo; SQLite lo prende al primo rebuild)
+FILLED_AT_STARTUP = {("workouts", "pk")}
+
+# tabella -> indici non più nei modelli
+OBSOLETE_INDEXES = {
+    "exercise_sets": ("ix_exercise_sets_workout_id",),  # coperto da uq_set_key, join su workout_pk
+}
+
+
+def upgrade(engine: Engine) -> None:
+    from app.db import Base
+
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue  # appena creata da create_all: è già completa
+
+            cols = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in cols:
+                    continue
+                if (table.name, col.name) in FILLED_AT_STARTUP:
+                    ddl = f"{col.name} {col.type.compile(dialect=engine.dialect)}"
+                elif not col.nullable and col.server_default is None:
+                    print(f"[MIGRATE] {table.name}.{col.name} NOT NULL senza default: salto")
+                    continue
+                else:
+                    ddl = CreateColumn(col).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                print(f"[MIGRATE] aggiunta colonna {table.name}.{col.name}")
+
+            live_indexes = [i["name"] for i in insp.get_indexes(table.name)]
+            for name in live_indexes:
+                if name.removesuffix(REBUILD_INDEX_SUFFIX) in OBSOLETE_INDEXES.get(table.name, ()):
+                    on = f" ON {table.name}" if engine.dialect.name == "mysql" else ""
+                    conn.exec_driver_sql(f"DROP INDEX {name}{on}")
+                    print(f"[MIGRATE] eliminato indice {name}")
+
+            indexes = {name.removesuffix(REBUILD_INDEX_SUFFIX) for name in live_indexes}
+            for idx in table.indexes:
+                if idx.name not in indexes:
+                    idx.create(conn)
+                    print(f"[MIGRATE] creato indice {idx.name}")
@@ -1,31 +1,57 @@
 from sqlalchemy import (
-    Column, String, Integer, DateTime, Boolean, ForeignKey, Text, Float, UniqueConstraint, BigInteger, SmallInteger, Table
+    Column, String, Integer, Date, DateTime, Boolean, ForeignKey, Text, Float, UniqueConstraint, BigInteger, SmallInteger, Table, Index
 )
 from sqlalchemy.orm import relationship
 from app.db import Base
 
+# SQLite fa autoincrement solo su "INTEGER PRIMARY KEY": BIGINT/SMALLINT li degradiamo
+# (serve per il DB sqlite usato dai benchmark, su MySQL non cambia niente)
+BigIntPK = BigInteger().with_variant(Integer, "sqlite")
+SmallIntPK = SmallInteger().with_variant(Integer, "sqlite")
+
 # --- association tables ---
 exercise_muscles = Table(
     "exercise_muscles",
     Base.metadata,
-    Column("exercise_id", BigInteger, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True),
-    Column("muscle_id", SmallInteger, ForeignKey("muscles.id", ondelete="CASCADE"), primary_key=True),
+    Column("exercise_id", BigIntPK, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True),
+    Column("muscle_id", SmallIntPK, ForeignKey("muscles.id", ondelete="CASCADE"), primary_key=True),
 )
 
 exercise_equipment = Table(
     "exercise_equipment",
     Base.metadata,
-    Column("exercise_id", BigInteger, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True),
-    Column("equipment_id", SmallInteger, ForeignKey("equipment.id", ondelete="CASCADE"), primary_key=True),
+    Column("exercise_id", BigIntPK, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True),
+    Column("equipment_id", SmallIntPK, ForeignKey("equipment.id", ondelete="CASCADE"), primary_key=True),
 )
 
+# account di default: i dati presenti prima del multi-account e le richieste senza account
+DEFAULT_ACCOUNT_ID = 1
+
+
+class Account(Base):
+    """Un lifter (chiave API Hevy). I dati di workout/set sono tutti per account (user_id)."""
+    __tablename__ = "accounts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(255), nullable=False, default="")
+    api_key = Column(String(255), nullable=True)  # None = HEVY_API_KEY del .env
+    active = Column(Boolean, nullable=False, default=True)
+
+
 class Exercise(Base):
     __tablename__ = "exercises"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(BigIntPK, primary_key=True, autoincrement=True)
+    # None = catalogo condiviso (template Hevy usati da più account, esercizi pre multi-account);
+    # altrimenti l'account che lo ha introdotto (esercizi custom, import CSV)
+    user_id = Column(Integer, ForeignKey("accounts.id"), nullable=True)
     exercise_title = Column(String(255), nullable=False)
     exercise_template_id = Column(String(64), nullable=True, unique=True, index=True)
 
+    __table_args__ = (
+        Index("ix_exercises_user_title", "user_id", "exercise_title"),
+    )
+
     muscles = relationship("Muscle", secondary=exercise_muscles, back_populates="exercises", lazy="selectin")
     equipment = relationship("Equipment", secondary=exercise_equipment, back_populates="exercises", lazy="selectin")
 
@@ -33,7 +59,7 @@ class Exercise(Base):
 class Muscle(Base):
     __tablename__ = "muscles"
 
-    id = Column(SmallInteger, primary_key=True, autoincrement=True)
+    id = Column(SmallIntPK, primary_key=True, autoincrement=True)
     name = Column(String(64), nullable=False, unique=True)
 
     exercises = relationship("Exercise", secondary=exercise_muscles, back_populates="muscles", lazy="selectin")
@@ -42,7 +68,7 @@ class Muscle(Base):
 class Equipment(Base):
     __tablename__ = "equipment"
 
-    id = Column(SmallInteger, primary_key=True, autoincrement=True)
+    id = Column(SmallIntPK, primary_key=True, autoincrement=True)
     name = Column(String(64), nullable=False, unique=True)
 
     exercises = relationship("Exercise", secondary=exercise_equipment, back_populates="equipment", lazy="selectin")
@@ -55,24 +81,52 @@ class WorkoutType(Base):
 class Workout(Base):
     __tablename__ = "workouts"
     id = Column(String(64), primary_key=True)  # workout_id/uuid
+    # chiave intera per le join coi set, ricavata da data e id (app/keys.py)
+    # (NOT NULL: per SQLite una unique nullable non identifica il workout, niente GROUP BY su indice)
+    pk = Column(BigInteger, nullable=False, unique=True, index=True)
+    # nullable solo per la migrazione additiva: le righe vecchie le riempie app.accounts all'avvio
+    user_id = Column(Integer, ForeignKey("accounts.id"), nullable=True, default=DEFAULT_ACCOUNT_ID)
     title = Column(String(255), nullable=False, default="")
     date = Column(DateTime, nullable=True)
+    # giorno di calendario nel fuso config.TZ (vedi app/localtime.py)
+    local_date = Column(Date, nullable=True)
     start_time = Column(DateTime, nullable=True)
     end_time = Column(DateTime, nullable=True)
     duration_seconds = Column(Integer, nullable=True)
     ignored = Column(Boolean, nullable=False, default=False)
     raw_json = Column(Text, nullable=True)
+    # firma esercizi {chiave esercizio: [set, volume kg]} per "allenamenti simili" (app/similarity.py)
+    signature = Column(Text, nullable=True)
 
     type_id = Column(Integer, ForeignKey("workout_types.id"), nullable=True)
     type = relationship("WorkoutType")
 
+    # ogni query filtra per account: user_id in testa a tutti gli indici
+    __table_args__ = (
+        # "sessione precedente dello stesso titolo/tipo" (confronto): seek sull'indice
+        Index("ix_workouts_user_title_date", "user_id", "title", "date"),
+        Index("ix_workouts_user_type_date", "user_id", "type_id", "date"),
+        # ordinamento per data senza sort completo (lista workout, export in streaming)
+        Index("ix_workouts_user_date", "user_id", "date"),
+        # filtri/raggruppamenti per giorno locale (dashboard, analisi, carico)
+        Index("ix_workouts_user_local_date", "user_id", "local_date"),
+    )
+
 class ExerciseSet(Base):
     __tablename__ = "exercise_sets"
     id = Column(Integer, primary_key=True, autoincrement=True)
 
-    workout_id = Column(String(64), ForeignKey("workouts.id"), nullable=False, index=True)
+    # niente indice a parte: lo copre uq_set_key (workout_id in testa)
+    workout_id = Column(String(64), ForeignKey("workouts.id"), nullable=False)
+    # chiavi intere (app/keys.py): Workout.pk e l'esercizio del catalogo, per le join.
+    # Indice sul solo workout_pk: a parità di workout le righe escono in ordine di rowid
+    # (con exercise_id dentro le letture dei set saltano avanti e indietro nella tabella)
+    workout_pk = Column(BigInteger, nullable=True, index=True)
+    exercise_id = Column(BigIntPK, ForeignKey("exercises.id"), nullable=True)
+    # copia di Workout.user_id: le query per esercizio non passano dalla join coi workout
+    user_id = Column(Integer, ForeignKey("accounts.id"), nullable=True, default=DEFAULT_ACCOUNT_ID)
     exercise_title = Column(String(255), nullable=False, default="")
-    exercise_template_id = Column(String(64), nullable=True, index=True)
+    exercise_template_id = Column(String(64), nullable=True)
     set_index = Column(Integer, nullable=False)
     reps = Column(Integer, nullable=True)
     weight_kg = Column(Float, nullable=True)
@@ -81,11 +135,23 @@ class ExerciseSet(Base):
     set_type = Column(String(64), nullable=True)
     raw_json = Column(Text, nullable=True)
 
+    # derivate, calcolate al salvataggio (app/set_metrics.py): i router filtrano/sommano in SQL
+    volume_kg = Column(Float, nullable=True)
+    e1rm_kg = Column(Float, nullable=True)
+    is_working_set = Column(Boolean, nullable=True)
+    is_weighted = Column(Boolean, nullable=True)
+
     __table_args__ = (
+        # workout_id è già di un solo account (id Hevy globali)
         UniqueConstraint("workout_id", "exercise_template_id", "set_index", name="uq_set_key"),
+        # per esercizio: record e progressi sui set di lavoro, e1RM già ordinato nell'indice
+        Index("ix_sets_user_template_working", "user_id", "exercise_template_id", "is_working_set", "e1rm_kg"),
     )
 
 class SyncState(Base):
+    """Una riga per account (id = Account.id); local_tz vale solo sulla riga 1 (è globale)"""
     __tablename__ = "sync_state"
-    id = Column(Integer, primary_key=True, default=1)
+    id = Column(Integer, primary_key=True, default=DEFAULT_ACCOUNT_ID)
     last_sync_ts = Column(DateTime, nullable=True)
+    last_error = Column(String(255), nullable=True)  # ultimo sync fallito (None se andato bene)
+    local_tz = Column(String(64), nullable=True)  # fuso usato per Workout.local_date
@@ -0,0 +1,60 @@
+"""
+Mappa esercizio -> muscoli come bitmask (un bit per muscolo), in cache per generazione.
+
+Evita di rifare il join exercises -> exercise_muscles -> muscles per ogni set:
+le query aggregano per exercise_template_id e i muscoli si ricavano dalla maschera.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterator, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.cache import get_or_compute
+from app.models import Exercise, Muscle, exercise_muscles
+
+
+@dataclass(frozen=True)
+class MuscleMap:
+    names: List[str]  # bit i -> nome muscolo (normalizzato lower/strip)
+    mask_by_template: Dict[str, int]  # exercise_template_id -> bitmask
+
+    def mask(self, template_id: str | None) -> int:
+        return self.mask_by_template.get(template_id, 0) if template_id else 0
+
+    def muscles(self, mask: int) -> Iterator[str]:
+        i = 0
+        while mask:
+            if mask & 1:
+                yield self.names[i]
+            mask >>= 1
+            i += 1
+
+
+def _build(db: Session) -> MuscleMap:
+    rows = db.execute(
+        select(Exercise.exercise_template_id, Muscle.name)
+        .join(exercise_muscles, exercise_muscles.c.exercise_id == Exercise.id)
+        .join(Muscle, Muscle.id == exercise_muscles.c.muscle_id)
+        .where(Exercise.exercise_template_id.is_not(None))
+    ).all()
+
+    names: List[str] = []
+    bit: Dict[str, int] = {}
+    masks: Dict[str, int] = {}
+    for template_id, muscle_name in rows:
+        m = str(muscle_name or "").strip().lower()
+        if not m:
+            continue
+        if m not in bit:
+            bit[m] = len(names)
+            names.append(m)
+        masks[template_id] = masks.get(template_id, 0) | (1 << bit[m])
+
+    return MuscleMap(names=names, mask_by_template=masks)
+
+
+def get_muscle_map(db: Session) -> MuscleMap:
+    return get_or_compute("muscle_map", None, lambda: _build(db))
@@ -1,6 +1,8 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any, Optional
 
+from app.set_metrics import set_metrics
+
 def pick(obj: dict, keys: list[str]) -> Any:
     for k in keys:
         if k in obj and obj[k] is not None:
@@ -15,6 +17,12 @@ def iso_to_dt(v: Any) -> Optional[datetime]:
     except Exception:
         return None
 
+def naive_utc(v: Optional[datetime]) -> Optional[datetime]:
+    """datetime aware -> naive in UTC (come finisce nelle colonne DateTime)"""
+    if v is None or v.tzinfo is None:
+        return v
+    return v.astimezone(timezone.utc).replace(tzinfo=None)
+
 def workout_duration_seconds(w: dict) -> Optional[int]:
     s = iso_to_dt(w.get("start_time"))
     e = iso_to_dt(w.get("end_time"))
@@ -22,3 +30,59 @@ def workout_duration_seconds(w: dict) -> Optional[int]:
         sec = int((e - s).total_seconds())
         return max(0, sec)
     return None
+
+def to_int(v: Optional[object]) -> Optional[int]:
+    try:
+        if v is None or v == "":
+            return None
+        return int(float(v))
+    except Exception:
+        return None
+
+def to_float(v: Optional[object]) -> Optional[float]:
+    try:
+        if v is None or v == "":
+            return None
+        return float(v)
+    except Exception:
+        return None
+
+def exercise_fields(ex: dict) -> tuple[str, Optional[str]]:
+    """(titolo, template_id) di un esercizio del payload"""
+    title = pick(ex, ["title", "name", "exercise_title"]) or ""
+    template_id = pick(ex, ["exercise_template_id", "exerciseTemplateId", "template_id", "exercise_id"])
+    return title, (str(template_id) if template_id else None)
+
+def exercise_sets(ex: dict) -> list:
+    return pick(ex, ["sets", "exercise_sets"]) or []
+
+def set_fields(s: dict) -> dict:
+    """colonne di ExerciseSet ricavate da un set del payload (sync API e import CSV)"""
+    set_type = pick(s, ["type", "set_type", "kind"])
+    set_type = str(set_type) if set_type else None
+    reps = to_int(pick(s, ["reps", "rep_count", "repetitions"]))
+    weight_kg = to_float(pick(s, ["weight_kg", "weightKg", "weight", "kg"]))
+    return {
+        "reps": reps,
+        "weight_kg": weight_kg,
+        "distance": to_float(pick(s, ["distance", "distance_m", "meters"])),
+        "duration_seconds": to_int(pick(s, ["duration_seconds", "durationSeconds", "seconds", "duration"])),
+        "set_type": set_type,
+        **set_metrics(weight_kg, reps, set_type),
+    }
+
+def workout_fields(w: dict) -> dict:
+    """colonne di Workout ricavate dal payload (datetime naive UTC come nel DB)"""
+    start_time = iso_to_dt(w.get("start_time"))
+    end_time = iso_to_dt(w.get("end_time"))
+    date = iso_to_dt(pick(w, ["start_time", "startTime", "date", "performed_at", "created_at"])) or end_time
+    return {
+        "title": pick(w, ["title", "name"]) or "",
+        "start_time": naive_utc(start_time),
+        "end_time": naive_utc(end_time),
+        "date": naive_utc(date),
+        "duration_seconds": workout_duration_seconds(w),
+    }
+
+def workout_exercises(w: dict) -> list:
+    return pick(w, ["exercises", "items", "workout_exercises"]) or []
@@ -0,0 +1,260 @@
+"""
+Profiling per-request (opt-in con PROFILE_REQUESTS=1).
+
+Per ogni richiesta misura:
+- tempo totale
+- numero e tempo totale delle query SQL (eventi before/after_cursor_execute sull'engine)
+- righe lette dal DB
+- tempo di serializzazione (dal return dell'endpoint alla risposta pronta)
+
+e li restituisce nell'header `Server-Timing` (visibile nei devtools del browser).
+
+Con PROFILE_DIR impostata, una frazione delle richieste (PROFILE_SAMPLE_RATE) gira sotto
+profiler (pyinstrument se installato, altrimenti cProfile) e su disco restano solo i
+profili delle PROFILE_KEEP_SLOWEST richieste più lente.
+"""
+from __future__ import annotations
+
+import functools
+import heapq
+import inspect
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import PROFILE_DIR, PROFILE_KEEP_SLOWEST, PROFILE_REQUESTS, PROFILE_SAMPLE_RATE
+
+
+@dataclass
+class RequestProfile:
+    started: float = field(default_factory=time.perf_counter)
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    rows: int = 0
+    endpoint_seconds: Optional[float] = None
+    endpoint_done: Optional[float] = None
+
+
+# oggetto mutabile: i thread del threadpool (endpoint sync) vedono lo stesso profilo
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+# --- SQL ---
+
+class _CountingCursor:
+    """Proxy del cursore DBAPI che conta le righe lette"""
+
+    def __init__(self, cursor: Any, profile: RequestProfile):
+        self._cursor = cursor
+        self._profile = profile
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._profile.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._profile.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._profile.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._profile.rows += 1
+            yield row
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+def install_sql_hooks(engine: Engine) -> None:
+    """Registra gli eventi SQL sull'engine (no-op se il profiling è spento)"""
+    if not PROFILE_REQUESTS:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        if _current.get() is not None:
+            conn.info.setdefault("_prof_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        prof = _current.get()
+        stack = conn.info.get("_prof_t0")
+        if prof is None or not stack:
+            return
+        prof.sql_count += 1
+        prof.sql_seconds += time.perf_counter() - stack.pop()
+        if cursor.description is not None and context is not None:
+            # il result proxy viene creato dopo questo evento, leggendo da context.cursor
+            context.cursor = _CountingCursor(cursor, prof)
+
+
+# --- route: segna la fine dell'endpoint per separare la serializzazione ---
+
+def _mark_endpoint(prof: Optional[RequestProfile], t0: float) -> None:
+    if prof is not None:
+        prof.endpoint_done = time.perf_counter()
+        prof.endpoint_seconds = prof.endpoint_done - t0
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute che, a profiling attivo, misura quando l'endpoint ritorna"""
+
+    def __init__(self, path: str, endpoint: Any, **kwargs: Any):
+        if PROFILE_REQUESTS:
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _timed_endpoint(endpoint: Any) -> Any:
+    # firma risolta: le annotation stringa (from __future__) vanno valutate nel modulo originale
+    signature = inspect.signature(endpoint, eval_str=True)
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint(_current.get(), t0)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint(_current.get(), t0)
+
+    wrapper.__signature__ = signature
+    return wrapper
+
+
+# --- profili su disco delle richieste più lente ---
+
+class _SlowestProfiles:
+    def __init__(self, directory: str, keep: int):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self._heap: List[Tuple[float, str]] = []  # min-heap (durata, file)
+        self._lock = threading.Lock()
+        self.busy = threading.Lock()  # un solo profiler attivo per volta
+
+    def worth_keeping(self, seconds: float) -> bool:
+        with self._lock:
+            return len(self._heap) < self.keep or seconds > self._heap[0][0]
+
+    def save(self, seconds: float, name: str, write) -> None:  # noqa: ANN001
+        path = self.dir / f"{int(seconds * 1000):06d}ms_{name}"
+        with self._lock:
+            write(path)
+            heapq.heappush(self._heap, (seconds, str(path)))
+            while len(self._heap) > self.keep:
+                _, evicted = heapq.heappop(self._heap)
+                Path(evicted).unlink(missing_ok=True)
+
+
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler  # opzionale
+
+        prof = Profiler(async_mode="enabled")
+        prof.start()
+        return "pyinstrument", prof
+    except ImportError:
+        import cProfile
+
+        prof = cProfile.Profile()
+        prof.enable()
+        return "cprofile", prof
+
+
+def _stop_profiler(kind: str, prof: Any):
+    if kind == "pyinstrument":
+        prof.stop()
+        return ".html", lambda p: p.write_text(prof.output_html())
+    prof.disable()
+    return ".prof", lambda p: prof.dump_stats(str(p))
+
+
+def _slug(method: str, path: str) -> str:
+    return f"{method}_{re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_')}"[:120]
+
+
+# --- middleware ASGI ---
+
+class ProfilingMiddleware:
+    def __init__(self, app: Any):
+        self.app = app
+        self.slowest = _SlowestProfiles(PROFILE_DIR, PROFILE_KEEP_SLOWEST) if PROFILE_DIR else None
+
+    async def __call__(self, scope, receive, send):  # noqa: ANN001
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        prof = RequestProfile()
+        token = _current.set(prof)
+
+        profiler = None
+        if (
+            self.slowest is not None
+            and random.random() < PROFILE_SAMPLE_RATE
+            and self.slowest.busy.acquire(blocking=False)
+        ):
+            profiler = _start_profiler()
+
+        async def send_with_timing(message):  # noqa: ANN001
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(prof).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if profiler is not None:
+                try:
+                    ext, write = _stop_profiler(*profiler)
+                    total = time.perf_counter() - prof.started
+                    if self.slowest.worth_keeping(total):
+                        self.slowest.save(total, _slug(scope["method"], scope["path"]) + ext, write)
+                finally:
+                    self.slowest.busy.release()
+
+
+def server_timing(prof: RequestProfile) -> str:
+    now = time.perf_counter()
+    total_ms = (now - prof.started) * 1000
+    sql_ms = prof.sql_seconds * 1000
+    parts = [f'db;dur={sql_ms:.1f};desc="{prof.sql_count} queries, {prof.rows} rows"']
+    if prof.endpoint_seconds is not None and prof.endpoint_done is not None:
+        # app = codice Python dell'endpoint (query escluse), ser = validazione + JSON
+        parts.append(f"app;dur={max(0.0, prof.endpoint_seconds * 1000 - sql_ms):.1f}")
+        parts.append(f"ser;dur={(now - prof.endpoint_done) * 1000:.1f}")
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
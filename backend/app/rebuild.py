@@ -0,0 +1,384 @@
+"""
+Rebuild di un account con tabelle ombra e scambio atomico (POST /api/sync?rebuild=true).
+
+full_sync aggiorna workouts ed exercise_sets sul posto con un commit per pagina: durante un
+sync completo chi legge vede dati a metà e si contende i lock di riga con le scritture. Qui:
+
+1. load: workouts__new / exercise_sets__new con la sola chiave primaria (niente indici
+   secondari né vincoli da mantenere riga per riga); tutte le pagine dell'account ci finiscono
+   con insert multi-riga, un commit per pagina. Le tabelle vive non si toccano (il catalogo
+   esercizi sì, come nel sync)
+2. freeze (app.db.live_writes: sync, import e modifiche aspettano, le letture no): si copiano le
+   righe vive che il download non sostituisce (altri account, workout che l'API non restituisce
+   più, import CSV senza corrispondenza), si riportano ignored/tipo e si creano indici e FK
+3. swap: un solo RENAME TABLE su MySQL, ALTER TABLE ... RENAME in una transazione su SQLite;
+   poi le tabelle vecchie si cancellano
+
+Il risultato è quello di full_sync (presa in carico degli import CSV, workout di altri account
+saltati), ma i set dei workout restituiti dall'API si riscrivono da capo: un set modificato in
+Hevy si aggiorna. Gli id dei set si rinumerano (sono interni, mai esposti).
+Ogni rebuild copia le righe di tutti gli account: serve a riallineare un account, non come
+sync ordinario. Su SQLite senza WAL le scritture grosse del freeze possono far aspettare i
+lettori; con MySQL (InnoDB, MVCC) le letture restano piatte.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Column, ForeignKey, Index, MetaData, Table, UniqueConstraint, bindparam, delete, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import AddConstraint, CreateTable
+
+from app import metrics, warmup
+from app.cache import bump_generation
+from app.db import SessionLocal, get_engine, live_writes
+from app.hevy_client import HevyClient
+from app.importer import IMPORT_PREFIX, MATCH_WINDOW
+from app.keys import workout_pk
+from app.localtime import local_date_of
+from app.migrations import REBUILD_INDEX_SUFFIX
+from app.models import ExerciseSet, Workout
+from app.normalizer import exercise_fields, exercise_sets, pick, set_fields, workout_exercises, workout_fields
+from app.similarity import payload_signature
+from app.sync_service import SyncProgress, fetch_page, upsert_exercise
+from app.training_load import training_load
+
+NEW = "__new"
+OLD = "__old"
+CHUNK = 500  # id per IN (...)
+# MySQL: il RENAME aspetta le transazioni aperte sulle tabelle (metadata lock) e intanto le
+# query nuove si accodano dietro di lui; meglio attese brevi e qualche tentativo
+SWAP_LOCK_WAIT_SECONDS = 2
+SWAP_ATTEMPTS = 5
+
+_running = threading.Lock()
+
+
+@dataclass
+class RebuildStats:
+    user_id: int
+    pages: int = 0
+    workouts: int = 0
+    sets: int = 0
+    skipped_other_account: int = 0
+    imported_taken: int = 0
+    copied_workouts: int = 0
+    copied_sets: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _shadow(md: MetaData, table: Table, fk_targets: Dict[str, str]) -> Table:
+    """Copia delle colonne di `table` (PK e FK comprese, indici e unique no) in `table`__new"""
+    cols = []
+    for c in table.columns:
+        fks = [ForeignKey(fk_targets.get(fk.target_fullname, fk.target_fullname)) for fk in c.foreign_keys]
+        cols.append(Column(
+            c.name, c.type, *fks, primary_key=c.primary_key, nullable=c.nullable, autoincrement=c.autoincrement,
+        ))
+    return Table(table.name + NEW, md, *cols)
+
+
+def _shadow_tables() -> Tuple[Table, Table]:
+    md = MetaData()
+    for t in Workout.__table__.metadata.sorted_tables:
+        if t.name not in (Workout.__tablename__, ExerciseSet.__tablename__):
+            t.to_metadata(md)  # tabelle referenziate dalle FK (account, tipi): solo per il DDL
+    w = _shadow(md, Workout.__table__, {})
+    s = _shadow(md, ExerciseSet.__table__, {"workouts.id": w.name + ".id"})
+    return w, s
+
+
+def _secondary(live: Table) -> List[Tuple[str, List[str], bool]]:
+    """(nome, colonne, unique) degli indici e dei vincoli unique di una tabella del modello"""
+    out = [(i.name, [c.name for c in i.columns], bool(i.unique)) for i in live.indexes]
+    out += [
+        (u.name, [c.name for c in u.columns], True)
+        for u in live.constraints if isinstance(u, UniqueConstraint)
+    ]
+    return out
+
+
+def _drop(conn: Connection, *names: str) -> None:
+    for name in names:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {name}")
+
+
+def _prepare(engine: Engine, w_new: Table, s_new: Table) -> None:
+    mysql = engine.dialect.name == "mysql"
+    with engine.begin() as conn:
+        # avanzi di un rebuild interrotto (figli prima dei padri, per le FK)
+        _drop(conn, s_new.name, w_new.name, ExerciseSet.__tablename__ + OLD, Workout.__tablename__ + OLD)
+        for t in (w_new, s_new):
+            # MySQL: le FK si aggiungono dopo il caricamento (niente controlli riga per riga);
+            # SQLite non le verifica e non le sa aggiungere dopo: restano nel CREATE TABLE
+            conn.execute(CreateTable(t, include_foreign_key_constraints=[] if mysql else None))
+
+
+def _stage_page(
+    w_new: Table,
+    s_new: Table,
+    progress: SyncProgress,
+    data: Dict[str, Any],
+    seen: Set[str],
+    catalog: Dict[Tuple[str, Any], Optional[int]],
+    stats: RebuildStats,
+) -> None:
+    user_id = progress.user_id
+    progress.page_count = int(data.get("page_count") or data.get("pageCount") or 1)
+    workouts = data.get("workouts") or []
+    workout_rows: List[dict] = []
+    set_rows: List[dict] = []
+
+    with SessionLocal() as db:
+        for w in workouts:
+            workout_id = pick(w, ["id", "workout_id", "uuid"])
+            if not workout_id or str(workout_id) in seen:
+                continue  # pagine scivolate (workout nuovo durante il download): già preso
+            workout_id = str(workout_id)
+            seen.add(workout_id)
+
+            fields = workout_fields(w)
+            exercises = workout_exercises(w)
+            workout_rows.append({
+                "id": workout_id,
+                "pk": workout_pk(workout_id, fields["date"]),
+                "user_id": user_id,
+                **fields,
+                "local_date": local_date_of(fields["date"]),
+                "ignored": False,
+                "type_id": None,
+                "raw_json": json.dumps(w, ensure_ascii=False),
+                "signature": payload_signature(exercises),
+            })
+
+            keys: Set[Tuple[str, int]] = set()
+            for ex in exercises:
+                ex_title, template_id = exercise_fields(ex)
+                if (ex_title, template_id) not in catalog:
+                    exercise, _ = upsert_exercise(db, user_id, ex_title, template_id)
+                    catalog[ex_title, template_id] = exercise.id if exercise is not None else None
+                for idx, s in enumerate(exercise_sets(ex)):
+                    # stesso esercizio due volte nel workout: come nel sync vale il primo (uq_set_key)
+                    if template_id is not None:
+                        if (template_id, idx + 1) in keys:
+                            continue
+                        keys.add((template_id, idx + 1))
+                    set_rows.append({
+                        "workout_id": workout_id,
+                        "workout_pk": workout_rows[-1]["pk"],
+                        "exercise_id": catalog[ex_title, template_id],
+                        "user_id": user_id,
+                        "exercise_title": ex_title,
+                        "exercise_template_id": template_id,
+                        "set_index": idx + 1,
+                        "raw_json": json.dumps(s, ensure_ascii=False),
+                        **set_fields(s),
+                    })
+
+        if workout_rows:
+            db.execute(insert(w_new), workout_rows)
+        if set_rows:
+            db.execute(insert(s_new), set_rows)
+        db.commit()
+
+    stats.pages += 1
+    stats.workouts += len(workout_rows)
+    stats.sets += len(set_rows)
+    metrics.sync_pages.inc()
+    metrics.sync_workouts.inc(len(workouts))
+    metrics.sync_sets_seen.inc(len(set_rows))
+    progress.page += 1
+
+
+def _chunks(ids: List[str]):
+    for i in range(0, len(ids), CHUNK):
+        yield ids[i:i + CHUNK]
+
+
+def _merge(conn: Connection, w_new: Table, s_new: Table, user_id: int, stats: RebuildStats) -> List[str]:
+    """Righe vive nelle tabelle nuove; ritorna gli id degli import CSV presi in carico (da togliere)"""
+    w, s = Workout.__table__, ExerciseSet.__table__
+
+    # workout dell'API già di un altro account: restano suoi (come nel sync)
+    foreign = list(conn.execute(
+        select(w.c.id).join(w_new, w_new.c.id == w.c.id).where(w.c.user_id != user_id)
+    ).scalars())
+    for chunk in _chunks(foreign):
+        conn.execute(delete(s_new).where(s_new.c.workout_id.in_(chunk)))
+        conn.execute(delete(w_new).where(w_new.c.id.in_(chunk)))
+    stats.skipped_other_account = len(foreign)
+
+    # ignored/tipo: dal workout vivo con lo stesso id, o dall'import CSV che l'API sostituisce
+    flags: Dict[str, Tuple[bool, Any]] = {}
+    taken: Dict[str, None] = {}  # id -> None, in ordine
+    imported: Dict[str, List[tuple]] = {}
+    for row in conn.execute(
+        select(w.c.id, w.c.title, w.c.date, w.c.ignored, w.c.type_id)
+        .where(w.c.user_id == user_id, w.c.id.like(IMPORT_PREFIX + "%"), w.c.date.is_not(None))
+    ):
+        imported.setdefault(row.title, []).append(row)
+    if imported:
+        for wid, title, started in conn.execute(
+            select(w_new.c.id, w_new.c.title, w_new.c.date).where(w_new.c.title.in_(list(imported)))
+        ):
+            for row in imported.get(title, ()):
+                if started is not None and abs(row.date - started) <= MATCH_WINDOW and row.id not in taken:
+                    taken[row.id] = None
+                    flags[wid] = (bool(row.ignored), row.type_id)
+                    break
+    staged = set(conn.execute(select(w_new.c.id)).scalars())
+    for wid, ignored, type_id in conn.execute(
+        select(w.c.id, w.c.ignored, w.c.type_id)
+        .where(w.c.user_id == user_id, (w.c.ignored.is_(True)) | (w.c.type_id.is_not(None)))
+    ):
+        if wid in staged:
+            flags[wid] = (bool(ignored), type_id)
+    if flags:
+        conn.execute(
+            update(w_new).where(w_new.c.id == bindparam("b_id")).values(
+                ignored=bindparam("b_ignored"), type_id=bindparam("b_type_id"),
+            ),
+            [{"b_id": k, "b_ignored": v[0], "b_type_id": v[1]} for k, v in flags.items()],
+        )
+
+    # tutto il resto passa com'è: set prima (il filtro vede solo i workout scaricati), poi i workout
+    set_cols = [c.name for c in s.columns if c.name != "id"]
+    res = conn.execute(insert(s_new).from_select(
+        set_cols,
+        select(*(s.c[c] for c in set_cols)).where(s.c.workout_id.not_in(select(w_new.c.id))).order_by(s.c.id),
+    ))
+    stats.copied_sets = res.rowcount
+    res = conn.execute(insert(w_new).from_select(
+        [c.name for c in w.columns],
+        select(w).where(w.c.id.not_in(select(w_new.c.id))),
+    ))
+    stats.copied_workouts = res.rowcount
+    stats.imported_taken = len(taken)
+    return list(taken)
+
+
+def _build_indexes(conn: Connection, w_new: Table, s_new: Table) -> None:
+    sqlite = conn.dialect.name == "sqlite"
+    taken_names = set(
+        conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars()
+    ) if sqlite else set()
+    for live, new in ((Workout.__table__, w_new), (ExerciseSet.__table__, s_new)):
+        for name, cols, unique in _secondary(live):
+            # SQLite: nome unico nel DB; se lo usa ancora la tabella viva si prende quello col
+            # suffisso (al rebuild dopo si torna al nome base, liberato dal DROP delle vecchie)
+            if sqlite and name in taken_names:
+                name += REBUILD_INDEX_SUFFIX
+            Index(name, *(new.c[c] for c in cols), unique=unique).create(conn)
+    if not sqlite:
+        # righe già coerenti per costruzione: niente verifica riga per riga dell'ALTER
+        conn.exec_driver_sql("SET foreign_key_checks = 0")
+        try:
+            for t in (w_new, s_new):
+                for fk in t.foreign_key_constraints:
+                    conn.execute(AddConstraint(fk))
+        finally:
+            conn.exec_driver_sql("SET foreign_key_checks = 1")
+
+
+def _swap(engine: Engine) -> None:
+    w, s = Workout.__tablename__, ExerciseSet.__tablename__
+    pairs = [(w, w + OLD), (w + NEW, w), (s, s + OLD), (s + NEW, s)]
+    if engine.dialect.name == "mysql":
+        with engine.connect() as conn:
+            conn.exec_driver_sql(f"SET SESSION lock_wait_timeout = {SWAP_LOCK_WAIT_SECONDS}")
+            for attempt in range(SWAP_ATTEMPTS):
+                try:
+                    # un solo statement: atomico, e le FK seguono le tabelle rinominate
+                    conn.exec_driver_sql("RENAME TABLE " + ", ".join(f"{a} TO {b}" for a, b in pairs))
+                    return
+                except OperationalError as e:
+                    if attempt == SWAP_ATTEMPTS - 1:
+                        raise
+                    print(f"[REBUILD] swap in attesa dei lock ({e.orig}), riprovo")
+                    time.sleep(0.5)
+        return
+
+    # SQLite: il DDL è transazionale, ma pysqlite non apre transazioni da solo per il DDL
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            for a, b in pairs:
+                cur.execute(f"ALTER TABLE {a} RENAME TO {b}")
+        except Exception:
+            raw.rollback()
+            raise
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _freeze_and_swap(engine: Engine, w_new: Table, s_new: Table, user_id: int, stats: RebuildStats) -> None:
+    t0 = time.perf_counter()
+    with live_writes.frozen():
+        with engine.begin() as conn:
+            taken = _merge(conn, w_new, s_new, user_id, stats)
+            _build_indexes(conn, w_new, s_new)
+            for chunk in _chunks(taken):  # import CSV sostituiti dall'API, ora con gli indici
+                stats.copied_sets -= conn.execute(delete(s_new).where(s_new.c.workout_id.in_(chunk))).rowcount
+                stats.copied_workouts -= conn.execute(delete(w_new).where(w_new.c.id.in_(chunk))).rowcount
+        t1 = time.perf_counter()
+        metrics.sync_rebuild_phase.observe(t1 - t0, phase="freeze")
+        _swap(engine)
+    metrics.sync_rebuild_phase.observe(time.perf_counter() - t1, phase="swap")
+    with engine.begin() as conn:
+        _drop(conn, ExerciseSet.__tablename__ + OLD, Workout.__tablename__ + OLD)
+
+
+async def rebuild_sync(client: HevyClient, user_id: int) -> RebuildStats:
+    """Sync completo dell'account su tabelle ombra, poi scambio atomico (uno alla volta: 409)"""
+    if not _running.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Rebuild already running")
+    try:
+        return await _rebuild(client, user_id)
+    finally:
+        _running.release()
+
+
+async def _rebuild(client: HevyClient, user_id: int) -> RebuildStats:
+    t0 = time.perf_counter()
+    stats = RebuildStats(user_id)
+    engine = get_engine()
+    w_new, s_new = _shadow_tables()
+    await asyncio.to_thread(_prepare, engine, w_new, s_new)
+    try:
+        progress = SyncProgress(user_id=user_id, pending_imports=False)
+        seen: Set[str] = set()
+        catalog: Dict[Tuple[str, Any], Optional[int]] = {}
+        while not progress.done:
+            data = await fetch_page(client, progress)
+            await asyncio.to_thread(_stage_page, w_new, s_new, progress, data, seen, catalog, stats)
+        metrics.sync_rebuild_phase.observe(time.perf_counter() - t0, phase="load")
+        await asyncio.to_thread(_freeze_and_swap, engine, w_new, s_new, user_id, stats)
+    except BaseException:
+        def cleanup() -> None:
+            with engine.begin() as conn:
+                _drop(conn, s_new.name, w_new.name)
+        await asyncio.to_thread(cleanup)
+        metrics.sync_duration.observe(time.perf_counter() - t0, result="error")
+        raise
+
+    bump_generation()
+    training_load.mark_dirty(None, user_id)
+    stats.seconds = round(time.perf_counter() - t0, 3)
+    metrics.sync_duration.observe(stats.seconds, result="ok")
+    metrics.mark_sync_success()
+    warmup.schedule(user_id, "rebuild")
+    print(f"[REBUILD] {stats.as_dict()}")
+    return stats
@@ -0,0 +1,38 @@
+"""
+Risposte JSON veloci.
+
+- FastJSONResponse codifica con orjson (se installato, altrimenti json della stdlib)
+- gli endpoint con liste grandi (workouts, dettaglio, records) costruiscono già righe
+  dict con i tipi giusti e ritornano direttamente FastJSONResponse: FastAPI non rivalida
+  contro response_model (che resta solo per la documentazione OpenAPI)
+- la compressione gzip sopra GZIP_MIN_BYTES la fa il middleware in app.main
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dipendenza opzionale
+    orjson = None
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.accounts import active_account_ids
+from app.db import get_db
+from app.models import Account, SyncState
+from app.schemas import AccountIn, AccountOut, AccountSyncOut
+from app.sync_pool import sync_accounts
+from app.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/api", tags=["accounts"], route_class=ProfiledRoute)
+
+
+@router.get("/accounts", response_model=list[AccountOut])
+def list_accounts(db: Session = Depends(get_db)):
+    rows = db.execute(
+        select(Account, SyncState)
+        .outerjoin(SyncState, SyncState.id == Account.id)
+        .order_by(Account.id)
+    ).all()
+    return [
+        AccountOut(
+            id=a.id,
+            name=a.name,
+            active=bool(a.active),
+            last_sync_ts=s.last_sync_ts if s else None,
+            last_error=s.last_error if s else None,
+        )
+        for a, s in rows
+    ]
+
+
+@router.post("/accounts", response_model=AccountOut)
+def create_account(payload: AccountIn, db: Session = Depends(get_db)):
+    """Nuovo lifter: la chiave API resta nel DB e non viene mai restituita"""
+    a = Account(name=payload.name.strip(), api_key=payload.api_key.strip(), active=payload.active)
+    db.add(a)
+    db.commit()
+    return AccountOut(id=a.id, name=a.name, active=bool(a.active))
+
+
+@router.post("/sync/all", response_model=list[AccountSyncOut])
+async def sync_all_accounts(
+    force: bool = Query(default=False),
+    db: Session = Depends(get_db),
+):
+    """
+    Sync di tutti gli account attivi col pool (app/sync_pool.py).
+    force=false -> solo quelli fuori cooldown
+    """
+    results = await sync_accounts(active_account_ids(db), force=force)
+    return [AccountSyncOut(**r.__dict__) for r in results]
@@ -1,54 +1,36 @@
 # backend/app/routers/analysis.py
 from __future__ import annotations
 
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select, and_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select, and_, case, func
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from app.accounts import current_account
+from app.analytics import CHECK_EVERY, BestBatch, RangeStats, SetBatch, aggregate_muscles, exercise_trends, group_for_radar
+from app.cache import get_or_compute, get_or_compute_async
+from app.compute import checkpoint, compute, worker_session
 from app.db import get_db
-from app.models import Workout, ExerciseSet, Exercise, Muscle, exercise_muscles
+from app.localtime import local_today
+from app.models import DEFAULT_ACCOUNT_ID, Exercise, Workout, ExerciseSet
+from app.muscle_map import MuscleMap, get_muscle_map
+from app.training_load import MAX_RANGE_DAYS, load_series
+from app.profiling import ProfiledRoute
 
-router = APIRouter(prefix="/api/analysis", tags=["analysis"])
+router = APIRouter(prefix="/api/analysis", tags=["analysis"], route_class=ProfiledRoute)
 
 
 def _day_bounds(d: date):
-    start = datetime(d.year, d.month, d.day, 0, 0, 0)
-    end = start + timedelta(days=1)
-    return start, end
+    # giorni locali (Workout.local_date, fuso config.TZ): [d, d+1)
+    return d, d + timedelta(days=1)
 
 
 def _range_bounds(d_from: date, d_to: date):
-    # inclusivo su d_to: facciamo < end_of_day+1
-    start = datetime(d_from.year, d_from.month, d_from.day, 0, 0, 0)
-    end = datetime(d_to.year, d_to.month, d_to.day, 0, 0, 0) + timedelta(days=1)
-    return start, end
-
-
-def _group_for_radar(muscle: str) -> str:
-    m = muscle.lower().strip()
-
-    if m == "petto":
-        return "petto"
-    if m == "schiena":
-        return "schiena"
-    if m == "spalle":
-        return "spalle"
-    if m == "addome":
-        return "addome"
-
-    # BRACCIA
-    if m in {"bicipiti", "tricipiti", "avambracci"}:
-        return "braccia"
-
-    # GAMBE
-    if m in {"quadricipiti", "femorali", "glutei", "polpacci"}:
-        return "gambe"
-
-    # se arriva roba non prevista, ignoriamo
-    return "altro"
+    # inclusivo su d_to: facciamo < d_to+1
+    return d_from, d_to + timedelta(days=1)
 
 
 def _default_radar_dict() -> Dict[str, int]:
@@ -62,102 +44,176 @@ def _default_radar_dict() -> Dict[str, int]:
     }
 
 
-def _compute_counts(db: Session, start_dt: datetime, end_dt: datetime) -> Dict[str, Any]:
-    """\
-    Conta i muscoli allenati (per workout) nel range [start_dt, end_dt).
+def _volume_out(acc: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        k: {"sets": round(v[0], 2), "reps": round(v[1], 2), "tonnage_kg": round(v[2], 2)}
+        for k, v in sorted(acc.items(), key=lambda kv: -kv[1][2])
+    }
+
 
-    Logica:
-    - prendo i workout non ignorati nel range
-    - collego i set -> esercizio (per exercise_template_id)
-    - collego l'esercizio ai muscoli via association table exercise_muscles
-    - aggrego per workout (un muscolo conta max 1 volta per workout)
+def _fetch_ranges(db: Session, ranges: List[tuple[date, date]], user_id: int, mm: MuscleMap) -> SetBatch:
+    """    Set aggregati per (workout, esercizio) nell'inviluppo dei range, come batch colonnare.
+
+    - la query aggrega i set: niente join sui muscoli, quindi nessuna riga moltiplicata per
+      set x muscolo
+    - i muscoli di ogni esercizio arrivano dalla bitmask in cache (app.muscle_map)
+    - "sets" conta solo i set di lavoro (niente riscaldamento); reps e tonnellaggio tutti i set
 
     Nota: se un esercizio non ha muscoli assegnati, non contribuisce.
     """
+    batch = SetBatch()
+    lo = min(r[0] for r in ranges)
+    hi = max(r[1] for r in ranges)
 
     q = (
         select(
-            Workout.id,
-            Muscle.name,
+            Workout.pk,
+            Workout.local_date,
+            ExerciseSet.exercise_template_id,
+            func.count(case((ExerciseSet.is_working_set == True, 1))),  # noqa: E712
+            func.coalesce(func.sum(ExerciseSet.reps), 0),
+            func.coalesce(func.sum(ExerciseSet.volume_kg), 0.0),
         )
         .select_from(Workout)
-        .join(ExerciseSet, ExerciseSet.workout_id == Workout.id)
-        .join(
-            Exercise,
-            Exercise.exercise_template_id == ExerciseSet.exercise_template_id,
-        )
-        .join(
-            exercise_muscles,
-            exercise_muscles.c.exercise_id == Exercise.id,
-        )
-        .join(
-            Muscle,
-            Muscle.id == exercise_muscles.c.muscle_id,
-        )
+        .join(ExerciseSet, ExerciseSet.workout_pk == Workout.pk)
         .where(
             and_(
-                Workout.date.is_not(None),
-                Workout.date >= start_dt,
-                Workout.date < end_dt,
+                Workout.user_id == user_id,
+                Workout.local_date.is_not(None),
+                Workout.local_date >= lo,
+                Workout.local_date < hi,
                 (Workout.ignored == False),  # noqa: E712
                 ExerciseSet.exercise_template_id.is_not(None),
-                Muscle.name.is_not(None),
             )
         )
+        .group_by(Workout.pk, Workout.local_date, ExerciseSet.exercise_template_id)
     )
+    for i, (pk, day, template_id, n_sets, n_reps, tonnage) in enumerate(db.execute(q)):
+        if i % CHECK_EVERY == 0:
+            checkpoint()
+        mask = mm.mask(template_id)
+        if not mask:
+            continue
+        batch.workout_ids.append(pk)
+        batch.days.append(day.toordinal())
+        batch.masks.append(mask)
+        batch.sets.append(int(n_sets))
+        batch.reps.append(int(n_reps or 0))
+        batch.tonnage.append(float(tonnage or 0.0))
+    return batch
+
+
+def _muscle_job(user_id: int, ranges: List[tuple[date, date]], weighting: str, mm: MuscleMap) -> List[RangeStats]:
+    """job del pool di calcolo: lettura e aggregazione nel processo figlio"""
+    with worker_session() as db:
+        batch = _fetch_ranges(db, ranges, user_id, mm)
+    return aggregate_muscles(batch, mm.names, ranges, weighting)
+
+
+async def _aggregate_ranges(
+    request: Request,
+    db: Session,
+    ranges: List[tuple[date, date]],
+    weighting: str = "full",
+    user_id: int = DEFAULT_ACCOUNT_ID,
+) -> List[RangeStats]:
+    """    Statistiche per muscolo su più range di giorni locali [start, end) con UNA sola query,
+    letta e aggregata nel pool di processi (app/compute.py).
+    """
+    if not ranges:
+        return []
+    mm = await run_in_threadpool(get_muscle_map, db)  # in cache per generazione: solo qui nel server
+    return await compute.run(_muscle_job, user_id, ranges, weighting, mm, request=request)
 
-    rows = db.execute(q).all()
 
-    # workout_id -> set(muscles)
-    per_workout: Dict[str, set[str]] = {}
+def _check_range(d_from: date, d_to: date) -> None:
+    """range richiesto + range precedente di pari durata: ordinati, al massimo MAX_RANGE_DAYS, dentro date.min/max"""
+    if d_to < d_from:
+        raise HTTPException(status_code=400, detail="'to' must be >= 'from'")
+    days = (d_to - d_from).days + 1
+    if days > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=422, detail=f"range must be at most {MAX_RANGE_DAYS} days")
+    if (d_from - date.min).days < days or d_to >= date.max:
+        raise HTTPException(status_code=422, detail="date out of range")
 
-    for workout_id, muscle_name in rows:
-        if not muscle_name:
-            continue
-        m = str(muscle_name).strip().lower()
-        if not m:
-            continue
 
-        s = per_workout.get(workout_id)
-        if s is None:
-            s = set()
-            per_workout[workout_id] = s
-        s.add(m)
+def _previous_range(d_from: date, d_to: date) -> tuple[date, date]:
+    # range precedente: stesso numero di giorni, subito prima del from
+    days = (d_to - d_from).days + 1
+    prev_to = d_from - timedelta(days=1)
+    prev_from = prev_to - timedelta(days=days - 1)
+    return prev_from, prev_to
+
 
+def _summary_counts(mm: MuscleMap, st: RangeStats) -> Dict[str, Any]:
+    """muscle_counts / radar: quanti workout toccano ogni muscolo (e gruppo radar)"""
     muscle_counts: Dict[str, int] = {}
     radar = _default_radar_dict()
 
-    for mset in per_workout.values():
-        for m in mset:
-            muscle_counts[m] = muscle_counts.get(m, 0) + 1
-            grp = _group_for_radar(m)
+    # workout con la stessa combinazione di muscoli si contano insieme
+    per_mask: Dict[int, int] = {}
+    for mask in st.workout_masks.values():
+        per_mask[mask] = per_mask.get(mask, 0) + 1
+
+    for mask, n in per_mask.items():
+        for m in mm.muscles(mask):
+            muscle_counts[m] = muscle_counts.get(m, 0) + n
+            grp = group_for_radar(m)
             if grp in radar:
-                radar[grp] += 1
+                radar[grp] += n
 
     return {
         "muscle_counts": muscle_counts,
         "radar": radar,
-        "workouts_count": len(per_workout),
+        "workouts_count": len(st.workout_masks),
     }
 
 
 @router.get("/summary")
-def analysis_summary(
+async def analysis_summary(
+    request: Request,
     db: Session = Depends(get_db),
     d_from: date = Query(..., alias="from"),
     d_to: date = Query(..., alias="to"),
+    account: int = Depends(current_account),
 ):
-    # range attuale
-    start_dt, end_dt = _range_bounds(d_from, d_to)
+    mm = await run_in_threadpool(get_muscle_map, db)  # in cache per generazione
+    return await analysis_summary_cached(request, mm, account, d_from, d_to)
+
+
+async def analysis_summary_cached(
+    request: Optional[Request], mm: MuscleMap, account: int, d_from: date, d_to: date
+) -> Dict[str, Any]:
+    """/summary senza sessione DB: la mappa muscoli arriva dal chiamante (anche /api/batch)"""
+    async def build() -> Dict[str, Any]:
+        # range attuale + precedente in una sola query, letta e aggregata nel pool di calcolo
+        cur_st, prev_st = await compute.run(
+            _muscle_job, account, _summary_ranges(d_from, d_to), "full", mm, request=request
+        )
+        return _summary_out(mm, d_from, d_to, cur_st, prev_st)
 
-    # range precedente: stesso numero di giorni, subito prima del from
-    days = (d_to - d_from).days + 1
-    prev_to = d_from - timedelta(days=1)
-    prev_from = prev_to - timedelta(days=days - 1)
-    prev_start_dt, prev_end_dt = _range_bounds(prev_from, prev_to)
+    return await get_or_compute_async("analysis_summary", (account, d_from, d_to), build)
+
+
+def analysis_summary_warm(db: Session, account: int, d_from: date, d_to: date) -> Dict[str, Any]:
+    """stessa voce di cache di /summary, calcolata da un thread (app/warmup.py)"""
+    def build() -> Dict[str, Any]:
+        mm = get_muscle_map(db)
+        cur_st, prev_st = compute.run_blocking(_muscle_job, account, _summary_ranges(d_from, d_to), "full", mm)
+        return _summary_out(mm, d_from, d_to, cur_st, prev_st)
 
-    cur = _compute_counts(db, start_dt, end_dt)
-    prev = _compute_counts(db, prev_start_dt, prev_end_dt)
+    return get_or_compute("analysis_summary", (account, d_from, d_to), build)
+
+
+def _summary_ranges(d_from: date, d_to: date) -> List[tuple[date, date]]:
+    prev_from, prev_to = _previous_range(d_from, d_to)
+    return [_range_bounds(d_from, d_to), _range_bounds(prev_from, prev_to)]
+
+
+def _summary_out(mm: MuscleMap, d_from: date, d_to: date, cur_st: RangeStats, prev_st: RangeStats) -> Dict[str, Any]:
+    prev_from, prev_to = _previous_range(d_from, d_to)
+    cur = _summary_counts(mm, cur_st)
+    prev = _summary_counts(mm, prev_st)
 
     return {
         "from": str(d_from),
@@ -173,4 +229,153 @@ def analysis_summary(
             "workouts_attuale": cur["workouts_count"],
             "workouts_precedente": prev["workouts_count"],
         },
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/muscle-volume")
+async def muscle_volume(
+    request: Request,
+    db: Session = Depends(get_db),
+    d_from: date = Query(..., alias="from"),
+    d_to: date = Query(..., alias="to"),
+    weighting: str = Query(default="full", pattern="^(full|split)$"),
+    account: int = Depends(current_account),
+):
+    """
+    Volume per muscolo e per gruppo radar (set, reps, tonnellaggio), totale e per settimana ISO,
+    per il range richiesto e per quello precedente di pari durata.
+    """
+    _check_range(d_from, d_to)
+    prev_from, prev_to = _previous_range(d_from, d_to)
+    cur_st, prev_st = await _aggregate_ranges(
+        request,
+        db,
+        [_range_bounds(d_from, d_to), _range_bounds(prev_from, prev_to)],
+        weighting=weighting,
+        user_id=account,
+    )
+
+    def out(st: RangeStats) -> Dict[str, Any]:
+        return {
+            "workouts": len(st.workout_masks),
+            "muscles": _volume_out(st.muscles),
+            "groups": _volume_out(st.groups),
+            "weeks": [
+                {"week": wk, "muscles": _volume_out(v["muscles"]), "groups": _volume_out(v["groups"])}
+                for wk, v in sorted(st.weeks.items())
+            ],
+        }
+
+    return {
+        "from": str(d_from),
+        "to": str(d_to),
+        "previous_from": str(prev_from),
+        "previous_to": str(prev_to),
+        "weighting": weighting,
+        "attuale": out(cur_st),
+        "precedente": out(prev_st),
+    }
+
+
+def _fetch_best_e1rm(db: Session, user_id: int) -> BestBatch:
+    """miglior e1RM (set di lavoro con peso) per esercizio e workout, tutto lo storico, una query"""
+    batch = BestBatch()
+    # raggruppa e ordina su chiavi intere (workout, esercizio), niente sort sulle stringhe del
+    # template: lo si riprende dal catalogo (i set con template puntano all'esercizio che ce l'ha)
+    templates = dict(
+        db.execute(
+            select(Exercise.id, Exercise.exercise_template_id).where(Exercise.exercise_template_id.is_not(None))
+        ).all()
+    )
+    q = (
+        select(
+            ExerciseSet.exercise_id,
+            Workout.local_date,
+            func.max(ExerciseSet.e1rm_kg),
+        )
+        .select_from(ExerciseSet)
+        .join(Workout, Workout.pk == ExerciseSet.workout_pk)
+        .where(
+            and_(
+                ExerciseSet.user_id == user_id,
+                ExerciseSet.exercise_template_id.is_not(None),
+                ExerciseSet.is_working_set == True,  # noqa: E712
+                ExerciseSet.e1rm_kg.is_not(None),
+                Workout.local_date.is_not(None),
+                (Workout.ignored == False),  # noqa: E712
+            )
+        )
+        .group_by(Workout.pk, ExerciseSet.exercise_id, Workout.local_date)
+        .order_by(ExerciseSet.exercise_id, Workout.local_date)
+    )
+    for i, (exercise_id, day, e1rm) in enumerate(db.execute(q)):
+        if i % CHECK_EVERY == 0:
+            checkpoint()
+        template_id = templates.get(exercise_id)
+        if template_id is not None:
+            batch.add(template_id, day.toordinal(), float(e1rm))
+    return batch
+
+
+def _trends_job(user_id: int, today: date, weeks: int) -> List[Dict[str, Any]]:
+    """job del pool di calcolo: trend e1RM di tutti gli esercizi"""
+    with worker_session() as db:
+        batch = _fetch_best_e1rm(db, user_id)
+        titles = dict(
+            db.execute(
+                select(Exercise.exercise_template_id, Exercise.exercise_title)
+                .where(Exercise.exercise_template_id.in_(batch.templates))
+            ).all()
+        ) if batch.templates else {}
+    out = exercise_trends(batch, today, weeks)
+    for row in out:
+        row["exercise_title"] = titles.get(row["exercise_template_id"]) or "Senza nome"
+    out.sort(key=lambda r: r["last_session_date"], reverse=True)
+    return out
+
+
+@router.get("/trends")
+async def trends(
+    request: Request,
+    weeks: int = Query(default=12, ge=2, le=104),
+    account: int = Depends(current_account),
+):
+    """
+    Per ogni esercizio: pendenza del miglior e1RM per workout nelle ultime `weeks` settimane
+    (kg e % a settimana), settimane dall'ultimo PR e flag di plateau. In cache per generazione.
+    """
+    return await trends_cached(request, account, weeks)
+
+
+async def trends_cached(request: Optional[Request], account: int, weeks: int) -> Dict[str, Any]:
+    today = local_today()
+    items = await get_or_compute_async(
+        "analysis_trends",
+        (account, weeks, today),
+        lambda: compute.run(_trends_job, account, today, weeks, request=request),
+    )
+    return {
+        "weeks": weeks,
+        "today": str(today),
+        "plateaus": sum(1 for r in items if r["plateau"]),
+        "exercises": items,
+    }
+
+
+@router.get("/load")
+def training_load(
+    db: Session = Depends(get_db),
+    d_from: date = Query(..., alias="from"),
+    d_to: date = Query(..., alias="to"),
+    account: int = Depends(current_account),
+):
+    """
+    Carico giornaliero (tonnellaggio), acute 7gg / chronic 28gg, ACWR, monotonia e strain,
+    totale e per gruppo radar. Al massimo MAX_RANGE_DAYS giorni; le righe coprono solo
+    i giorni dal primo allenamento a oggi.
+    """
+    if d_to < d_from:
+        raise HTTPException(status_code=400, detail="'to' must be >= 'from'")
+    if (d_to - d_from).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=422, detail=f"range must be at most {MAX_RANGE_DAYS} days")
+    return load_series(db, d_from, d_to, user_id=account)
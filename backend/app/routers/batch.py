@@ -0,0 +1,168 @@
+"""
+POST /api/batch: le richieste che una pagina fa al caricamento, in una sola chiamata.
+
+    {"queries": [{"query": "workouts", "params": {"year": 2025}},
+                 {"query": "dashboard_summary", "params": {"year": 2025}},
+                 {"query": "workout_types"}, {"query": "exercises"}, {"query": "records"}]}
+
+- un solo giro di rete, un solo checkout dal pool, un solo ensure_synced per tutto il batch
+- le sotto-query DB girano una dopo l'altra sulla stessa sessione, in un thread (la Session non
+  è thread-safe); quelle del pool di calcolo (analysis_*) non usano la sessione e partono in
+  parallelo
+- stessa logica e stesse cache dei singoli endpoint; gli errori restano per sotto-query
+  ({"status": 4xx/5xx, "detail": ...}), il batch risponde comunque 200
+- una risposta sola: sopra GZIP_MIN_BYTES la comprime il middleware di app.main
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.accounts import current_account
+from app.db import get_db
+from app.muscle_map import MuscleMap, get_muscle_map
+from app.responses import FastJSONResponse
+from app.routers.analysis import analysis_summary_cached, trends_cached
+from app.routers.dashboard import dashboard_calendar_data, dashboard_summary_cached
+from app.routers.exercises import list_exercises
+from app.routers.records import records_cached
+from app.routers.types import list_title_types, list_types
+from app.routers.workouts import workout_rows
+from app.schemas import BatchIn, BatchOut, BatchQueryIn
+from app.sync_service import ensure_synced
+from app.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/api", tags=["batch"], route_class=ProfiledRoute)
+
+MAX_QUERIES = 20
+
+
+def _int(p: Dict[str, Any], name: str, default: Optional[int] = None, required: bool = False) -> Optional[int]:
+    v = p.get(name)
+    if v is None:
+        if required:
+            raise HTTPException(status_code=422, detail=f"missing param '{name}'")
+        return default
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail=f"param '{name}' must be an integer")
+
+
+def _date(p: Dict[str, Any], name: str, required: bool = True) -> Optional[date]:
+    v = p.get(name)
+    if v is None:
+        if required:
+            raise HTTPException(status_code=422, detail=f"missing param '{name}'")
+        return None
+    try:
+        return date.fromisoformat(str(v))
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"param '{name}' must be YYYY-MM-DD")
+
+
+def _weeks(p: Dict[str, Any]) -> int:
+    weeks = _int(p, "weeks", 12)
+    if not 2 <= weeks <= 104:
+        raise HTTPException(status_code=422, detail="param 'weeks' must be between 2 and 104")
+    return weeks
+
+
+# sotto-query sul DB: (sessione, account, params) -> dati
+_DB_QUERIES: Dict[str, Callable[[Session, int, Dict[str, Any]], Any]] = {
+    "workouts": lambda db, account, p: workout_rows(
+        db, account, _int(p, "year"),
+        _date(p, "from", required=False), _date(p, "to", required=False),
+        bool(p.get("includeIgnored", False)),
+    ),
+    "workout_types": lambda db, account, p: list_types(db),
+    "workout_title_types": lambda db, account, p: list_title_types(db, account),
+    "exercises": lambda db, account, p: list_exercises(db, account),
+    "dashboard_summary": lambda db, account, p: dashboard_summary_cached(db, account, _int(p, "year", required=True)),
+    "dashboard_calendar": lambda db, account, p: dashboard_calendar_data(db, account, _int(p, "year", required=True)),
+    "records": lambda db, account, p: records_cached(
+        db, account, _int(p, "year"), p.get("metric", "max_weight"), _int(p, "reps")
+    ),
+}
+
+# sotto-query del pool di calcolo: niente sessione, la mappa muscoli si legge una volta prima
+_COMPUTE_QUERIES: Dict[str, Callable[[Request, MuscleMap, int, Dict[str, Any]], Awaitable[Any]]] = {
+    "analysis_summary": lambda request, mm, account, p: analysis_summary_cached(
+        request, mm, account, _date(p, "from"), _date(p, "to")
+    ),
+    "analysis_trends": lambda request, mm, account, p: trends_cached(request, account, _weeks(p)),
+}
+
+
+def _jsonable(data: Any) -> Any:
+    if isinstance(data, BaseModel):
+        return data.model_dump()
+    if isinstance(data, list) and data and isinstance(data[0], BaseModel):
+        return [d.model_dump() for d in data]
+    return data
+
+
+def _error(key: str, e: Exception) -> Dict[str, Any]:
+    if isinstance(e, HTTPException):
+        return {"status": e.status_code, "detail": e.detail}
+    print(f"[BATCH] {key}: {type(e).__name__}: {e}")
+    return {"status": 500, "detail": "Internal Server Error"}
+
+
+@router.get("/batch/queries", response_model=List[str])
+def batch_queries():
+    return sorted([*_DB_QUERIES, *_COMPUTE_QUERIES])
+
+
+@router.post("/batch", response_model=BatchOut)
+async def batch(
+    payload: BatchIn,
+    request: Request,
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    if len(payload.queries) > MAX_QUERIES:
+        raise HTTPException(status_code=422, detail=f"at most {MAX_QUERIES} queries per batch")
+    keyed: List[Tuple[str, BatchQueryIn]] = []
+    for q in payload.queries:
+        key = q.id or q.query
+        if any(k == key for k, _ in keyed):
+            raise HTTPException(status_code=422, detail=f"duplicate query id '{key}'")
+        keyed.append((key, q))
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for key, q in keyed:
+        if q.query not in _DB_QUERIES and q.query not in _COMPUTE_QUERIES:
+            results[key] = {"status": 404, "detail": f"unknown query '{q.query}'"}
+
+    await ensure_synced(db, account)  # una volta per tutto il batch
+
+    db_items = [(k, q) for k, q in keyed if q.query in _DB_QUERIES]
+    compute_items = [(k, q) for k, q in keyed if q.query in _COMPUTE_QUERIES]
+
+    def run_db() -> None:
+        for key, q in db_items:
+            try:
+                results[key] = {"status": 200, "data": _jsonable(_DB_QUERIES[q.query](db, account, q.params))}
+            except Exception as e:
+                db.rollback()
+                results[key] = _error(key, e)
+
+    async def run_compute(key: str, q: BatchQueryIn, mm: MuscleMap) -> None:
+        try:
+            results[key] = {"status": 200, "data": await _COMPUTE_QUERIES[q.query](request, mm, account, q.params)}
+        except Exception as e:
+            results[key] = _error(key, e)
+
+    mm = await run_in_threadpool(get_muscle_map, db) if compute_items else None
+    await asyncio.gather(
+        run_in_threadpool(run_db),
+        *(run_compute(key, q, mm) for key, q in compute_items),
+    )
+    return FastJSONResponse({"results": {key: results[key] for key, _ in keyed}})
@@ -1,70 +1,121 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from datetime import datetime
+from sqlalchemy import select, func, extract
 
+from app.accounts import current_account
+from app.cache import get_or_compute
 from app.db import get_db
 from app.models import Workout, ExerciseSet
-from app.schemas import DashboardSummaryOut
+from app.schemas import DashboardSummaryOut, CalendarHeatmapOut, CalendarDayOut
 from app.sync_service import ensure_synced
+from app.config import TZ
+from app.localtime import year_bounds
+from app.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/dashboard/summary", response_model=DashboardSummaryOut)
-async def dashboard_summary(year: int = Query(...), db: Session = Depends(get_db)):
-    await ensure_synced(db)
+async def dashboard_summary(
+    year: int = Query(...),
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    await ensure_synced(db, account)
+    return dashboard_summary_cached(db, account, year)
 
-    start = datetime(year, 1, 1)
-    end = datetime(year + 1, 1, 1)
 
-    workouts = db.execute(
-        select(Workout).where(
-            Workout.ignored == False,  # noqa
-            Workout.date >= start,
-            Workout.date < end,
-        )
-    ).scalars().all()
+def dashboard_summary_cached(db: Session, account: int, year: int) -> DashboardSummaryOut:
+    """in cache per generazione (app/cache.py); app/warmup.py la precalcola per l'anno corrente"""
+    return get_or_compute("dashboard_summary", (account, year), lambda: _dashboard_summary(db, account, year))
 
-    workouts_count = len(workouts)
-    training_days = len({(w.date.date() if w.date else None) for w in workouts if w.date})
 
-    # Sets in range, non ignored
-    sets = db.execute(
-        select(ExerciseSet, Workout).join(Workout, Workout.id == ExerciseSet.workout_id).where(
-            Workout.ignored == False,  # noqa
-            Workout.date >= start,
-            Workout.date < end,
-        )
-    ).all()
+def _dashboard_summary(db: Session, account: int, year: int) -> DashboardSummaryOut:
+    # anno e mesi sono quelli del calendario locale (Workout.local_date), aggregati lato SQL
+    start, end = year_bounds(year)
+    in_year = (
+        Workout.user_id == account,
+        Workout.ignored == False,  # noqa
+        Workout.local_date >= start,
+        Workout.local_date < end,
+    )
+    month = extract("month", Workout.local_date)
 
-    total_volume = 0.0
-    ex_names = set()
-    volume_by_month = [0.0] * 12
     workouts_by_month = [0] * 12
+    training_days = 0
+    for m, n_workouts, n_days in db.execute(
+        select(month, func.count(Workout.id), func.count(func.distinct(Workout.local_date)))
+        .where(*in_year)
+        .group_by(month)
+    ):
+        workouts_by_month[int(m) - 1] = int(n_workouts)
+        training_days += int(n_days)  # i giorni di mesi diversi sono disgiunti
 
-    for w in workouts:
-        if w.date:
-            workouts_by_month[w.date.month - 1] += 1
+    volume_by_month = [0.0] * 12
+    for m, volume in db.execute(
+        select(month, func.sum(ExerciseSet.volume_kg))
+        .join(ExerciseSet, ExerciseSet.workout_pk == Workout.pk)
+        .where(*in_year, ExerciseSet.volume_kg > 0)
+        .group_by(month)
+    ):
+        volume_by_month[int(m) - 1] = float(volume or 0.0)
 
-    for s, w in sets:
-        if s.weight_kg and s.reps:
-            v = float(s.weight_kg) * int(s.reps)
-            total_volume += v
-            if w.date:
-                volume_by_month[w.date.month - 1] += v
-        if s.exercise_title:
-            ex_names.add(s.exercise_title.strip().lower())
+    title = func.lower(func.trim(ExerciseSet.exercise_title))
+    unique_exercises = db.execute(
+        select(func.count(func.distinct(title)))
+        .join(Workout, Workout.pk == ExerciseSet.workout_pk)
+        .where(*in_year, title != "")
+    ).scalar() or 0
 
     # PR count: placeholder "numero record" calcolato lato client o con endpoint ad hoc
     pr_count = 0
 
     return DashboardSummaryOut(
         year=year,
-        workouts_count=workouts_count,
+        workouts_count=sum(workouts_by_month),
         training_days=training_days,
-        total_volume_kg=round(total_volume, 2),
-        unique_exercises=len(ex_names),
+        total_volume_kg=round(sum(volume_by_month), 2),
+        unique_exercises=int(unique_exercises),
         pr_count=pr_count,
         volume_by_month=[round(x, 2) for x in volume_by_month],
         workouts_by_month=workouts_by_month,
     )
+
+
+@router.get("/dashboard/calendar", response_model=CalendarHeatmapOut)
+async def dashboard_calendar(
+    year: int = Query(...),
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    """Heatmap annuale: workout e tonnellaggio per giorno locale (solo i giorni con attività)"""
+    await ensure_synced(db, account)
+    return dashboard_calendar_data(db, account, year)
+
+
+def dashboard_calendar_data(db: Session, account: int, year: int) -> CalendarHeatmapOut:
+    start, end = year_bounds(year)
+    rows = db.execute(
+        select(
+            Workout.local_date,
+            func.count(func.distinct(Workout.id)),
+            func.coalesce(func.sum(ExerciseSet.volume_kg), 0.0),
+        )
+        .outerjoin(ExerciseSet, ExerciseSet.workout_pk == Workout.pk)
+        .where(
+            Workout.user_id == account,
+            Workout.ignored == False,  # noqa
+            Workout.local_date >= start,
+            Workout.local_date < end,
+        )
+        .group_by(Workout.local_date)
+        .order_by(Workout.local_date)
+    ).all()
+
+    return CalendarHeatmapOut(
+        year=year,
+        tz=TZ,
+        days=[
+            CalendarDayOut(date=d, workouts=int(n), tonnage_kg=round(float(t or 0.0), 2))
+            for d, n, t in rows
+        ],
+    )
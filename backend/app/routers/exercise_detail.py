@@ -5,12 +5,14 @@ from typing import Optional, List, Dict, Any
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, case
 
+from app.accounts import current_account
 from app.db import get_db
 from app.models import Exercise, ExerciseSet, Workout
+from app.profiling import ProfiledRoute
 
-router = APIRouter(prefix="/api/exercises", tags=["exercises"])
+router = APIRouter(prefix="/api/exercises", tags=["exercises"], route_class=ProfiledRoute)
 
 def _parse_date(s: str) -> datetime:
     try:
@@ -25,9 +27,11 @@ def exercise_progress(
     from_: str = Query(..., alias="from"),
     to: str = Query(...),
     db: Session = Depends(get_db),
+    account: int = Depends(current_account),
 ) -> Dict[str, Any]:
-    dt_from = _parse_date(from_)
-    dt_to = _parse_date(to)
+    # giorni locali inclusivi (Workout.local_date, fuso config.TZ)
+    d_from = _parse_date(from_).date()
+    d_to = _parse_date(to).date()
 
     ex = (
         db.query(Exercise)
@@ -43,128 +47,56 @@ def exercise_progress(
     # workouts in range (ignora se vuoi includere anche ignored -> decidi tu)
     # io qui li includo TUTTI, poi se vuoi escludere gli ignored basta aggiungere Workout.ignored == False
     base_filter = and_(
+        ExerciseSet.user_id == account,
         ExerciseSet.exercise_template_id == template_id,
+        # join sulla stringa, non su workout_pk: (workout_id, template) lo cerca uq_set_key,
+        # ix_exercise_sets_workout_pk leggerebbe tutti i set di ogni workout del range
         Workout.id == ExerciseSet.workout_id,
-        Workout.date.isnot(None),
-        Workout.date >= dt_from,
-        Workout.date <= dt_to,
+        Workout.local_date.isnot(None),
+        Workout.local_date >= d_from,
+        Workout.local_date <= d_to,
     )
 
-    # (A) box: total sets
-    total_sets = (
-        db.query(func.count(ExerciseSet.id))
-        .join(Workout, Workout.id == ExerciseSet.workout_id)
-        .filter(base_filter)
-        .scalar()
-        or 0
-    )
-
-    # (B) box: workouts count
-    workouts_count = (
-        db.query(func.count(func.distinct(ExerciseSet.workout_id)))
-        .join(Workout, Workout.id == ExerciseSet.workout_id)
-        .filter(base_filter)
-        .scalar()
-        or 0
-    )
-
-    # (C) progress: prendo la serie con il PESO MASSIMO per ogni workout
-    # Se a pari peso ci sono più set, prendo quello con più reps; se ancora pari, quello col set_index più alto.
-
-    # 1) max peso per workout
-    sub_max_w = (
+    # (A/B) box: set totali, set di lavoro, workout in una query
+    total_sets, working_sets, workouts_count = (
         db.query(
-            ExerciseSet.workout_id.label("workout_id"),
-            func.max(ExerciseSet.weight_kg).label("max_w"),
+            func.count(ExerciseSet.id),
+            func.count(case((ExerciseSet.is_working_set == True, 1))),  # noqa: E712
+            func.count(func.distinct(ExerciseSet.workout_id)),
         )
         .join(Workout, Workout.id == ExerciseSet.workout_id)
         .filter(base_filter)
-        .filter(ExerciseSet.weight_kg.isnot(None))
-        .group_by(ExerciseSet.workout_id)
-        .subquery()
+        .one()
     )
 
-    # 2) tra i set col max peso, max reps per workout
-    sub_max_r = (
-        db.query(
-            ExerciseSet.workout_id.label("workout_id"),
-            func.max(ExerciseSet.reps).label("max_r"),
-        )
-        .join(Workout, Workout.id == ExerciseSet.workout_id)
-        .join(
-            sub_max_w,
-            and_(
-                sub_max_w.c.workout_id == ExerciseSet.workout_id,
-                sub_max_w.c.max_w == ExerciseSet.weight_kg,
-            ),
-        )
-        .filter(base_filter)
-        .group_by(ExerciseSet.workout_id)
-        .subquery()
-    )
-
-    # 3) a pari (max peso, max reps), max set_index per workout
-    sub_max_idx = (
-        db.query(
-            ExerciseSet.workout_id.label("workout_id"),
-            func.max(ExerciseSet.set_index).label("max_idx"),
-        )
-        .join(Workout, Workout.id == ExerciseSet.workout_id)
-        .join(
-            sub_max_w,
-            and_(
-                sub_max_w.c.workout_id == ExerciseSet.workout_id,
-                sub_max_w.c.max_w == ExerciseSet.weight_kg,
-            ),
-        )
-        .join(
-            sub_max_r,
-            and_(
-                sub_max_r.c.workout_id == ExerciseSet.workout_id,
-                sub_max_r.c.max_r == ExerciseSet.reps,
-            ),
-        )
-        .filter(base_filter)
-        .group_by(ExerciseSet.workout_id)
-        .subquery()
-    )
-
-    rows = (
+    # (C) progress: per ogni workout la serie di lavoro col PESO MASSIMO
+    # (a pari peso più reps, poi set_index più alto): una window function sull'indice
+    # (user_id, exercise_template_id, is_working_set, ...)
+    ranked = (
         db.query(
             Workout.date.label("date"),
             ExerciseSet.workout_id.label("workout_id"),
             ExerciseSet.weight_kg.label("weight_kg"),
             ExerciseSet.reps.label("reps"),
+            ExerciseSet.e1rm_kg.label("e1rm_kg"),
             ExerciseSet.set_index.label("set_index"),
             ExerciseSet.exercise_title.label("exercise_title"),
-        )
-        .join(
-            sub_max_w,
-            and_(
-                sub_max_w.c.workout_id == ExerciseSet.workout_id,
-                sub_max_w.c.max_w == ExerciseSet.weight_kg,
-            ),
-        )
-        .join(
-            sub_max_r,
-            and_(
-                sub_max_r.c.workout_id == ExerciseSet.workout_id,
-                sub_max_r.c.max_r == ExerciseSet.reps,
-            ),
-        )
-        .join(
-            sub_max_idx,
-            and_(
-                sub_max_idx.c.workout_id == ExerciseSet.workout_id,
-                sub_max_idx.c.max_idx == ExerciseSet.set_index,
-            ),
+            func.row_number().over(
+                partition_by=ExerciseSet.workout_id,
+                order_by=(
+                    ExerciseSet.weight_kg.desc(),
+                    func.coalesce(ExerciseSet.reps, -1).desc(),
+                    ExerciseSet.set_index.desc(),
+                ),
+            ).label("rn"),
         )
         .join(Workout, Workout.id == ExerciseSet.workout_id)
-        .filter(ExerciseSet.exercise_template_id == template_id)
-        .filter(Workout.date.isnot(None), Workout.date >= dt_from, Workout.date <= dt_to)
-        .order_by(Workout.date.asc())
-        .all()
+        .filter(base_filter)
+        .filter(ExerciseSet.is_working_set == True)  # noqa: E712
+        .filter(ExerciseSet.weight_kg.isnot(None))
+        .subquery()
     )
+    rows = db.query(ranked).filter(ranked.c.rn == 1).order_by(ranked.c.date.asc()).all()
 
     series: List[Dict[str, Any]] = []
     for r in rows:
@@ -173,6 +105,7 @@ def exercise_progress(
             "workout_id": r.workout_id,
             "weight_kg": float(r.weight_kg) if r.weight_kg is not None else None,
             "reps": int(r.reps) if r.reps is not None else None,
+            "e1rm_kg": round(float(r.e1rm_kg), 2) if r.e1rm_kg is not None else None,
             "set_index": int(r.set_index) if r.set_index is not None else None,
         })
         if not ex_title and r.exercise_title:
@@ -185,6 +118,7 @@ def exercise_progress(
         "to": to,
         "summary": {
             "total_sets": total_sets,
+            "working_sets": working_sets,
             "workouts_count": workouts_count,
         },
         "series": series,
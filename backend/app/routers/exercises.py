@@ -1,16 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import Table, delete, insert, or_, select, tuple_
 from sqlalchemy.orm import Session, selectinload
 
+from app.cache import bump_generation
+from app.accounts import current_account, visible_exercises
 from app.db import get_db
-from app.models import Exercise, Muscle, Equipment
-from app.schemas import ExerciseOut, ExerciseUpdateIn
+from app.models import Exercise, Muscle, Equipment, exercise_muscles, exercise_equipment
+from app.schemas import ExerciseOut, ExerciseUpdateIn, ExerciseBulkIn, ExerciseBulkItemIn, ExerciseBulkOut
+from app.training_load import training_load
+from app.profiling import ProfiledRoute
 
-router = APIRouter(prefix="/api/exercises", tags=["exercises"])
+router = APIRouter(prefix="/api/exercises", tags=["exercises"], route_class=ProfiledRoute)
 
 @router.get("", response_model=list[ExerciseOut])
-def list_exercises(db: Session = Depends(get_db)):
+def list_exercises(db: Session = Depends(get_db), account: int = Depends(current_account)):
     rows = (
         db.query(Exercise)
+        .filter(visible_exercises(account))
         .options(selectinload(Exercise.muscles), selectinload(Exercise.equipment))
         .order_by(Exercise.exercise_title.asc())
         .all()
@@ -26,52 +32,178 @@ def list_exercises(db: Session = Depends(get_db)):
         })
     return out
 
-@router.patch("/{exercise_id}", response_model=ExerciseOut)
-def update_exercise(exercise_id: int, payload: ExerciseUpdateIn, db: Session = Depends(get_db)):
-    ex = (
-        db.query(Exercise)
-        .options(selectinload(Exercise.muscles), selectinload(Exercise.equipment))
-        .get(exercise_id)
-    )
-    if not ex:
-        raise HTTPException(status_code=404, detail="Exercise not found")
-
-    if payload.muscles is not None:
-        muscles = []
-        for name in payload.muscles:
-            name = name.strip().lower()
-            if not name:
-                continue
-            m = db.query(Muscle).filter(Muscle.name == name).first()
-            if not m:
-                m = Muscle(name=name)
-                db.add(m)
-                db.flush()
-            muscles.append(m)
-        ex.muscles = muscles
-
-    if payload.equipment is not None:
-        equipment = []
-        for name in payload.equipment:
-            name = name.strip().lower()
-            if not name:
-                continue
-            eq = db.query(Equipment).filter(Equipment.name == name).first()
-            if not eq:
-                eq = Equipment(name=name)
-                db.add(eq)
-                db.flush()
-            equipment.append(eq)
-        ex.equipment = equipment
-
-    db.add(ex)
+
+def _clean(names: list[str] | None) -> list[str] | None:
+    if names is None:
+        return None
+    out = []
+    for n in names:
+        n = n.strip().lower()
+        if n and n not in out:
+            out.append(n)
+    return out
+
+
+def _resolve_names(db: Session, model, names: set[str], create: bool = True) -> dict[str, int]:
+    """nome -> id con una query IN; i mancanti si creano con un insert multi-riga (create=False: si ignorano)"""
+    if not names:
+        return {}
+    ids = dict(db.execute(select(model.name, model.id).where(model.name.in_(names))).all())
+    missing = names - ids.keys()
+    if missing and create:
+        db.execute(insert(model), [{"name": n} for n in sorted(missing)])
+        ids.update(db.execute(select(model.name, model.id).where(model.name.in_(missing))).all())
+    return ids
+
+
+def _sync_links(
+    db: Session,
+    table: Table,
+    col: str,
+    wanted: dict[int, list[str]],
+    ids: dict[str, int],
+    mode: str,
+) -> tuple[int, int]:
+    """\
+    Porta le righe di associazione allo stato voluto con un solo DELETE e un solo INSERT multi-riga,
+    calcolati come diff rispetto alle righe attuali. Ritorna (aggiunte, tolte).
+    """
+    current: dict[int, set[int]] = {ex_id: set() for ex_id in wanted}
+    for ex_id, other_id in db.execute(
+        select(table.c.exercise_id, table.c[col]).where(table.c.exercise_id.in_(wanted.keys()))
+    ):
+        current[ex_id].add(other_id)
+
+    to_add: list[dict] = []
+    to_remove: list[tuple[int, int]] = []
+    for ex_id, names in wanted.items():
+        target = {ids[n] for n in names if n in ids}  # in remove i nomi sconosciuti non ci sono
+        have = current[ex_id]
+        if mode == "add":
+            target = have | target
+        elif mode == "remove":
+            target = have - target
+        to_add.extend({"exercise_id": ex_id, col: o} for o in sorted(target - have))
+        to_remove.extend((ex_id, o) for o in sorted(have - target))
+
+    if to_remove:
+        db.execute(delete(table).where(tuple_(table.c.exercise_id, table.c[col]).in_(to_remove)))
+    if to_add:
+        db.execute(insert(table), to_add)
+    return len(to_add), len(to_remove)
+
+
+def _apply_updates(
+    db: Session, items: list[ExerciseBulkItemIn], mode: str = "replace", account: int | None = None
+) -> ExerciseBulkOut:
+    by_id = {i.id for i in items if i.id is not None}
+    by_template = {i.exercise_template_id for i in items if i.id is None and i.exercise_template_id}
+    if any(i.id is None and not i.exercise_template_id for i in items):
+        raise HTTPException(status_code=400, detail="Each item needs 'id' or 'exercise_template_id'")
+
+    conds = []
+    if by_id:
+        conds.append(Exercise.id.in_(by_id))
+    if by_template:
+        conds.append(Exercise.exercise_template_id.in_(by_template))
+    q = select(Exercise.id, Exercise.exercise_template_id, Exercise.exercise_title).where(or_(*conds))
+    if account is not None:
+        q = q.where(visible_exercises(account))  # niente modifiche agli esercizi custom di altri account
+    rows = db.execute(q).all() if conds else []
+    id_by_template = {t: i for i, t, _ in rows if t}
+    known = {i: (t, title) for i, t, title in rows}
+
+    missing = [i.id for i in items if i.id is not None and i.id not in known]
+    missing += [i.exercise_template_id for i in items if i.id is None and i.exercise_template_id not in id_by_template]
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Exercise not found", "missing": missing})
+
+    # l'ultimo item vince se lo stesso esercizio compare più volte
+    muscles_wanted: dict[int, list[str]] = {}
+    equipment_wanted: dict[int, list[str]] = {}
+    for it in items:
+        ex_id = it.id if it.id is not None else id_by_template[it.exercise_template_id]
+        if (m := _clean(it.muscles)) is not None:
+            muscles_wanted[ex_id] = m
+        if (e := _clean(it.equipment)) is not None:
+            equipment_wanted[ex_id] = e
+
+    # solo replace/add creano muscoli e attrezzatura nuovi: togliere un nome sconosciuto non fa nulla
+    create = mode != "remove"
+    muscle_ids = _resolve_names(db, Muscle, {n for v in muscles_wanted.values() for n in v}, create)
+    equipment_ids = _resolve_names(db, Equipment, {n for v in equipment_wanted.values() for n in v}, create)
+
+    m_add, m_rm = _sync_links(db, exercise_muscles, "muscle_id", muscles_wanted, muscle_ids, mode)
+    e_add, e_rm = _sync_links(db, exercise_equipment, "equipment_id", equipment_wanted, equipment_ids, mode)
+
+    # nomi per la risposta: servono anche quelli non toccati in questa richiesta
+    touched = {it.id if it.id is not None else id_by_template[it.exercise_template_id] for it in items}
+    links = {
+        "muscles": (exercise_muscles, "muscle_id", Muscle),
+        "equipment": (exercise_equipment, "equipment_id", Equipment),
+    }
+    names_out: dict[str, dict[int, list[str]]] = {}
+    for key, (table, col, model) in links.items():
+        per_ex: dict[int, list[str]] = {ex_id: [] for ex_id in touched}
+        for ex_id, name in db.execute(
+            select(table.c.exercise_id, model.name)
+            .join(model, model.id == table.c[col])
+            .where(table.c.exercise_id.in_(touched))
+            .order_by(model.name)
+        ):
+            per_ex[ex_id].append(name)
+        names_out[key] = per_ex
+
     db.commit()
-    db.refresh(ex)
-
-    return {
-        "id": ex.id,
-        "exercise_title": ex.exercise_title,
-        "exercise_template_id": ex.exercise_template_id,
-        "muscles": [m.name for m in ex.muscles],
-        "equipment": [x.name for x in ex.equipment],
-    }
\ No newline at end of file
+    if m_add or m_rm or e_add or e_rm:
+        bump_generation()
+    if m_add or m_rm:
+        training_load.mark_dirty(None)  # i gruppi muscolari degli esercizi sono cambiati
+
+    return ExerciseBulkOut(
+        updated=len(touched),
+        links_added=m_add + e_add,
+        links_removed=m_rm + e_rm,
+        exercises=[
+            ExerciseOut(
+                id=ex_id,
+                exercise_title=known[ex_id][1],
+                exercise_template_id=known[ex_id][0],
+                muscles=names_out["muscles"][ex_id],
+                equipment=names_out["equipment"][ex_id],
+            )
+            for ex_id in sorted(touched, key=lambda i: known[i][1].lower())
+        ],
+    )
+
+
+@router.patch(":bulk", response_model=ExerciseBulkOut)
+def bulk_update_exercises(
+    payload: ExerciseBulkIn,
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    """
+    Muscoli/attrezzatura di molti esercizi in una sola transazione:
+    nomi risolti con una query IN, associazioni scritte come diff con insert/delete multi-riga.
+    """
+    if not payload.items:
+        return ExerciseBulkOut(updated=0)
+    return _apply_updates(db, payload.items, payload.mode, account)
+
+
+@router.patch("/{exercise_id}", response_model=ExerciseOut)
+def update_exercise(
+    exercise_id: int,
+    payload: ExerciseUpdateIn,
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    item = ExerciseBulkItemIn(id=exercise_id, muscles=payload.muscles, equipment=payload.equipment)
+    try:
+        out = _apply_updates(db, [item], account=account)
+    except HTTPException as e:
+        if e.status_code == 404:
+            raise HTTPException(status_code=404, detail="Exercise not found")
+        raise
+    return out.exercises[0]
@@ -0,0 +1,163 @@
+"""
+Export completo dello storico (workout + set) in streaming, a memoria costante.
+
+- /api/export/workouts.ndjson: una riga JSON per workout, con i set annidati
+- /api/export/workouts.csv: una riga per set, con le colonne del workout ripetute
+
+Le righe arrivano da un cursore lato server (yield_per): il generatore apre la sua sessione,
+raggruppa per workout le righe consecutive e manda chunk da ~CHUNK_BYTES.
+"""
+from __future__ import annotations
+
+import csv
+import io
+from datetime import date
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app.accounts import current_account
+from app.db import SessionLocal, get_engine
+from app.models import ExerciseSet, Workout
+from app.responses import dumps
+from app.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/api/export", tags=["export"], route_class=ProfiledRoute)
+
+YIELD_PER = 1000
+CHUNK_BYTES = 64 * 1024
+
+WORKOUT_COLS = [
+    Workout.id, Workout.title, Workout.date, Workout.local_date, Workout.start_time,
+    Workout.end_time, Workout.duration_seconds, Workout.ignored, Workout.type_id,
+]
+SET_COLS = [
+    ExerciseSet.exercise_title, ExerciseSet.exercise_template_id, ExerciseSet.set_index,
+    ExerciseSet.set_type, ExerciseSet.weight_kg, ExerciseSet.reps, ExerciseSet.distance,
+    ExerciseSet.duration_seconds,
+]
+CSV_HEADER = [
+    "workout_id", "title", "date", "local_date", "start_time", "end_time", "duration_seconds",
+    "ignored", "type_id", "exercise_title", "exercise_template_id", "set_index", "set_type",
+    "weight_kg", "reps", "distance_meters", "set_duration_seconds",
+]
+
+
+def _stmt(account: int, d_from: Optional[date], d_to: Optional[date], include_ignored: bool):
+    stmt = (
+        select(*WORKOUT_COLS, *SET_COLS)
+        .outerjoin(ExerciseSet, ExerciseSet.workout_id == Workout.id)
+        .where(Workout.user_id == account)
+        # righe dello stesso workout consecutive: si raggruppano in streaming.
+        # workout in ordine di ix_workouts_user_date; dentro il workout i set per id, cioè
+        # nell'ordine del payload (esercizi come nella sessione, anche quelli senza template)
+        .order_by(Workout.date, Workout.id, ExerciseSet.id)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    if not include_ignored:
+        stmt = stmt.where(Workout.ignored == False)  # noqa: E712
+    if d_from is not None:
+        stmt = stmt.where(Workout.local_date >= d_from)
+    if d_to is not None:
+        stmt = stmt.where(Workout.local_date <= d_to)
+    return stmt
+
+
+def _rows(stmt) -> Iterator[tuple]:
+    get_engine()
+    db = SessionLocal()
+    try:
+        yield from db.execute(stmt)
+    finally:
+        db.close()
+
+
+def _chunked(parts: Iterator[str]) -> Iterator[bytes]:
+    # il primo pezzo parte subito (primo byte immediato), poi chunk da ~CHUNK_BYTES
+    first = next(parts, None)
+    if first is None:
+        return
+    yield first.encode("utf-8")
+    buf: list[str] = []
+    size = 0
+    for p in parts:
+        buf.append(p)
+        size += len(p)
+        if size >= CHUNK_BYTES:
+            yield "".join(buf).encode("utf-8")
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def _ndjson(stmt) -> Iterator[str]:
+    n_w = len(WORKOUT_COLS)
+    current: Optional[dict] = None
+    for r in _rows(stmt):
+        if current is None or current["id"] != r[0]:
+            if current is not None:
+                yield dumps(current).decode("utf-8") + "\n"
+            current = dict(zip(("id", "title", "date", "local_date", "start_time", "end_time",
+                                "duration_seconds", "ignored", "type_id"), r[:n_w]))
+            current["ignored"] = bool(current["ignored"])
+            current["sets"] = []
+        s = r[n_w:]
+        if s[2] is not None:  # set_index: NULL = workout senza set (outer join)
+            current["sets"].append({
+                "exercise_title": s[0],
+                "exercise_template_id": s[1],
+                "set_index": s[2],
+                "set_type": s[3],
+                "weight_kg": s[4],
+                "reps": s[5],
+                "distance_meters": s[6],
+                "duration_seconds": s[7],
+            })
+    if current is not None:
+        yield dumps(current).decode("utf-8") + "\n"
+
+
+def _csv(stmt) -> Iterator[str]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_HEADER)
+    yield out.getvalue()  # l'header parte subito, prima della query
+    for r in _rows(stmt):
+        out.seek(0)
+        out.truncate()
+        row = list(r)
+        row[7] = int(bool(row[7]))  # ignored
+        writer.writerow(["" if v is None else v.isoformat() if isinstance(v, date) else v for v in row])
+        yield out.getvalue()
+
+
+def _response(parts: Iterator[str], media_type: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        _chunked(parts),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/workouts.ndjson")
+def export_ndjson(
+    d_from: Optional[date] = Query(default=None, alias="from"),
+    d_to: Optional[date] = Query(default=None, alias="to"),
+    includeIgnored: bool = Query(default=False),
+    account: int = Depends(current_account),
+):
+    """Un workout per riga (JSON) con i suoi set; from/to sono giorni locali inclusivi"""
+    return _response(_ndjson(_stmt(account, d_from, d_to, includeIgnored)), "application/x-ndjson", "workouts.ndjson")
+
+
+@router.get("/workouts.csv")
+def export_csv(
+    d_from: Optional[date] = Query(default=None, alias="from"),
+    d_to: Optional[date] = Query(default=None, alias="to"),
+    includeIgnored: bool = Query(default=False),
+    account: int = Depends(current_account),
+):
+    """Un set per riga; i workout senza set compaiono con le colonne del set vuote"""
+    return _response(_csv(_stmt(account, d_from, d_to, includeIgnored)), "text/csv; charset=utf-8", "workouts.csv")
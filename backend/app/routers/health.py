@@ -1,11 +1,12 @@
 from fastapi import APIRouter
-from app.db import engine
+from app.db import get_engine
+from app.profiling import ProfiledRoute
 from sqlalchemy import text
 
-router = APIRouter(tags=["health"])
+router = APIRouter(tags=["health"], route_class=ProfiledRoute)
 
 @router.get("/health")
 def health():
-    with engine.connect() as conn:
+    with get_engine().connect() as conn:
         conn.execute(text("SELECT 1"))
     return {"ok": True}
@@ -1,15 +1,23 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from app.db import get_db
+from app.accounts import current_account
+from app.cache import bump_generation
+from app.db import get_db, live_writes
 from app.models import Workout
+from app.training_load import training_load
+from app.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.post("/ignored/{workout_id}")
-def toggle_ignored(workout_id: str, db: Session = Depends(get_db)):
-    w = db.get(Workout, workout_id)
-    if not w:
-        return {"ok": False, "message": "workout not found"}
-    w.ignored = not bool(w.ignored)
-    db.commit()
+def toggle_ignored(workout_id: str, db: Session = Depends(get_db), account: int = Depends(current_account)):
+    with live_writes.writing():
+        w = db.get(Workout, workout_id)
+        if not w or w.user_id != account:
+            return {"ok": False, "message": "workout not found"}
+        w.ignored = not bool(w.ignored)
+        db.commit()
+    bump_generation()
+    if w.local_date:
+        training_load.mark_dirty([w.local_date], account)
     return {"ok": True, "workout_id": workout_id, "ignored": bool(w.ignored)}
@@ -0,0 +1,54 @@
+import io
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.accounts import current_account
+from app.db import get_db
+from app.importer import import_hevy_csv
+from app.schemas import ImportOut
+from app.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/api/import", tags=["import"], route_class=ProfiledRoute)
+
+# oltre questa soglia l'upload finisce su disco invece che in RAM
+SPOOL_BYTES = 8 * 1024 * 1024
+
+
+def _import_upload(db: Session, spool, account: int) -> ImportOut:
+    spool.seek(0)
+    text = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+    try:
+        return ImportOut(**import_hevy_csv(db, text, user_id=account).as_dict())
+    finally:
+        text.detach()
+
+
+@router.post("/hevy-csv", response_model=ImportOut)
+async def import_hevy_csv_export(
+    request: Request,
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    """
+    Export CSV dell'app Hevy nel body (Content-Type text/csv); i file locali si importano
+    da riga di comando (python -m app.importer), mai da HTTP.
+    Il body si copia a chunk in un file temporaneo e il parsing/insert gira nel threadpool.
+    """
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+            async for chunk in request.stream():
+                spool.write(chunk)
+            if spool.tell() == 0:
+                raise HTTPException(status_code=400, detail="Empty body: send the CSV")
+            return await run_in_threadpool(_import_upload, db, spool, account)
+    except (ValueError, UnicodeDecodeError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError as e:
+        db.rollback()
+        print(f"[IMPORT] IntegrityError: {e.orig}")
+        raise HTTPException(status_code=409, detail="CSV conflicts with existing data")
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.metrics import render_all
+from app.profiling import ProfiledRoute
+
+router = APIRouter(tags=["metrics"], route_class=ProfiledRoute)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # formato Prometheus text exposition
+    return PlainTextResponse(render_all(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,22 +1,21 @@
 from __future__ import annotations
 
-from datetime import datetime
-
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select
+from sqlalchemy import and_, func, select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from app.accounts import current_account
+from app.cache import get_or_compute
 from app.db import get_db
 from app.models import ExerciseSet, Workout
 from app.schemas import RecordRow
 from app.sync_service import ensure_synced
+from app.localtime import year_bounds
+from app.responses import FastJSONResponse
+from app.profiling import ProfiledRoute
 
-router = APIRouter()
-
-
-def epley_e1rm(weight: float, reps: int) -> float:
-    # Epley: 1RM = w * (1 + reps/30)
-    return weight * (1.0 + (reps / 30.0))
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.get("/records", response_model=list[RecordRow])
@@ -25,75 +24,81 @@ async def records(
     metric: str = Query(default="max_weight"),  # max_weight | e1rm | max_weight_at_reps
     reps: int | None = Query(default=None),
     db: Session = Depends(get_db),
+    account: int = Depends(current_account),
 ):
-    await ensure_synced(db)
+    await ensure_synced(db, account)
+    # su tutti gli anni la query scorre tutti i set: fuori dall'event loop, così /health e le
+    # altre richieste async non aspettano
+    return FastJSONResponse(await run_in_threadpool(records_cached, db, account, year, metric, reps))
+
+
+def records_cached(db: Session, account: int, year: int | None, metric: str, reps: int | None) -> list[dict]:
+    """in cache per generazione (app/cache.py); app/warmup.py precalcola tutti gli anni, max_weight ed e1rm"""
+    return get_or_compute("records", (account, year, metric, reps), lambda: _records(db, account, year, metric, reps))
+
+
+def _records(db: Session, account: int, year: int | None, metric: str, reps: int | None) -> list[dict]:
+    # best per esercizio (template_id, altrimenti titolo normalizzato) scelto in SQL:
+    # solo set di lavoro con peso, e1RM già salvato per set (app/set_metrics.py)
+    key = func.coalesce(ExerciseSet.exercise_template_id, func.lower(func.trim(ExerciseSet.exercise_title)))
+    score = ExerciseSet.e1rm_kg if metric == "e1rm" else ExerciseSet.weight_kg
+    conds = [
+        Workout.user_id == account,
+        Workout.ignored == False,  # noqa
+        ExerciseSet.is_working_set == True,  # noqa
+        ExerciseSet.is_weighted == True,  # noqa
+        score.is_not(None),
+    ]
+    if metric == "max_weight_at_reps":
+        if reps is None:
+            return []
+        conds.append(ExerciseSet.reps == reps)
 
-    # Base query: join sets -> workout, exclude ignored, keep only valid weights
-    stmt = (
+    # Optional filter by year
+    if year is not None:
+        start, end = year_bounds(year)
+        conds += [Workout.local_date >= start, Workout.local_date < end]
+
+    # max per esercizio con un GROUP BY, poi si ripescano solo i set che lo raggiungono
+    # (a parità di valore vince il più vecchio): niente sort di tutti i set come con una window
+    best = (
+        select(key.label("key"), func.max(score).label("value"))
+        .join(Workout, Workout.pk == ExerciseSet.workout_pk)
+        .where(*conds)
+        .group_by(key)
+        .subquery()
+    )
+    ranked = (
         select(
             ExerciseSet.exercise_title,
             ExerciseSet.exercise_template_id,
-            ExerciseSet.weight_kg,
             ExerciseSet.reps,
+            score.label("value"),
             Workout.id.label("workout_id"),
             Workout.title.label("workout_title"),
             Workout.date.label("workout_date"),
+            func.row_number().over(partition_by=key, order_by=Workout.date).label("rn"),
         )
-        .join(Workout, Workout.id == ExerciseSet.workout_id)
-        .where(Workout.ignored == False)  # noqa
-        .where(ExerciseSet.weight_kg.isnot(None))
-        .where(ExerciseSet.weight_kg > 0)
+        .join(Workout, Workout.pk == ExerciseSet.workout_pk)
+        .join(best, and_(best.c.key == key, best.c.value == score))
+        .where(*conds)
+        .subquery()
     )
-
-    # Optional filter by year
-    if year is not None:
-        start = datetime(year, 1, 1)
-        end = datetime(year + 1, 1, 1)
-        stmt = stmt.where(Workout.date >= start, Workout.date < end)
-
-    rows = db.execute(stmt).all()
-
-    # Pick best per exercise (template_id preferred, else normalized title)
-    best: dict[str, dict] = {}
-
-    for r in rows:
-        title = (r.exercise_title or "").strip()
-        key = (r.exercise_template_id or title.lower() or "unknown")
-
-        w = float(r.weight_kg or 0.0)
-        rep = int(r.reps) if r.reps is not None else None
-
-        # Score selection
-        if metric == "max_weight_at_reps":
-            # only include exact reps if provided
-            if reps is None or rep is None or rep != reps:
-                continue
-            score = w
-        elif metric == "e1rm":
-            if rep is None or rep <= 0:
-                continue
-            score = epley_e1rm(w, rep)
-        else:
-            # default: max_weight
-            score = w
-
-        curr = best.get(key)
-        if curr is None or score > float(curr["value"]):
-            best[key] = {
-                # REQUIRED by RecordRow
-                "exercise_title": title or "Unknown",
-                "metric": metric,
-                "value": float(score),
-                # optional fields
-                "reps": rep,
-                "date": r.workout_date,
-                "workout_id": r.workout_id,
-                "workout_title": r.workout_title,
-                "exercise_template_id": r.exercise_template_id,
-            }
-
-    out = [RecordRow(**v) for v in best.values()]
-
-    # Sort by "value" desc (works for all metrics because value = chosen score)
-    out.sort(key=lambda x: (x.value or 0.0), reverse=True)
-    return out
\ No newline at end of file
+    rows = db.execute(select(ranked).where(ranked.c.rn == 1).order_by(ranked.c.value.desc())).all()
+
+    # i dict hanno già la forma di RecordRow: encoding diretto, senza rivalidare
+    return [
+        {
+            # REQUIRED by RecordRow
+            "exercise_title": (r.exercise_title or "").strip() or "Unknown",
+            "metric": metric,
+            "value": float(r.value),
+            # optional fields
+            "reps": r.reps,
+            "date": r.workout_date,
+            "workout_id": r.workout_id,
+            "workout_title": r.workout_title,
+            "exercise_template_id": r.exercise_template_id,
+        }
+        for r in rows
+    ]
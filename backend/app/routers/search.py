@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.accounts import current_account
+from app.db import get_db
+from app.schemas import SearchOut
+from app.search import get_search_index
+from app.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+KINDS = {"workout_title", "exercise", "muscle", "equipment"}
+
+
+@router.get("/search", response_model=SearchOut)
+def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(default=20, ge=1, le=100),
+    kinds: str | None = Query(default=None, description="es. exercise,muscle"),
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    """Ricerca fuzzy/prefisso su titoli workout, esercizi, muscoli e attrezzatura"""
+    wanted = {k.strip() for k in kinds.split(",") if k.strip() in KINDS} if kinds else None
+    return SearchOut(q=q, results=get_search_index(db, account).search(q, limit, wanted))
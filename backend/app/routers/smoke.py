@@ -4,8 +4,9 @@ from sqlalchemy import func
 
 from app.db import get_db
 from app.models import Workout
+from app.profiling import ProfiledRoute
 
-router = APIRouter(prefix="/api", tags=["smoke"])
+router = APIRouter(prefix="/api", tags=["smoke"], route_class=ProfiledRoute)
 
 @router.get("/smoke")
 def smoke(db: Session = Depends(get_db)):
@@ -1,26 +1,47 @@
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
+from app.accounts import current_account
 from app.db import get_db
-from app.sync_service import ensure_synced, full_sync
-from app.hevy_client import HevyClient
-from app.config import HEVY_BASE_URL
+from app.rebuild import rebuild_sync
+from app.sync_service import client_for, ensure_synced, full_sync, get_sync_state
+from app.profiling import ProfiledRoute
 
-router = APIRouter(prefix="/api", tags=["sync"])
+router = APIRouter(prefix="/api", tags=["sync"], route_class=ProfiledRoute)
 
 @router.post("/sync")
 async def sync_now(
     force: bool = Query(default=False),
+    rebuild: bool = Query(default=False),
     db: Session = Depends(get_db),
+    account: int = Depends(current_account),
 ):
     """
-    force=false -> usa ensure_synced (cooldown)
-    force=true  -> forza full_sync completo
+    force=false   -> usa ensure_synced (cooldown)
+    force=true    -> forza full_sync completo
+    rebuild=true  -> sync completo su tabelle ombra + scambio atomico (app/rebuild.py)
     """
+    if rebuild:
+        started = datetime.now(timezone.utc)
+        try:
+            stats = await rebuild_sync(client_for(db, account), account)
+        except HTTPException:
+            raise  # 409: c'è già un rebuild in corso, non è un errore di sync
+        except Exception as e:
+            # lo stato si legge solo dopo il rebuild: nessuna transazione aperta durante lo scambio
+            get_sync_state(db, account).last_error = f"{type(e).__name__}: {e}"[:255]
+            db.commit()
+            raise
+        state = get_sync_state(db, account)
+        state.last_sync_ts = started
+        state.last_error = None
+        db.commit()
+        return {"ok": True, "forced": True, "rebuild": stats.as_dict()}
     if force:
-        client = HevyClient(HEVY_BASE_URL)
-        await full_sync(db, client)
+        await full_sync(db, client_for(db, account), account)
     else:
-        await ensure_synced(db)
+        await ensure_synced(db, account)
 
     return {"ok": True, "forced": force}
\ No newline at end of file
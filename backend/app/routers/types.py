@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import select
-from app.db import get_db
+from app.accounts import current_account
+from app.cache import bump_generation
+from app.db import get_db, live_writes
 from app.models import WorkoutType, Workout
 from app.schemas import WorkoutTypeOut, AssignWorkoutTypeIn
+from app.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/workout-types", response_model=list[WorkoutTypeOut])
 def list_types(db: Session = Depends(get_db)):
@@ -13,22 +16,28 @@ def list_types(db: Session = Depends(get_db)):
     return [WorkoutTypeOut(id=t.id, name=t.name) for t in rows]
 
 @router.post("/workout-types/assign")
-def assign_type(payload: AssignWorkoutTypeIn, db: Session = Depends(get_db)):
-    w = db.get(Workout, payload.workout_id)
-    if not w:
-        return {"ok": False, "message": "workout not found"}
-    w.type_id = payload.type_id
-    db.commit()
+def assign_type(
+    payload: AssignWorkoutTypeIn,
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    with live_writes.writing():
+        w = db.get(Workout, payload.workout_id)
+        if not w or w.user_id != account:
+            return {"ok": False, "message": "workout not found"}
+        w.type_id = payload.type_id
+        db.commit()
+    bump_generation()
     return {"ok": True}
 
 from sqlalchemy import func
 
 @router.get("/workout-title-types", response_model=list[str])
-def list_title_types(db: Session = Depends(get_db)):
+def list_title_types(db: Session = Depends(get_db), account: int = Depends(current_account)):
     # titoli distinti, ordinati
     rows = db.execute(
         select(Workout.title)
-        .where(Workout.title.isnot(None))
+        .where(Workout.user_id == account, Workout.title.isnot(None))
         .group_by(Workout.title)
         .order_by(func.lower(Workout.title).asc())
     ).all()
@@ -1,80 +1,91 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import select
-from datetime import datetime
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, bindparam, select, func, case, false, exists
+from datetime import date
 
+from app.accounts import current_account
 from app.db import get_db
 from app.models import Workout, ExerciseSet
-from app.schemas import WorkoutOut, WorkoutDetailOut, ExerciseSetOut
+from app.schemas import (
+    WorkoutOut, WorkoutDetailOut,
+    WorkoutCompareOut, CompareSessionOut, CompareStatsOut, ExerciseCompareRow,
+    SimilarWorkoutOut,
+)
 from app.sync_service import ensure_synced
+from app.localtime import year_bounds
+from app.similarity import decode_signature, get_similarity_index
+from app.responses import FastJSONResponse
+from app.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/workouts", response_model=list[WorkoutOut])
 async def list_workouts(
     year: int | None = Query(default=None),
-    date_from: str | None = Query(default=None, alias="from"),
-    date_to: str | None = Query(default=None, alias="to"),
+    date_from: date | None = Query(default=None, alias="from"),
+    date_to: date | None = Query(default=None, alias="to"),
     includeIgnored: bool = Query(default=False),
     db: Session = Depends(get_db),
+    account: int = Depends(current_account),
 ):
-    await ensure_synced(db)
+    """from/to: giorni locali (TZ configurata), estremi inclusi"""
+    await ensure_synced(db, account)
+    return FastJSONResponse(workout_rows(db, account, year, date_from, date_to, includeIgnored))
 
-    stmt = select(Workout)
-    if not includeIgnored:
-        stmt = stmt.where(Workout.ignored == False)  # noqa
+
+def workout_rows(
+    db: Session,
+    account: int,
+    year: int | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    include_ignored: bool = False,
+) -> list[dict]:
+    conds = [Workout.user_id == account]
+    if not include_ignored:
+        conds.append(Workout.ignored == False)  # noqa
 
     if year:
-        start = datetime(year, 1, 1)
-        end = datetime(year + 1, 1, 1)
-        stmt = stmt.where(Workout.date >= start, Workout.date < end)
+        start, end = year_bounds(year)
+        conds += [Workout.local_date >= start, Workout.local_date < end]
 
     if date_from:
-        stmt = stmt.where(Workout.date >= datetime.fromisoformat(date_from))
+        conds.append(Workout.local_date >= date_from)
     if date_to:
-        stmt = stmt.where(Workout.date <= datetime.fromisoformat(date_to))
-
-    stmt = stmt.order_by(Workout.date.desc())
-    rows = db.execute(stmt).scalars().all()
-
-    workout_ids = [w.id for w in rows]
-    agg_by_workout: dict[str, dict[str, float | int]] = {wid: {"sets": 0, "volume": 0.0, "exercises": 0} for wid in workout_ids}
+        conds.append(Workout.local_date <= date_to)
 
-    if workout_ids:
-        seen_exercises: dict[str, set[str]] = {wid: set() for wid in workout_ids}
+    rows = db.execute(select(Workout).where(*conds).order_by(Workout.date.desc())).scalars().all()
 
-        sets_full = db.execute(
+    # set, volume ed esercizi per workout aggregati in SQL (volume_kg già calcolato per set)
+    agg_by_workout: dict[int, dict[str, float | int]] = {}
+    if rows:
+        titled = case((ExerciseSet.exercise_title != "", ExerciseSet.exercise_title))
+        for pk, n_sets, volume, n_exercises in db.execute(
             select(
-                ExerciseSet.workout_id,
-                ExerciseSet.exercise_title,
-                ExerciseSet.weight_kg,
-                ExerciseSet.reps,
-            ).where(ExerciseSet.workout_id.in_(workout_ids))
-        ).all()
-
-        for wid, title, weight, reps in sets_full:
-            agg_by_workout[wid]["sets"] += 1
-            if title:
-                seen_exercises[wid].add(title)
-            w = float(weight or 0)
-            r = int(reps or 0)
-            agg_by_workout[wid]["volume"] += w * r
-
-        for wid in workout_ids:
-            agg_by_workout[wid]["exercises"] = len(seen_exercises[wid])
+                ExerciseSet.workout_pk,
+                func.count(),
+                func.coalesce(func.sum(ExerciseSet.volume_kg), 0.0),
+                func.count(func.distinct(titled)),
+            )
+            .join(Workout, Workout.pk == ExerciseSet.workout_pk)
+            .where(*conds)
+            .group_by(ExerciseSet.workout_pk)
+        ):
+            agg_by_workout[pk] = {"sets": n_sets, "volume": volume, "exercises": n_exercises}
 
+    # righe già nella forma di WorkoutOut: niente modelli Pydantic né seconda validazione
     return [
-        WorkoutOut(
-            id=w.id,
-            title=w.title,
-            date=w.date,
-            duration_seconds=w.duration_seconds,
-            ignored=bool(w.ignored),
-            type_id=w.type_id,
-            exercises_count=int(agg_by_workout[w.id]["exercises"]) if w.id in agg_by_workout else 0,
-            sets_count=int(agg_by_workout[w.id]["sets"]) if w.id in agg_by_workout else 0,
-            volume_kg=float(agg_by_workout[w.id]["volume"]) if w.id in agg_by_workout else 0.0,
-        )
+        {
+            "id": w.id,
+            "title": w.title,
+            "date": w.date,
+            "duration_seconds": w.duration_seconds,
+            "ignored": bool(w.ignored),
+            "type_id": w.type_id,
+            "exercises_count": int(agg_by_workout[w.pk]["exercises"]) if w.pk in agg_by_workout else 0,
+            "sets_count": int(agg_by_workout[w.pk]["sets"]) if w.pk in agg_by_workout else 0,
+            "volume_kg": float(agg_by_workout[w.pk]["volume"]) if w.pk in agg_by_workout else 0.0,
+        }
         for w in rows
     ]
 
@@ -83,40 +94,287 @@ async def list_workouts(
 async def get_workout_detail(
     workout_id: str,
     db: Session = Depends(get_db),
+    account: int = Depends(current_account),
 ):
     # opzionale: non serve sync sempre, ma utile se vuoi che un id appena arrivato sia disponibile
-    await ensure_synced(db)
+    await ensure_synced(db, account)
 
-    w = db.execute(select(Workout).where(Workout.id == workout_id)).scalar_one_or_none()
+    w = db.execute(
+        select(Workout).where(Workout.id == workout_id, Workout.user_id == account)
+    ).scalar_one_or_none()
     if not w:
         raise HTTPException(status_code=404, detail="Workout not found")
 
     sets_stmt = (
         select(ExerciseSet)
-        .where(ExerciseSet.workout_id == workout_id)
+        .where(ExerciseSet.workout_pk == w.pk)
         .order_by(ExerciseSet.exercise_title.asc(), ExerciseSet.set_index.asc())
     )
     sets_rows = db.execute(sets_stmt).scalars().all()
 
-    return WorkoutDetailOut(
-        id=w.id,
-        title=w.title,
-        date=w.date,
-        duration_seconds=w.duration_seconds,
-        ignored=bool(w.ignored),
-        type_id=w.type_id,
-        sets=[
-            ExerciseSetOut(
-                workout_id=s.workout_id,
-                exercise_title=s.exercise_title,
-                exercise_template_id=s.exercise_template_id,
-                set_index=s.set_index,
-                reps=s.reps,
-                weight_kg=float(s.weight_kg or 0),
-                distance_meters=float(s.distance or 0),
-                duration_seconds=int(s.duration_seconds or 0),
-                set_type=s.set_type,
-            )
+    return FastJSONResponse({
+        "id": w.id,
+        "title": w.title,
+        "date": w.date,
+        "duration_seconds": w.duration_seconds,
+        "ignored": bool(w.ignored),
+        "type_id": w.type_id,
+        "exercises_count": len({s.exercise_title for s in sets_rows if s.exercise_title}),
+        "sets_count": len(sets_rows),
+        "volume_kg": float(sum(s.volume_kg or 0.0 for s in sets_rows)),
+        "sets": [
+            {
+                "workout_id": s.workout_id,
+                "exercise_title": s.exercise_title,
+                "exercise_template_id": s.exercise_template_id,
+                "set_index": s.set_index,
+                "reps": s.reps,
+                "weight_kg": float(s.weight_kg or 0),
+                "distance_meters": float(s.distance or 0),
+                "duration_seconds": int(s.duration_seconds or 0),
+                "set_type": s.set_type,
+                "e1rm_kg": s.e1rm_kg,
+                "is_working_set": s.is_working_set,
+            }
             for s in sets_rows
         ],
+        "exercises": exercise_history(db, account, w),
+    })
+
+
+def _history_stmt():
+    cur = (
+        select(ExerciseSet.exercise_template_id.label("key"), func.min(ExerciseSet.exercise_title).label("title"))
+        .where(ExerciseSet.workout_pk == bindparam("workout_pk"), ExerciseSet.exercise_template_id.is_not(None))
+        .group_by(ExerciseSet.exercise_template_id)
+        .cte("cur")
+    )
+
+    pw, probe = aliased(Workout), aliased(ExerciseSet)
+    prev_pk = (
+        select(pw.pk)
+        .where(
+            pw.user_id == bindparam("account"),
+            pw.date < bindparam("before"),  # data NULL: nessuna sessione precedente
+            pw.ignored == False,  # noqa
+            exists().where(probe.workout_pk == pw.pk, probe.exercise_template_id == cur.c.key).correlate(pw, cur),
+        )
+        .order_by(pw.date.desc())
+        .limit(1)
+        .correlate(cur)
+        .scalar_subquery()
+    )
+    bw, bs = aliased(Workout), aliased(ExerciseSet)
+    best_e1rm = (
+        select(bs.e1rm_kg)
+        .join(bw, bw.pk == bs.workout_pk)
+        .where(
+            bs.user_id == bindparam("account"),
+            bs.exercise_template_id == cur.c.key,
+            bs.is_working_set == True,  # noqa
+            bs.e1rm_kg.is_not(None),
+            bw.ignored == False,  # noqa
+        )
+        .order_by(bs.e1rm_kg.desc())
+        .limit(1)
+        .correlate(cur)
+        .scalar_subquery()
+    )
+    prev = select(cur.c.key, cur.c.title, prev_pk.label("prev_pk"), best_e1rm.label("best")).cte("prev")
+
+    ranked = (
+        select(
+            prev.c.key,
+            prev.c.title,
+            prev.c.prev_pk,
+            prev.c.best,
+            ExerciseSet.weight_kg,
+            ExerciseSet.reps,
+            func.sum(ExerciseSet.volume_kg).over(partition_by=prev.c.key).label("volume"),
+            func.count(ExerciseSet.id).over(partition_by=prev.c.key).label("n_sets"),
+            func.row_number().over(
+                partition_by=prev.c.key,
+                order_by=(
+                    ExerciseSet.is_working_set.desc(),
+                    func.coalesce(ExerciseSet.weight_kg, 0).desc(),
+                    func.coalesce(ExerciseSet.reps, 0).desc(),
+                ),
+            ).label("rn"),
+        )
+        .select_from(prev.outerjoin(ExerciseSet, and_(
+            ExerciseSet.workout_pk == prev.c.prev_pk, ExerciseSet.exercise_template_id == prev.c.key,
+        )))
+        .subquery()
+    )
+    return (
+        select(ranked, Workout.id.label("prev_id"), Workout.date)
+        .outerjoin(Workout, Workout.pk == ranked.c.prev_pk)
+        .where(ranked.c.rn == 1)
+        .order_by(ranked.c.title)
+    )
+
+
+# costruita una volta sola: con alias e CTE la costruzione costa più dell'esecuzione
+_HISTORY_STMT = _history_stmt()
+
+
+def exercise_history(db: Session, account: int, w: Workout) -> list[dict]:
+    """\
+    Per ogni esercizio (con template) del workout: sessione precedente (best set, volume, set) e
+    miglior e1RM di sempre, in UNA query senza join su tutto lo storico.
+
+    - sessione precedente = workout non ignorato più recente, prima di questo, che contiene
+      l'esercizio: la subquery correlata scorre ix_workouts_user_date all'indietro dalla data
+      del workout e si ferma al primo che ha l'esercizio (sonda su ix_exercise_sets_workout_pk). È un
+      LATERAL ... LIMIT 1 portabile: SQLite non ha LATERAL
+    - miglior e1RM: ix_sets_user_template_working letto dall'alto, fino al primo set di un
+      workout non ignorato
+    - best set e volume della sessione trovata: window function come in _compare_rows
+    """
+    rows = db.execute(_HISTORY_STMT, {"workout_pk": w.pk, "account": account, "before": w.date}).all()
+    return [
+        {
+            "exercise_template_id": r.key,
+            "exercise_title": r.title,
+            "previous": {
+                "workout_id": r.prev_id,
+                "date": r.date,
+                "best_weight_kg": float(r.weight_kg or 0.0),
+                "best_reps": int(r.reps or 0),
+                "volume_kg": round(float(r.volume or 0.0), 2),
+                "sets": int(r.n_sets),
+            } if r.prev_id is not None else None,
+            "best_e1rm_kg": r.best,
+        }
+        for r in rows
+    ]
+
+
+def _compare_rows(db: Session, workout_ids: list[str]):
+    """\
+    Best set e volume per (workout, esercizio) in UNA query con window function.
+
+    best set = peso max tra i set di lavoro, a parità reps max (come faceva il frontend);
+    chiave esercizio = template_id, altrimenti titolo normalizzato.
+    """
+    key = func.coalesce(ExerciseSet.exercise_template_id, func.lower(func.trim(ExerciseSet.exercise_title)))
+    part = (ExerciseSet.workout_id, key)
+    ranked = (
+        select(
+            ExerciseSet.workout_id.label("workout_id"),
+            key.label("key"),
+            ExerciseSet.exercise_title.label("title"),
+            ExerciseSet.weight_kg.label("weight_kg"),
+            ExerciseSet.reps.label("reps"),
+            func.sum(ExerciseSet.volume_kg).over(partition_by=part).label("volume"),
+            func.count().over(partition_by=part).label("n_sets"),
+            func.row_number().over(
+                partition_by=part,
+                order_by=(
+                    ExerciseSet.is_working_set.desc(),
+                    func.coalesce(ExerciseSet.weight_kg, 0).desc(),
+                    func.coalesce(ExerciseSet.reps, 0).desc(),
+                ),
+            ).label("rn"),
+        )
+        .where(ExerciseSet.workout_id.in_(workout_ids))
+        .subquery()
+    )
+    return db.execute(select(ranked).where(ranked.c.rn == 1)).all()
+
+
+@router.get("/workouts/{workout_id}/compare", response_model=WorkoutCompareOut)
+def compare_workout(
+    workout_id: str,
+    by: str = Query(default="title", pattern="^(title|type)$"),
+    baseline: int = Query(default=1, ge=1, le=20),
+    includeIgnored: bool = Query(default=False),
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    """
+    Confronto per esercizio (best set + volume) con la sessione precedente dello stesso
+    titolo/tipo (baseline=1) o con la media mobile delle ultime N sessioni (baseline=N).
+    """
+    w = db.get(Workout, workout_id)
+    if not w or w.user_id != account:
+        raise HTTPException(status_code=404, detail="Workout not found")
+    if by == "type" and w.type_id is None:
+        raise HTTPException(status_code=400, detail="Workout has no type")
+
+    prev_stmt = select(Workout.id, Workout.title, Workout.date).where(
+        Workout.user_id == account,
+        Workout.id != w.id,
+        Workout.date < w.date if w.date is not None else false(),
+        (Workout.title == w.title) if by == "title" else (Workout.type_id == w.type_id),
     )
+    if not includeIgnored:
+        prev_stmt = prev_stmt.where(Workout.ignored == False)  # noqa
+    prev = db.execute(prev_stmt.order_by(Workout.date.desc()).limit(baseline)).all()
+
+    sessions = {w.id: CompareSessionOut(id=w.id, title=w.title, date=w.date)}
+    for pid, ptitle, pdate in prev:
+        sessions[pid] = CompareSessionOut(id=pid, title=ptitle, date=pdate)
+
+    # chiave -> (titolo, stats sessione attuale, [stats sessioni baseline])
+    per_key: dict[str, tuple[str, tuple | None, list[tuple]]] = {}
+    for r in _compare_rows(db, list(sessions)):
+        s = sessions[r.workout_id]
+        s.exercises_count += 1
+        s.sets_count += int(r.n_sets)
+        s.volume_kg += float(r.volume or 0.0)
+
+        stats = (float(r.weight_kg or 0.0), int(r.reps or 0), float(r.volume or 0.0))
+        title, cur, base = per_key.get(r.key) or (r.title or r.key, None, [])
+        if r.workout_id == w.id:
+            title, cur = r.title or title, stats
+        else:
+            base.append(stats)
+        per_key[r.key] = (title, cur, base)
+
+    rows: list[ExerciseCompareRow] = []
+    for k, (title, cur, base) in per_key.items():
+        # baseline = media delle sessioni in cui l'esercizio compare
+        avg = tuple(sum(b[i] for b in base) / len(base) for i in range(3)) if base else None
+        cw, cr, cv = cur or (0.0, 0, 0.0)
+        bw, br, bv = avg or (0.0, 0.0, 0.0)
+        rows.append(ExerciseCompareRow(
+            key=k,
+            title=title,
+            current=CompareStatsOut(best_weight_kg=cw, best_reps=cr, volume_kg=round(cv, 2)) if cur else None,
+            baseline=CompareStatsOut(
+                best_weight_kg=round(bw, 2), best_reps=round(br), volume_kg=round(bv, 2), sessions=len(base),
+            ) if avg else None,
+            delta_weight_kg=round(cw - bw, 2),
+            delta_reps=round(cr - br, 2),
+            delta_volume_kg=round(cv - bv, 2),
+        ))
+    # prima chi ha delta volume alto, poi titolo
+    rows.sort(key=lambda r: (-r.delta_volume_kg, r.title.lower()))
+
+    base_sessions = [sessions[pid] for pid, _, _ in prev]
+    for s in sessions.values():
+        s.volume_kg = round(s.volume_kg, 2)
+    return WorkoutCompareOut(
+        by=by,
+        workout=sessions[w.id],
+        baseline=base_sessions,
+        baseline_volume_kg=round(sum(s.volume_kg for s in base_sessions) / len(base_sessions), 2) if base_sessions else 0.0,
+        exercises=rows,
+    )
+
+
+@router.get("/workouts/{workout_id}/similar", response_model=list[SimilarWorkoutOut])
+def similar_workouts(
+    workout_id: str,
+    k: int = Query(default=10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    account: int = Depends(current_account),
+):
+    """Top-k workout con mix di esercizi e distribuzione del volume più simili (firme salvate al sync)"""
+    sig = db.execute(
+        select(Workout.signature).where(Workout.id == workout_id, Workout.user_id == account)
+    ).first()
+    if sig is None:
+        raise HTTPException(status_code=404, detail="Workout not found")
+    return get_similarity_index(db, account).query(decode_signature(sig[0]), k, exclude_id=workout_id)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Literal, Optional
 
 class ExerciseOut(BaseModel):
     id: int
@@ -16,6 +16,22 @@ class ExerciseUpdateIn(BaseModel):
     muscles: Optional[List[str]] = None
     equipment: Optional[List[str]] = None
 
+class ExerciseBulkItemIn(ExerciseUpdateIn):
+    # l'esercizio si indica per id oppure per exercise_template_id
+    id: Optional[int] = None
+    exercise_template_id: Optional[str] = None
+
+class ExerciseBulkIn(BaseModel):
+    # replace = la lista sostituisce quella attuale; add/remove = aggiunge/toglie solo quei nomi
+    mode: Literal["replace", "add", "remove"] = "replace"
+    items: List[ExerciseBulkItemIn]
+
+class ExerciseBulkOut(BaseModel):
+    updated: int
+    links_added: int = 0
+    links_removed: int = 0
+    exercises: List[ExerciseOut] = []
+
 class DashboardTopExerciseRow(BaseModel):
     exercise_title: str
     volume_kg: float
@@ -43,7 +59,19 @@ class DashboardSummaryOut(BaseModel):
     top_exercises_by_volume: list[DashboardTopExerciseRow] = []
     class Config:
         from_attributes = True
-    
+
+
+class CalendarDayOut(BaseModel):
+    date: date  # giorno locale (config.TZ)
+    workouts: int
+    tonnage_kg: float
+
+
+class CalendarHeatmapOut(BaseModel):
+    year: int
+    tz: str
+    days: list[CalendarDayOut] = []  # solo i giorni con almeno un workout
+
 
 class RecordRow(BaseModel):
     exercise_title: str
@@ -100,10 +128,142 @@ class ExerciseSetOut(BaseModel):
     distance_meters: float | None = None
     duration_seconds: int | None = None
     set_type: str | None = None
+    e1rm_kg: float | None = None
+    is_working_set: bool | None = None
 
     class Config:
         from_attributes = True
 
 
+class PreviousPerformanceOut(BaseModel):
+    """ultima sessione precedente con l'esercizio: best set (come nel confronto) e volume"""
+    workout_id: str
+    date: datetime | None = None
+    best_weight_kg: float = 0.0
+    best_reps: int = 0
+    volume_kg: float = 0.0
+    sets: int = 0
+
+
+class ExerciseHistoryOut(BaseModel):
+    exercise_template_id: str
+    exercise_title: str
+    previous: PreviousPerformanceOut | None = None
+    best_e1rm_kg: float | None = None  # di sempre, workout ignorati esclusi
+
+
 class WorkoutDetailOut(WorkoutOut):
     sets: list[ExerciseSetOut] = []
+    exercises: list[ExerciseHistoryOut] = []
+
+
+# --- Search ---
+class SearchHitOut(BaseModel):
+    kind: str  # workout_title | exercise | muscle | equipment
+    id: str
+    label: str
+    score: float
+    extra: dict = {}
+
+
+class SearchOut(BaseModel):
+    q: str
+    results: list[SearchHitOut] = []
+
+
+# --- Similar ---
+class SimilarWorkoutOut(BaseModel):
+    id: str
+    title: str
+    date: datetime | None = None
+    volume_kg: float = 0.0
+    score: float  # 0..1
+    shared_exercises: int = 0
+
+
+# --- Compare ---
+class CompareSessionOut(BaseModel):
+    id: str
+    title: str
+    date: datetime | None = None
+    exercises_count: int = 0
+    sets_count: int = 0
+    volume_kg: float = 0.0
+
+
+class CompareStatsOut(BaseModel):
+    best_weight_kg: float
+    best_reps: int
+    volume_kg: float
+    sessions: int = 1  # in quante sessioni del baseline compare l'esercizio
+
+
+class ExerciseCompareRow(BaseModel):
+    key: str  # template_id o titolo normalizzato
+    title: str
+    current: CompareStatsOut | None = None
+    baseline: CompareStatsOut | None = None
+    delta_weight_kg: float
+    delta_reps: float
+    delta_volume_kg: float
+
+
+class WorkoutCompareOut(BaseModel):
+    by: str  # "title" | "type"
+    workout: CompareSessionOut
+    baseline: list[CompareSessionOut] = []  # dalla più recente, max N sessioni
+    baseline_volume_kg: float = 0.0  # media sulle sessioni del baseline
+    exercises: list[ExerciseCompareRow] = []
+
+
+class ImportOut(BaseModel):
+    rows: int
+    rows_invalid: int = 0  # righe senza un orario di inizio leggibile
+    workouts_imported: int
+    workouts_skipped: int = 0  # già presenti (reimport o arrivati dal sync API)
+    sets_imported: int
+    exercises_created: int = 0
+
+
+class AccountIn(BaseModel):
+    name: str
+    api_key: str
+    active: bool = True
+
+
+class AccountOut(BaseModel):
+    id: int
+    name: str
+    active: bool
+    last_sync_ts: datetime | None = None
+    last_error: str | None = None
+
+
+class AccountSyncOut(BaseModel):
+    user_id: int
+    pages: int
+    sets_seen: int
+    sets_inserted: int
+    seconds: float
+    error: str | None = None
+
+
+class BatchQueryIn(BaseModel):
+    # query = nome della sotto-query (GET /api/batch/queries); id = chiave nel risultato (default: query)
+    query: str
+    id: Optional[str] = None
+    params: Dict[str, Any] = {}
+
+
+class BatchIn(BaseModel):
+    queries: List[BatchQueryIn]
+
+
+class BatchItemOut(BaseModel):
+    status: int
+    data: Any = None
+    detail: Any = None
+
+
+class BatchOut(BaseModel):
+    results: Dict[str, BatchItemOut]
@@ -0,0 +1,176 @@
+"""
+Ricerca testuale (titoli workout, esercizi, muscoli, attrezzatura) su un indice a trigrammi
+in memoria, ricostruito per generazione dei dati (app.cache).
+
+- normalizzazione: minuscole, senza accenti, solo lettere/cifre
+- prefisso: "panc" trova "panca"; un token di 1-2 caratteri cerca solo per prefisso
+- errori di battitura: similarità di Dice sui trigrammi del token ("bech" ~ "bench")
+- punteggio documento: media sui token della query del miglior match nel documento,
+  pesato per campo (titolo > muscoli/attrezzatura dell'esercizio)
+
+Il vocabolario è piccolo (qualche migliaio di token), quindi una query costa pochi ms
+e funziona uguale su MySQL e SQLite, senza FULLTEXT/FTS5.
+"""
+from __future__ import annotations
+
+import bisect
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.cache import get_or_compute
+
+MIN_DICE = 0.4  # sotto questa similarità un token non conta come match
+MIN_SCORE = 0.3
+TITLE_WEIGHT = 1.0
+TAG_WEIGHT = 0.6  # muscoli/attrezzatura di un esercizio
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def tokens(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class Doc:
+    kind: str  # workout_title | exercise | muscle | equipment
+    id: str
+    label: str
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+class SearchIndex:
+    def __init__(self) -> None:
+        self.docs: List[Doc] = []
+        self.postings: Dict[str, Dict[int, float]] = {}  # token -> {doc: peso campo}
+        self.grams: Dict[str, Set[str]] = {}  # trigramma -> token del vocabolario
+        self.vocab: List[str] = []  # ordinato, per i match sul prefisso
+
+    def add(self, doc: Doc, fields: Iterable[Tuple[str, float]]) -> None:
+        i = len(self.docs)
+        self.docs.append(doc)
+        for text, weight in fields:
+            for tok in tokens(text):
+                post = self.postings.setdefault(tok, {})
+                post[i] = max(post.get(i, 0.0), weight)
+
+    def freeze(self) -> "SearchIndex":
+        self.vocab = sorted(self.postings)
+        for tok in self.vocab:
+            for g in trigrams(tok):
+                self.grams.setdefault(g, set()).add(tok)
+        return self
+
+    def _matches(self, q: str) -> Dict[str, float]:
+        """token del vocabolario simili a q -> punteggio 0..1"""
+        out: Dict[str, float] = {}
+        i = bisect.bisect_left(self.vocab, q)
+        while i < len(self.vocab) and self.vocab[i].startswith(q):
+            tok = self.vocab[i]
+            out[tok] = 1.0 if tok == q else 0.9
+            i += 1
+        if len(q) < 3:
+            return out
+
+        q_grams = trigrams(q)
+        shared: Dict[str, int] = {}
+        for g in q_grams:
+            for tok in self.grams.get(g, ()):
+                shared[tok] = shared.get(tok, 0) + 1
+        for tok, n in shared.items():
+            dice = 2.0 * n / (len(q_grams) + len(tok) + 1)  # len(trigrams(tok)) == len(tok) + 1
+            if dice >= MIN_DICE:
+                out[tok] = max(out.get(tok, 0.0), 0.8 * dice)
+        return out
+
+    def search(self, query: str, limit: int, kinds: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        q_tokens = tokens(query)
+        if not q_tokens:
+            return []
+
+        per_doc: Dict[int, List[float]] = {}
+        for qi, q in enumerate(q_tokens):
+            for tok, tok_score in self._matches(q).items():
+                for d, weight in self.postings[tok].items():
+                    best = per_doc.get(d)
+                    if best is None:
+                        best = per_doc[d] = [0.0] * len(q_tokens)
+                    best[qi] = max(best[qi], tok_score * weight)
+
+        hits = []
+        for d, best in per_doc.items():
+            doc = self.docs[d]
+            if kinds and doc.kind not in kinds:
+                continue
+            score = sum(best) / len(best)
+            if normalize(doc.label) == " ".join(q_tokens):
+                score += 0.5  # match esatto sull'intero titolo in cima
+            if score >= MIN_SCORE:
+                hits.append((score, doc))
+        hits.sort(key=lambda h: (-h[0], h[1].label.lower()))
+        return [
+            {"kind": doc.kind, "id": doc.id, "label": doc.label, "score": round(score, 3), "extra": doc.extra}
+            for score, doc in hits[:limit]
+        ]
+
+
+def _build(db: Session, user_id: int) -> SearchIndex:
+    from app.accounts import visible_exercises
+    from app.models import Equipment, Exercise, Muscle, Workout
+
+    idx = SearchIndex()
+
+    # titoli dei workout: un documento per titolo (decine di "Push A" sarebbero rumore)
+    for title, n, last in db.execute(
+        select(Workout.title, func.count(Workout.id), func.max(Workout.date))
+        .where(Workout.user_id == user_id, Workout.ignored == False)  # noqa: E712
+        .group_by(Workout.title)
+    ):
+        if title:
+            idx.add(
+                Doc("workout_title", title, title, {"workouts": int(n), "last_date": last.isoformat() if last else None}),
+                [(title, TITLE_WEIGHT)],
+            )
+
+    for ex in db.execute(
+        select(Exercise)
+        .where(visible_exercises(user_id))
+        .options(selectinload(Exercise.muscles), selectinload(Exercise.equipment))
+    ).scalars():
+        muscles = [m.name for m in ex.muscles]
+        equipment = [x.name for x in ex.equipment]
+        idx.add(
+            Doc("exercise", str(ex.id), ex.exercise_title, {
+                "exercise_template_id": ex.exercise_template_id,
+                "muscles": muscles,
+                "equipment": equipment,
+            }),
+            [(ex.exercise_title, TITLE_WEIGHT)] + [(n, TAG_WEIGHT) for n in muscles + equipment],
+        )
+
+    for m in db.execute(select(Muscle)).scalars():
+        idx.add(Doc("muscle", str(m.id), m.name), [(m.name, TITLE_WEIGHT)])
+    for x in db.execute(select(Equipment)).scalars():
+        idx.add(Doc("equipment", str(x.id), x.name), [(x.name, TITLE_WEIGHT)])
+
+    return idx.freeze()
+
+
+def get_search_index(db: Session, user_id: int) -> SearchIndex:
+    return get_or_compute("search_index", user_id, lambda: _build(db, user_id))
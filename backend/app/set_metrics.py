@@ -0,0 +1,63 @@
+"""
+Colonne derivate di ExerciseSet, calcolate una volta quando il set si salva (sync API,
+import CSV) invece che riga per riga in ogni router:
+
+- volume_kg: peso * reps, 0 se uno dei due manca o non è positivo
+- e1rm_kg: 1RM stimato (Epley), None se non calcolabile
+- is_weighted: peso > 0
+- is_working_set: tutto tranne il riscaldamento (set_type "warmup")
+
+I router filtrano e sommano queste colonne in SQL (indice ix_sets_user_template_working).
+backfill_set_metrics() le riempie all'avvio sui DB esistenti, con un solo UPDATE.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import case, func, or_, update
+from sqlalchemy.orm import Session
+
+WARMUP = "warmup"
+
+
+def epley_e1rm(weight: float, reps: int) -> float:
+    # Epley: 1RM = w * (1 + reps/30)
+    return weight * (1.0 + (reps / 30.0))
+
+
+def set_metrics(weight_kg: Optional[float], reps: Optional[int], set_type: Optional[str]) -> dict:
+    weighted = weight_kg is not None and weight_kg > 0
+    counted = weighted and reps is not None and reps > 0
+    return {
+        "volume_kg": weight_kg * reps if counted else 0.0,
+        "e1rm_kg": epley_e1rm(weight_kg, reps) if counted else None,
+        "is_weighted": weighted,
+        "is_working_set": (set_type or "").lower() != WARMUP,
+    }
+
+
+def backfill_set_metrics(db: Session) -> int:
+    """Calcola le colonne derivate dove mancano (DB esistenti). Stessa logica di set_metrics, in SQL."""
+    from app.models import ExerciseSet
+
+    s = ExerciseSet
+    counted = (s.weight_kg > 0) & (s.reps > 0)
+    res = db.execute(
+        update(s)
+        .where(s.is_working_set.is_(None))
+        .values(
+            volume_kg=case((counted, s.weight_kg * s.reps), else_=0.0),
+            e1rm_kg=case((counted, s.weight_kg * (1.0 + s.reps / 30.0)), else_=None),
+            is_weighted=case((s.weight_kg > 0, True), else_=False),
+            is_working_set=case((or_(s.set_type.is_(None), func.lower(s.set_type) != WARMUP), True), else_=False),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    updated = res.rowcount or 0
+    if updated:
+        from app.cache import bump_generation
+
+        bump_generation()
+        print(f"[SETS] colonne derivate calcolate per {updated} set")
+    return updated
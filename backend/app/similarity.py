@@ -0,0 +1,189 @@
+"""
+"Allenamenti simili": ogni workout ha una firma compatta (Workout.signature, JSON) con,
+per esercizio, numero di set e volume. La firma si calcola al sync dal payload Hevy,
+quindi la ricerca non tocca mai exercise_sets.
+
+Similarità = media di due coseni:
+- sul numero di set per esercizio (stesso mix di esercizi)
+- sulle quote di volume per esercizio (stessa distribuzione del tonnellaggio)
+(se uno dei due workout non ha volume, ad es. solo corpo libero, conta solo il primo).
+
+L'indice è invertito (esercizio -> workout che lo contengono, con i pesi già normalizzati)
+e in cache per generazione: una query somma i contributi solo dei workout che condividono
+almeno un esercizio, senza matrici dense né dipendenze extra.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.cache import get_or_compute
+from app.normalizer import exercise_fields, exercise_sets, set_fields
+
+BACKFILL_BATCH = 500
+
+# esercizio -> [set, volume kg]
+Signature = Dict[str, List[float]]
+
+
+def exercise_key(template_id: Optional[str], title: Optional[str]) -> str:
+    # stessa chiave del confronto workout: template_id, altrimenti titolo normalizzato
+    return str(template_id) if template_id else (title or "").strip().lower()
+
+
+def encode_signature(sig: Signature) -> str:
+    # chiavi ordinate: stessa firma -> stessa stringa (il sync non vede modifiche fittizie)
+    return json.dumps({k: [int(v[0]), round(v[1], 2)] for k, v in sorted(sig.items())}, separators=(",", ":"))
+
+
+def decode_signature(raw: Optional[str]) -> Signature:
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return {}
+
+
+def payload_signature(exercises: list) -> str:
+    """firma dagli esercizi del payload (sync API e import CSV): set e volume per esercizio"""
+    sig: Signature = {}
+    for ex in exercises:
+        title, template_id = exercise_fields(ex)
+        sets = exercise_sets(ex)
+        if not sets:
+            continue
+        acc = sig.setdefault(exercise_key(template_id, title), [0, 0.0])
+        for s in sets:
+            acc[0] += 1
+            acc[1] += set_fields(s)["volume_kg"]
+    return encode_signature(sig)
+
+
+def _unit(values: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in values.values()))
+    return {k: v / norm for k, v in values.items()} if norm > 0 else {}
+
+
+@dataclass
+class _Entry:
+    id: str
+    title: str
+    date: Optional[datetime]
+    volume_kg: float
+
+
+class SimilarityIndex:
+    def __init__(self) -> None:
+        self.entries: List[_Entry] = []
+        # esercizio -> [(indice workout, peso set normalizzato, peso volume normalizzato)]
+        self.postings: Dict[str, List[Tuple[int, float, float]]] = {}
+        self.has_volume: List[bool] = []
+
+    def add(self, entry: _Entry, sig: Signature) -> None:
+        i = len(self.entries)
+        self.entries.append(entry)
+        sets_u = _unit({k: float(v[0]) for k, v in sig.items()})
+        vol_u = _unit({k: float(v[1]) for k, v in sig.items()})
+        self.has_volume.append(bool(vol_u))
+        for k in sig:
+            self.postings.setdefault(k, []).append((i, sets_u.get(k, 0.0), vol_u.get(k, 0.0)))
+
+    def query(self, sig: Signature, k: int, exclude_id: str) -> List[Dict[str, object]]:
+        q_sets = _unit({key: float(v[0]) for key, v in sig.items()})
+        q_vol = _unit({key: float(v[1]) for key, v in sig.items()})
+
+        acc: Dict[int, List[float]] = {}  # indice -> [coseno set, coseno volume, esercizi in comune]
+        for key in sig:
+            qs, qv = q_sets.get(key, 0.0), q_vol.get(key, 0.0)
+            for i, ws, wv in self.postings.get(key, ()):
+                a = acc.get(i)
+                if a is None:
+                    a = acc[i] = [0.0, 0.0, 0]
+                a[0] += qs * ws
+                a[1] += qv * wv
+                a[2] += 1
+
+        def score(i: int, a: List[float]) -> float:
+            if q_vol and self.has_volume[i]:
+                return 0.5 * a[0] + 0.5 * a[1]
+            return a[0]
+
+        scored = ((score(i, a), i, a) for i, a in acc.items() if self.entries[i].id != exclude_id)
+        out = []
+        for s, i, a in heapq.nlargest(k, scored, key=lambda t: t[0]):
+            e = self.entries[i]
+            out.append({
+                "id": e.id,
+                "title": e.title,
+                "date": e.date,
+                "volume_kg": e.volume_kg,
+                "score": round(s, 4),
+                "shared_exercises": int(a[2]),
+            })
+        return out
+
+
+def _build(db: Session, user_id: int) -> SimilarityIndex:
+    from app.models import Workout
+
+    idx = SimilarityIndex()
+    rows = db.execute(
+        select(Workout.id, Workout.title, Workout.date, Workout.signature)
+        .where(Workout.user_id == user_id, Workout.ignored == False, Workout.signature.is_not(None))  # noqa: E712
+    )
+    for wid, title, w_date, raw in rows:
+        sig = decode_signature(raw)
+        if sig:
+            vol = round(sum(v[1] for v in sig.values()), 2)
+            idx.add(_Entry(id=wid, title=title, date=w_date, volume_kg=vol), sig)
+    return idx
+
+
+def get_similarity_index(db: Session, user_id: int) -> SimilarityIndex:
+    return get_or_compute("similarity_index", user_id, lambda: _build(db, user_id))
+
+
+def backfill_signatures(db: Session) -> int:
+    """Calcola la firma dai set già nel DB per i workout che non ce l'hanno (DB esistenti, import diretti)"""
+    from app.models import ExerciseSet, Workout
+
+    updated = 0
+    while True:
+        ids = db.execute(
+            select(Workout.id).where(Workout.signature.is_(None)).limit(BACKFILL_BATCH)
+        ).scalars().all()
+        if not ids:
+            break
+        sigs: Dict[str, Signature] = {wid: {} for wid in ids}
+        for wid, template_id, title, n, v in db.execute(
+            select(
+                ExerciseSet.workout_id,
+                ExerciseSet.exercise_template_id,
+                ExerciseSet.exercise_title,
+                func.count(),
+                func.coalesce(func.sum(ExerciseSet.volume_kg), 0.0),
+            )
+            .where(ExerciseSet.workout_id.in_(ids))
+            .group_by(ExerciseSet.workout_id, ExerciseSet.exercise_template_id, ExerciseSet.exercise_title)
+        ):
+            acc = sigs[wid].setdefault(exercise_key(template_id, title), [0, 0.0])
+            acc[0] += int(n)
+            acc[1] += float(v or 0.0)
+        db.execute(update(Workout), [{"id": wid, "signature": encode_signature(s)} for wid, s in sigs.items()])
+        db.commit()
+        updated += len(ids)
+
+    if updated:
+        from app.cache import bump_generation
+
+        bump_generation()
+        print(f"[SIMILAR] firme calcolate per {updated} workout")
+    return updated
@@ -0,0 +1,139 @@
+"""
+Sync di molti account in parallelo (palestra: un account Hevy per lifter).
+
+- pool limitato: SYNC_WORKERS coroutine prendono lavoro da una coda comune
+- scheduling equo: l'unità di lavoro è una pagina, non un account; dopo ogni pagina l'account
+  torna in fondo alla coda, quindi un account con anni di storico non blocca gli altri
+  (round robin a pagine: chi ha poche pagine finisce subito)
+- limite per account: ogni account ha il suo token bucket (SYNC_ACCOUNT_RPS richieste/s)
+  condiviso da tutte le sue pagine, oltre ai retry 429/5xx di HevyClient
+- la richiesta HTTP è asincrona, il salvataggio della pagina (sincrono, CPU + DB) gira in un
+  thread: mentre un worker scrive gli altri continuano a scaricare. Su SQLite (un solo writer)
+  le scritture passano da un lock, su MySQL vanno in parallelo
+- ogni pagina usa una sessione DB sua (sessioni aperte = worker, non account); un errore
+  ferma solo quell'account e finisce in SyncState.last_error
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from app import metrics, warmup
+from app.config import SYNC_ACCOUNT_RPS, SYNC_WORKERS
+from app.db import SessionLocal, get_engine, live_writes
+from app.accounts import UnknownAccount
+from app.hevy_client import HevyClient, RateLimiter
+from app.sync_service import SyncProgress, client_for, fetch_page, get_sync_state, start_sync, store_page, sync_due
+
+
+_sqlite_writes = threading.Lock()
+
+
+@dataclass
+class AccountResult:
+    user_id: int
+    pages: int = 0
+    sets_seen: int = 0
+    sets_inserted: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class _Job:
+    progress: SyncProgress
+    client: HevyClient
+    started: float
+    result: AccountResult
+    synced_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def _store(job: _Job, data: dict) -> None:
+    serial = get_engine().dialect.name == "sqlite"
+    if serial:
+        _sqlite_writes.acquire()
+    try:
+        with live_writes.writing(), SessionLocal() as db:
+            store_page(db, job.progress, data)
+    finally:
+        if serial:
+            _sqlite_writes.release()
+
+
+def _finish(job: _Job) -> None:
+    job.result.seconds = round(time.perf_counter() - job.started, 3)
+    metrics.sync_duration.observe(job.result.seconds, result="error" if job.result.error else "ok")
+    with SessionLocal() as db:
+        state = get_sync_state(db, job.progress.user_id)
+        if job.result.error is None:
+            state.last_sync_ts = job.synced_at
+            state.last_error = None
+        else:
+            state.last_error = job.result.error[:255]
+        db.commit()
+    if job.result.error is None:
+        metrics.mark_sync_success()
+        warmup.schedule(job.progress.user_id)
+
+
+async def sync_accounts(
+    user_ids: Iterable[int],
+    workers: int = SYNC_WORKERS,
+    account_rps: float = SYNC_ACCOUNT_RPS,
+    force: bool = False,
+) -> List[AccountResult]:
+    """Sincronizza gli account (quelli fuori cooldown, o tutti con force) e ritorna un risultato per account"""
+    get_engine()
+    now = datetime.now(timezone.utc)
+    queue: asyncio.Queue[_Job] = asyncio.Queue()
+    results: Dict[int, AccountResult] = {}
+
+    # un solo client httpx per tutto il pool: connessioni riusate tra pagine e account
+    http = httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=max(1, workers)))
+
+    with SessionLocal() as db:
+        for user_id in user_ids:
+            if not force and not sync_due(get_sync_state(db, user_id), now):
+                continue
+            result = results[user_id] = AccountResult(user_id)
+            try:
+                client = client_for(db, user_id, limiter=RateLimiter(account_rps), http=http)
+            except UnknownAccount as e:
+                result.error = f"{type(e).__name__}: {e}"
+                continue
+            queue.put_nowait(_Job(start_sync(db, user_id), client, time.perf_counter(), result))
+
+    async def worker() -> None:
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                data = await fetch_page(job.client, job.progress)
+                await asyncio.to_thread(_store, job, data)
+            except Exception as e:
+                job.result.error = f"{type(e).__name__}: {e}"
+                print(f"[SYNC] account={job.progress.user_id} errore: {job.result.error}")
+            else:
+                job.result.pages += 1
+                job.result.sets_seen = job.progress.seen_sets
+                job.result.sets_inserted = job.progress.inserted_sets
+                if not job.progress.done:
+                    queue.put_nowait(job)  # in fondo alla coda: tocca agli altri account
+                    continue
+            _finish(job)
+
+    # un worker esce quando trova la coda vuota: gli account rimasti sono in mano agli altri
+    # worker, che li rimettono in coda e li riprendono (mai più account in giro che worker vivi)
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(results) or 1)))))
+    finally:
+        await http.aclose()
+    return list(results.values())
@@ -1,150 +1,261 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from app.config import HEVY_BASE_URL, DEFAULT_PAGE_SIZE, SYNC_COOLDOWN_SECONDS
+from app.db import live_writes
 from app.hevy_client import HevyClient
-from app.models import Workout, ExerciseSet, SyncState, Exercise
-from app.normalizer import pick, iso_to_dt, workout_duration_seconds
+from app.accounts import UnknownAccount, api_key_for
+from app.models import DEFAULT_ACCOUNT_ID, Account, Workout, ExerciseSet, SyncState, Exercise
+from app.normalizer import pick, workout_fields, workout_exercises, exercise_fields, exercise_sets, set_fields
+from app import metrics, warmup
+from app.cache import bump_generation
+from app.training_load import training_load
+from app.localtime import local_date_of
+from app.similarity import payload_signature
+from app.importer import has_imported, take_imported
+from app.keys import workout_pk
 
 
-async def ensure_synced(db: Session) -> None:
-    """
-    Sync con cooldown: se hai syncato "da poco" non riscarica tutto.
-    """
-    state = db.get(SyncState, 1)
-    now = datetime.now(timezone.utc)
-
+def get_sync_state(db: Session, user_id: int = DEFAULT_ACCOUNT_ID) -> SyncState:
+    state = db.get(SyncState, user_id)
     if not state:
-        state = SyncState(id=1, last_sync_ts=None)
+        # niente righe di stato per account che non esistono
+        if user_id != DEFAULT_ACCOUNT_ID and db.get(Account, user_id) is None:
+            raise UnknownAccount(f"account {user_id} inesistente")
+        state = SyncState(id=user_id, last_sync_ts=None)
         db.add(state)
         db.commit()
         db.refresh(state)
+    return state
 
-    if state.last_sync_ts:
-        last = state.last_sync_ts
-        if last.tzinfo is None:
-            last = last.replace(tzinfo=timezone.utc)
-        if (now - last).total_seconds() < SYNC_COOLDOWN_SECONDS:
-            return
 
-    client = HevyClient(HEVY_BASE_URL)
-    await full_sync(db, client)
+def sync_due(state: SyncState, now: datetime) -> bool:
+    if not state.last_sync_ts:
+        return True
+    last = state.last_sync_ts
+    if last.tzinfo is None:
+        last = last.replace(tzinfo=timezone.utc)
+    return (now - last).total_seconds() >= SYNC_COOLDOWN_SECONDS
 
-    state.last_sync_ts = now
-    db.commit()
 
+def client_for(db: Session, user_id: int = DEFAULT_ACCOUNT_ID, **kwargs) -> HevyClient:
+    return HevyClient(HEVY_BASE_URL, api_key=api_key_for(user_id, db.get(Account, user_id)), **kwargs)
 
-async def full_sync(db: Session, client: HevyClient) -> None:
-    page = 1
-    page_count = 1
-    inserted_sets = 0
-    seen_sets = 0
-
-    while page <= page_count:
-        data = await client.get("/v1/workouts", {"page": page, "pageSize": DEFAULT_PAGE_SIZE})
-        page_count = int(data.get("page_count") or data.get("pageCount") or 1)
-        workouts = data.get("workouts") or []
-
-        for w in workouts:
-            workout_id = pick(w, ["id", "workout_id", "uuid"])
-            if not workout_id:
-                continue
-            workout_id = str(workout_id)
-
-            title = pick(w, ["title", "name"]) or ""
-            start_time = iso_to_dt(w.get("start_time"))
-            end_time = iso_to_dt(w.get("end_time"))
-            date = iso_to_dt(pick(w, ["start_time", "startTime", "date", "performed_at", "created_at"])) or end_time
-            dur = workout_duration_seconds(w)
-
-            existing = db.get(Workout, workout_id)
-            if not existing:
-                existing = Workout(id=workout_id)
-
-            existing.title = title
-            existing.start_time = start_time
-            existing.end_time = end_time
-            existing.date = date
-            existing.duration_seconds = dur
-            existing.raw_json = json.dumps(w, ensure_ascii=False)
-
-            db.add(existing)
-            db.flush()
-
-            exercises = pick(w, ["exercises", "items", "workout_exercises"]) or []
-            for ex in exercises:
-                ex_title = pick(ex, ["title", "name", "exercise_title"]) or ""
-                template_id = pick(ex, ["exercise_template_id", "exerciseTemplateId", "template_id", "exercise_id"])
-                template_id = str(template_id) if template_id else None
-                # upsert Exercise (catalogo)
-                if template_id or ex_title:
-                    q = None
-                    if template_id:
-                        q = db.query(Exercise).filter(Exercise.exercise_template_id == template_id).first()
-                    if not q:
-                        q = Exercise(exercise_title=ex_title, exercise_template_id=template_id)
-                        db.add(q)
-                    else:
-                        # aggiorna titolo se cambia
-                        if ex_title and q.exercise_title != ex_title:
-                            q.exercise_title = ex_title
-
-                sets = pick(ex, ["sets", "exercise_sets"]) or []
-                for idx, s in enumerate(sets):
-                    reps = _to_int(pick(s, ["reps", "rep_count", "repetitions"]))
-                    weight = _to_float(pick(s, ["weight_kg", "weightKg", "weight", "kg"]))
-                    distance = _to_float(pick(s, ["distance", "distance_m", "meters"]))
-                    dur_s = _to_int(pick(s, ["duration_seconds", "durationSeconds", "seconds", "duration"]))
-                    set_type = pick(s, ["type", "set_type", "kind"])
-
-                    row = ExerciseSet(
-                        workout_id=workout_id,
-                        exercise_title=ex_title,
-                        exercise_template_id=template_id,
-                        set_index=idx + 1,
-                        reps=reps,
-                        weight_kg=weight,
-                        distance=distance,
-                        duration_seconds=dur_s,
-                        set_type=str(set_type) if set_type else None,
-                        raw_json=json.dumps(s, ensure_ascii=False),
-                    )
-
-                    # Inserimento semplice: se duplica (uq_set_key) ignora
-                    seen_sets += 1
-                    try:
-                        with db.begin_nested():  # SAVEPOINT: rollbacka solo questo inserimento
-                            db.add(row)
-                            db.flush()
-                            inserted_sets += 1
-                    except IntegrityError:
-                        # duplicato: ignoralo e vai avanti senza sputtanare la transazione
-                        pass
 
-        db.commit()
-        print(f"[SYNC] sets: inserted={inserted_sets} seen={seen_sets}")
-        page += 1
+async def ensure_synced(db: Session, user_id: int = DEFAULT_ACCOUNT_ID) -> None:
+    """
+    Sync con cooldown: se hai syncato "da poco" non riscarica tutto.
+    """
+    state = get_sync_state(db, user_id)
+    now = datetime.now(timezone.utc)
+    if not sync_due(state, now):
+        return
+
+    await full_sync(db, client_for(db, user_id), user_id)
+
+    state.last_sync_ts = now
+    state.last_error = None
+    db.commit()
 
 
-def _to_int(v: Optional[object]) -> Optional[int]:
+async def full_sync(db: Session, client: HevyClient, user_id: int = DEFAULT_ACCOUNT_ID) -> None:
+    t0 = time.perf_counter()
     try:
-        if v is None or v == "":
-            return None
-        return int(float(v))
+        await _full_sync(db, client, user_id)
     except Exception:
-        return None
+        metrics.sync_duration.observe(time.perf_counter() - t0, result="error")
+        raise
+    metrics.sync_duration.observe(time.perf_counter() - t0, result="ok")
+    metrics.mark_sync_success()
+    warmup.schedule(user_id)
+
+
+@dataclass
+class SyncProgress:
+    """Stato di un sync a pagine: full_sync lo fa girare fino in fondo, il pool una pagina alla volta"""
+    user_id: int
+    pending_imports: bool
+    page: int = 1
+    page_count: int = 1
+    inserted_sets: int = 0
+    seen_sets: int = 0
+
+    @property
+    def done(self) -> bool:
+        return self.page > self.page_count
+
+
+def start_sync(db: Session, user_id: int = DEFAULT_ACCOUNT_ID) -> SyncProgress:
+    return SyncProgress(user_id=user_id, pending_imports=has_imported(db, user_id))
 
 
-def _to_float(v: Optional[object]) -> Optional[float]:
+async def _full_sync(db: Session, client: HevyClient, user_id: int = DEFAULT_ACCOUNT_ID) -> None:
+    progress = start_sync(db, user_id)
+    while not progress.done:
+        await sync_page(db, client, progress)
+
+
+async def sync_page(db: Session, client: HevyClient, progress: SyncProgress) -> None:
+    """Scarica e salva la pagina progress.page (commit a fine pagina), poi avanza"""
+    data = await fetch_page(client, progress)
+    # durante il freeze di un rebuild l'attesa va in un thread, non blocca l'event loop
+    if not live_writes.try_enter():
+        await asyncio.to_thread(live_writes.enter)
     try:
-        if v is None or v == "":
-            return None
-        return float(v)
-    except Exception:
-        return None
+        store_page(db, progress, data)
+    finally:
+        live_writes.exit()
+
+
+async def fetch_page(client: HevyClient, progress: SyncProgress) -> Dict[str, Any]:
+    return await client.get("/v1/workouts", {"page": progress.page, "pageSize": DEFAULT_PAGE_SIZE})
+
+
+def upsert_exercise(
+    db: Session, user_id: int, ex_title: str, template_id: Optional[str]
+) -> Tuple[Optional[Exercise], bool]:
+    """Upsert dell'esercizio nel catalogo; ritorna (esercizio, True se il catalogo è cambiato)"""
+    if not (template_id or ex_title):
+        return None, False
+    changed = False
+    q = None
+    if template_id:
+        q = db.query(Exercise).filter(Exercise.exercise_template_id == template_id).first()
+        if not q and ex_title:
+            # esercizio creato dall'import CSV (solo titolo): prende il template
+            q = db.query(Exercise).filter(
+                Exercise.user_id == user_id,
+                Exercise.exercise_template_id.is_(None),
+                Exercise.exercise_title == ex_title,
+            ).first()
+            if q:
+                q.exercise_template_id = template_id
+                changed = True
+    if not q:
+        q = Exercise(user_id=user_id, exercise_title=ex_title, exercise_template_id=template_id)
+        db.add(q)
+        db.flush()  # serve l'id per ExerciseSet.exercise_id
+        changed = True
+    else:
+        if q.user_id is not None and q.user_id != user_id and template_id:
+            # stesso template in due account: è del catalogo Hevy, diventa condiviso
+            q.user_id = None
+            changed = True
+        # aggiorna titolo se cambia
+        if ex_title and q.exercise_title != ex_title:
+            q.exercise_title = ex_title
+            changed = True
+    return q, changed
+
+
+def store_page(db: Session, progress: SyncProgress, data: Dict[str, Any]) -> None:
+    """Parte DB di sync_page, sincrona: il pool la fa girare in un thread"""
+    user_id = progress.user_id
+    pending_imports = progress.pending_imports
+    progress.page_count = int(data.get("page_count") or data.get("pageCount") or 1)
+    workouts = data.get("workouts") or []
+    inserted_sets = seen_sets = 0
+    page_changed = False
+    touched_days: set = set()
+
+    # chiavi uq_set_key già nel DB per i workout della pagina: i set già salvati si saltano
+    # senza SAVEPOINT/flush (sarebbero comunque finiti in IntegrityError)
+    page_ids = [str(i) for i in (pick(w, ["id", "workout_id", "uuid"]) for w in workouts) if i]
+    known_sets = set(db.execute(
+        select(ExerciseSet.workout_id, ExerciseSet.exercise_template_id, ExerciseSet.set_index)
+        .where(ExerciseSet.workout_id.in_(page_ids), ExerciseSet.exercise_template_id.is_not(None))
+    ).tuples()) if page_ids else set()
+
+    for w in workouts:
+        workout_id = pick(w, ["id", "workout_id", "uuid"])
+        if not workout_id:
+            continue
+        workout_id = str(workout_id)
+
+        fields = workout_fields(w)
+        exercises = workout_exercises(w)
+
+        existing = db.get(Workout, workout_id)
+        if existing is not None and existing.user_id not in (None, user_id):
+            print(f"[SYNC] workout {workout_id} già di un altro account: salto")
+            continue
+        if not existing:
+            existing = Workout(id=workout_id, pk=workout_pk(workout_id, fields["date"]), user_id=user_id)
+            page_changed = True
+            # stesso workout già caricato dall'import CSV: l'API lo sostituisce (niente doppioni)
+            imported = take_imported(db, user_id, fields["title"], fields["date"]) if pending_imports else None
+            if imported is not None:
+                existing.ignored, existing.type_id = imported.ignored, imported.type_id
+                if imported.local_date is not None:
+                    touched_days.add(imported.local_date)
+        old_day = existing.local_date
+
+        # naive UTC come nel DB, così is_modified() non vede cambi fittizi
+        for k, v in fields.items():
+            setattr(existing, k, v)
+        existing.local_date = local_date_of(existing.date)
+        existing.raw_json = json.dumps(w, ensure_ascii=False)
+        existing.signature = payload_signature(exercises)
+        workout_changed = db.is_modified(existing)
+        page_changed = page_changed or workout_changed
+
+        db.add(existing)
+        db.flush()
+
+        for ex in exercises:
+            ex_title, template_id = exercise_fields(ex)
+            exercise, ex_changed = upsert_exercise(db, user_id, ex_title, template_id)
+            page_changed = page_changed or ex_changed
+
+            for idx, s in enumerate(exercise_sets(ex)):
+                seen_sets += 1
+                if (workout_id, template_id, idx + 1) in known_sets:
+                    continue
+                row = ExerciseSet(
+                    workout_id=workout_id,
+                    workout_pk=existing.pk,
+                    exercise_id=exercise.id if exercise is not None else None,
+                    user_id=user_id,
+                    exercise_title=ex_title,
+                    exercise_template_id=template_id,
+                    set_index=idx + 1,
+                    raw_json=json.dumps(s, ensure_ascii=False),
+                    **set_fields(s),
+                )
+
+                # Inserimento semplice: se duplica (uq_set_key) ignora
+                try:
+                    with db.begin_nested():  # SAVEPOINT: rollbacka solo questo inserimento
+                        db.add(row)
+                        db.flush()
+                        inserted_sets += 1
+                        workout_changed = True
+                except IntegrityError:
+                    # duplicato: ignoralo e vai avanti senza sputtanare la transazione
+                    pass
+
+        if workout_changed:
+            touched_days.update(d for d in (old_day, existing.local_date) if d is not None)
+
+    db.commit()
+    if page_changed or inserted_sets:
+        bump_generation()  # dati cambiati: le cache dei risultati non valgono più
+        training_load.mark_dirty(touched_days, user_id)
+    progress.inserted_sets += inserted_sets
+    progress.seen_sets += seen_sets
+    print(f"[SYNC] account={user_id} sets: inserted={progress.inserted_sets} seen={progress.seen_sets}")
+    metrics.sync_pages.inc()
+    metrics.sync_workouts.inc(len(workouts))
+    metrics.sync_sets_seen.inc(seen_sets)
+    metrics.sync_sets_inserted.inc(inserted_sets)
+    progress.page += 1
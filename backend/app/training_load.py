@@ -0,0 +1,279 @@
+"""
+Carico di allenamento giornaliero e finestre mobili (acute:chronic workload).
+
+Il tonnellaggio è tenuto in un array denso indicizzato per giorno (dal primo workout a oggi),
+totale e per gruppo radar. Sopra ci sono le somme prefisse (di x e x²): ogni finestra mobile
+è una differenza di due valori, quindi calcolare una serie costa O(giorni) senza query per giorno.
+
+Aggiornamenti incrementali: il sync segnala i giorni toccati (mark_dirty) e alla richiesta
+successiva si rileggono solo quei giorni e si ricalcolano le somme prefisse da lì in avanti.
+Uno stato per account, creato alla prima richiesta (training_load.get(account_id)).
+"""
+from __future__ import annotations
+
+import threading
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from app.analytics import group_for_radar
+from app.models import DEFAULT_ACCOUNT_ID, ExerciseSet, Workout
+from app.muscle_map import get_muscle_map
+from app.localtime import local_today
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+TOTAL = "totale"
+MAX_RANGE_DAYS = 3 * 366  # /api/analysis/load: finestra massima richiedibile
+
+
+class _Series:
+    """Carico giornaliero + somme prefisse per una serie (totale o un gruppo)"""
+
+    def __init__(self, n: int):
+        self.x: List[float] = [0.0] * n
+        self.cs: List[float] = [0.0] * (n + 1)  # cs[i] = somma x[0:i]
+        self.cs2: List[float] = [0.0] * (n + 1)
+
+    def extend(self, n: int) -> None:
+        missing = n - len(self.x)
+        if missing > 0:
+            self.x.extend([0.0] * missing)
+            self.cs.extend([self.cs[-1]] * missing)
+            self.cs2.extend([self.cs2[-1]] * missing)
+
+    def refresh_prefix(self, start: int) -> None:
+        # ricalcola solo da `start` in avanti: prima nulla è cambiato
+        tail = self.x[start:]
+        self.cs[start + 1:] = list(accumulate(tail, initial=self.cs[start]))[1:]
+        self.cs2[start + 1:] = list(accumulate((v * v for v in tail), initial=self.cs2[start]))[1:]
+
+    def window(self, i: int, w: int) -> tuple[float, float]:
+        lo = max(0, i + 1 - w)
+        return self.cs[i + 1] - self.cs[lo], self.cs2[i + 1] - self.cs2[lo]
+
+
+class TrainingLoad:
+    def __init__(self, user_id: int = DEFAULT_ACCOUNT_ID) -> None:
+        self.user_id = user_id
+        self._lock = threading.Lock()  # protegge i giorni sporchi
+        self.state_lock = threading.RLock()  # protegge array e somme prefisse
+        self.origin: Optional[date] = None
+        self.series: Dict[str, _Series] = {}
+        self._dirty_days: set[date] = set()
+        self._dirty_full = True
+
+    # --- invalidazione ---
+
+    def mark_dirty(self, days: Optional[Iterable[date]] = None) -> None:
+        """days=None -> ricostruzione completa (es. muscoli di un esercizio cambiati)"""
+        with self._lock:
+            if days is None:
+                self._dirty_full = True
+            else:
+                self._dirty_days.update(days)
+
+    # --- caricamento ---
+
+    def _read_days(self, db: Session, lo: Optional[date], hi: Optional[date]) -> Dict[date, Dict[str, float]]:
+        """tonnellaggio per giorno locale (Workout.local_date) e per gruppo nel range [lo, hi] (None = tutto)"""
+        mm = get_muscle_map(db)
+        conds = [
+            Workout.user_id == self.user_id,
+            Workout.local_date.is_not(None),
+            (Workout.ignored == False),  # noqa: E712
+            ExerciseSet.volume_kg > 0,
+        ]
+        if lo is not None:
+            conds.append(Workout.local_date >= lo)
+        if hi is not None:
+            conds.append(Workout.local_date <= hi)
+
+        q = (
+            select(
+                Workout.local_date,
+                ExerciseSet.exercise_template_id,
+                func.sum(ExerciseSet.volume_kg),
+            )
+            .join(ExerciseSet, ExerciseSet.workout_pk == Workout.pk)
+            .where(and_(*conds))
+            .group_by(Workout.pk, Workout.local_date, ExerciseSet.exercise_template_id)
+        )
+
+        shares: Dict[int, List[tuple[str, float]]] = {}
+        out: Dict[date, Dict[str, float]] = {}
+        for day, template_id, tonnage in db.execute(q):
+            tonnage = float(tonnage or 0.0)
+            if tonnage <= 0:
+                continue
+            d = out.setdefault(day, {})
+            d[TOTAL] = d.get(TOTAL, 0.0) + tonnage
+
+            # quota per gruppo: volume diviso tra i muscoli dell'esercizio (i gruppi sommano al totale)
+            mask = mm.mask(template_id)
+            if not mask:
+                continue
+            gs = shares.get(mask)
+            if gs is None:
+                muscles = list(mm.muscles(mask))
+                acc: Dict[str, float] = {}
+                for m in muscles:
+                    g = group_for_radar(m)
+                    acc[g] = acc.get(g, 0.0) + 1.0 / len(muscles)
+                gs = shares[mask] = list(acc.items())
+            for g, share in gs:
+                d[g] = d.get(g, 0.0) + tonnage * share
+        return out
+
+    def _rebuild(self, db: Session, today: date) -> None:
+        per_day = self._read_days(db, None, None)
+        self.origin = min(per_day) if per_day else today
+        n = (max([today, *per_day]) - self.origin).days + 1
+        self.series = {}
+        for d, vals in per_day.items():
+            i = (d - self.origin).days
+            for key, v in vals.items():
+                s = self.series.get(key)
+                if s is None:
+                    s = self.series[key] = _Series(n)
+                s.x[i] = v
+        self.series.setdefault(TOTAL, _Series(n))
+        for s in self.series.values():
+            s.refresh_prefix(0)
+
+    def _apply_dirty(self, db: Session, days: set[date]) -> None:
+        assert self.origin is not None
+        if min(days) < self.origin:
+            raise _NeedsRebuild
+        lo, hi = min(days), max(days)
+        per_day = self._read_days(db, lo, hi)
+        self._ensure_len((max(hi, *per_day) if per_day else hi))
+
+        start = (lo - self.origin).days
+        for s in self.series.values():
+            for d in days:
+                s.x[(d - self.origin).days] = 0.0
+        n = len(self.series[TOTAL].x)
+        for d, vals in per_day.items():
+            i = (d - self.origin).days
+            for key, v in vals.items():
+                if key not in self.series:
+                    self.series[key] = _Series(n)
+                self.series[key].x[i] = v
+        for s in self.series.values():
+            s.refresh_prefix(start)
+
+    def _ensure_len(self, last_day: date) -> None:
+        assert self.origin is not None
+        n = (last_day - self.origin).days + 1
+        for s in self.series.values():
+            s.extend(n)
+
+    def sync_state(self, db: Session, today: date) -> None:
+        with self._lock:
+            full, days = self._dirty_full, self._dirty_days
+            self._dirty_full, self._dirty_days = False, set()
+        try:
+            if full or self.origin is None:
+                self._rebuild(db, today)
+            elif days:
+                self._apply_dirty(db, days)
+        except _NeedsRebuild:
+            self._rebuild(db, today)
+        except Exception:
+            self.mark_dirty(None)
+            raise
+        self._ensure_len(today)
+
+    # --- metriche ---
+
+    def metrics(self, key: str, d_from: date, d_to: date) -> List[Dict[str, Any]]:
+        assert self.origin is not None
+        s = self.series.get(key)
+        out = []
+        # solo i giorni coperti dalla serie (origin .. today): niente righe fuori dallo storico
+        d = max(d_from, self.origin)
+        last = self.origin + timedelta(days=len(self.series[TOTAL].x) - 1)
+        d_to = min(d_to, last)
+        while d <= d_to:
+            i = (d - self.origin).days
+            if s is None or i < 0 or i >= len(s.x):
+                row = _metrics_row(d, 0.0, 0.0, 0.0, 0.0)
+            else:
+                a_sum, a_sq = s.window(i, ACUTE_DAYS)
+                c_sum, _ = s.window(i, CHRONIC_DAYS)
+                row = _metrics_row(d, s.x[i], a_sum, a_sq, c_sum)
+            out.append(row)
+            d += timedelta(days=1)
+        return out
+
+
+class _NeedsRebuild(Exception):
+    pass
+
+
+def _metrics_row(d: date, load: float, a_sum: float, a_sq: float, c_sum: float) -> Dict[str, Any]:
+    acute = a_sum / ACUTE_DAYS
+    chronic = c_sum / CHRONIC_DAYS
+    var = max(0.0, a_sq / ACUTE_DAYS - acute * acute)
+    std = var ** 0.5
+    # monotonia (Foster) = media / deviazione standard dei 7 giorni; strain = carico settimanale * monotonia
+    monotony = acute / std if std > 1e-9 else None
+    return {
+        "date": d.isoformat(),
+        "tonnage_kg": round(load, 2),
+        "acute": round(acute, 2),
+        "chronic": round(chronic, 2),
+        "acwr": round(acute / chronic, 3) if chronic > 0 else None,
+        "monotony": round(monotony, 3) if monotony is not None else None,
+        "strain": round(a_sum * monotony, 2) if monotony is not None else None,
+    }
+
+
+class _PerAccount:
+    """TrainingLoad per account; mark_dirty senza account vale per tutti (es. muscoli cambiati)"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_account: Dict[int, TrainingLoad] = {}
+
+    def get(self, user_id: int) -> TrainingLoad:
+        with self._lock:
+            engine = self._by_account.get(user_id)
+            if engine is None:
+                engine = self._by_account[user_id] = TrainingLoad(user_id)
+            return engine
+
+    def mark_dirty(self, days: Optional[Iterable[date]] = None, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            engines = list(self._by_account.values()) if user_id is None else [self._by_account.get(user_id)]
+        for engine in engines:
+            if engine is not None:  # mai letto: si costruirà da zero alla prima richiesta
+                engine.mark_dirty(None if days is None else list(days))
+
+
+training_load = _PerAccount()
+
+
+def load_series(
+    db: Session,
+    d_from: date,
+    d_to: date,
+    today: Optional[date] = None,
+    user_id: int = DEFAULT_ACCOUNT_ID,
+) -> Dict[str, Any]:
+    engine = training_load.get(user_id)
+    with engine.state_lock:
+        engine.sync_state(db, today or local_today())
+        groups = sorted(k for k in engine.series if k != TOTAL)
+        return {
+            "from": d_from.isoformat(),
+            "to": d_to.isoformat(),
+            "acute_days": ACUTE_DAYS,
+            "chronic_days": CHRONIC_DAYS,
+            "totale": engine.metrics(TOTAL, d_from, d_to),
+            "gruppi": {g: engine.metrics(g, d_from, d_to) for g in groups},
+        }
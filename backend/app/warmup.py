@@ -0,0 +1,142 @@
+"""
+Warm-up della cache dei risultati (app/cache.py) per le viste che le pagine aprono di default.
+
+Dopo un sync (o import) con novità la generazione cambia e la prima visita a Dashboard, Records
+e Analysis pagherebbe tutto il calcolo a freddo. schedule(account) mette l'account in coda e un
+thread di background precalcola, nelle stesse voci di cache degli endpoint:
+
+- dashboard_summary dell'anno corrente
+- records su tutti gli anni, metriche max_weight ed e1rm (max_weight_at_reps dipende dalle reps
+  scelte: resta a richiesta)
+- analysis_summary per i preset di AnalysisPage (ultimi 30 / 90 / 365 giorni fino a oggi)
+
+Bassa priorità: il thread ha nice +10 (Linux) e prima di ogni vista aspetta che non ci siano
+richieste HTTP né job di calcolo in corso, quindi non ruba DB, GIL o slot del pool alle richieste
+interattive. Durata in hevy_warmup_duration_seconds e nel log [WARMUP].
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, List, Optional, Tuple
+
+from app import metrics
+from app.config import WARMUP_ENABLED
+
+ANALYSIS_PRESET_DAYS = (30, 90, 365)  # AnalysisPage: 30d / 90d / 365d
+STARTUP_MAX_ACCOUNTS = 20  # all'avvio: gli account sincronizzati più di recente
+IDLE_POLL_SECONDS = 0.05
+DEBOUNCE_SECONDS = 1.0  # sync a raffica (pool multi-account) -> un solo giro per account
+
+_lock = threading.Lock()
+_pending: dict[int, str] = {}  # account -> trigger, in ordine di arrivo
+_wake = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def schedule(account: int, trigger: str = "sync") -> None:
+    """Accoda il warm-up di un account (non blocca; un account già in coda non si duplica)"""
+    global _thread
+    if not WARMUP_ENABLED:
+        return
+    with _lock:
+        _pending.setdefault(account, trigger)
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_worker, name="warmup", daemon=True)
+            _thread.start()
+    _wake.set()
+
+
+def schedule_startup() -> None:
+    """All'avvio: accoda gli account sincronizzati più di recente"""
+    if not WARMUP_ENABLED:
+        return
+    from sqlalchemy import select
+
+    from app.db import SessionLocal
+    from app.models import Account, SyncState
+
+    with SessionLocal() as db:
+        ids = db.execute(
+            select(Account.id)
+            .outerjoin(SyncState, SyncState.id == Account.id)
+            .order_by(SyncState.last_sync_ts.is_(None), SyncState.last_sync_ts.desc(), Account.id)
+            .limit(STARTUP_MAX_ACCOUNTS)
+        ).scalars().all()
+    for account in ids:
+        schedule(account, "startup")
+
+
+def _lower_priority() -> None:
+    # nice per thread: su Linux setpriority accetta il tid; altrove si resta alla priorità normale
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+def _wait_idle() -> None:
+    from app.compute import compute
+
+    while metrics.http_requests_in_progress.value() > 0 or compute.in_flight > 0:
+        time.sleep(IDLE_POLL_SECONDS)
+
+
+def _worker() -> None:
+    _lower_priority()
+    while True:
+        _wake.wait()
+        time.sleep(DEBOUNCE_SECONDS)
+        with _lock:
+            _wake.clear()
+            batch = list(_pending.items())
+            _pending.clear()
+        for account, trigger in batch:
+            try:
+                warm_account(account, trigger)
+            except Exception as e:  # es. DB non raggiungibile: si riprova al prossimo sync
+                print(f"[WARMUP] account={account} errore: {type(e).__name__}: {e}")
+
+
+def _views(account: int) -> List[Tuple[str, Callable]]:
+    from app.localtime import local_today
+    from app.routers.analysis import analysis_summary_warm
+    from app.routers.dashboard import dashboard_summary_cached
+    from app.routers.records import records_cached
+
+    today = local_today()
+    views: List[Tuple[str, Callable]] = [
+        ("dashboard_summary", lambda db: dashboard_summary_cached(db, account, today.year)),
+        ("records", lambda db: records_cached(db, account, None, "max_weight", None)),
+        ("records_e1rm", lambda db: records_cached(db, account, None, "e1rm", None)),
+    ]
+    for days in ANALYSIS_PRESET_DAYS:
+        d_from = today - timedelta(days=days - 1)
+        views.append((f"analysis_summary_{days}d", lambda db, d_from=d_from: analysis_summary_warm(db, account, d_from, today)))
+    return views
+
+
+def warm_account(account: int, trigger: str = "sync") -> float:
+    """Precalcola le viste di default di un account; ritorna i secondi spesi (attese escluse)"""
+    from app.db import SessionLocal
+
+    spent = 0.0
+    with SessionLocal() as db:
+        for name, view in _views(account):
+            _wait_idle()
+            t0 = time.perf_counter()
+            try:
+                view(db)
+            except Exception as e:  # es. pool di calcolo pieno: la vista si calcolerà a richiesta
+                metrics.warmup_views.inc(view=name, result="error")
+                print(f"[WARMUP] account={account} {name}: {type(e).__name__}: {e}")
+            else:
+                metrics.warmup_views.inc(view=name, result="ok")
+            finally:
+                spent += time.perf_counter() - t0
+                db.rollback()  # niente transazione aperta tra una vista e l'altra (attese comprese)
+    metrics.warmup_duration.observe(spent, trigger=trigger)
+    print(f"[WARMUP] account={account} ({trigger}) viste pronte in {spent:.2f}s")
+    return spent
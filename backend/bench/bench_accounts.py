@@ -0,0 +1,125 @@
+"""
+Throughput del sync multi-account (app/sync_pool.py) contro lo stand-in locale dell'API Hevy.
+
+Avvia bench.fake_hevy con --accounts N (uno storico per chiave, limite di richieste/s per
+chiave), crea N account su un DB sqlite nuovo e li sincronizza col pool, una volta per ogni
+numero di worker richiesto (DB nuovo ogni volta). Riporta account/s, pagine/s, set/s, 429
+ricevuti e la distribuzione del tempo di completamento per account (p50/p95/max: con lo
+scheduling a pagine gli account piccoli non aspettano quelli grandi).
+
+Uso:
+    python -m bench.bench_accounts --accounts 100 --sets 600 --latency-ms 50 --workers 1,8,32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from bench.bench_sync import _free_port, _peak_rss_mb, start_fake_hevy
+
+
+def _pct(values: List[float], p: float) -> float:
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(round(p * (len(s) - 1))))], 3) if s else 0.0
+
+
+def run(accounts: int, workers_list: List[int], account_rps: float, base_url: str, tmp: Path) -> List[Dict[str, Any]]:
+    # config legge le env all'import: vanno impostate prima di importare app.*
+    os.environ["HEVY_BASE_URL"] = base_url
+    os.environ["SYNC_COOLDOWN_SECONDS"] = "0"
+    os.environ["WARMUP_ENABLED"] = "0"  # si misura il sync, non il precalcolo che parte dopo
+
+    from sqlalchemy import create_engine, func, select
+
+    from app import db as app_db
+    from app.accounts import backfill_accounts
+    from app.db import Base, SessionLocal
+    from app.models import Account, ExerciseSet
+    from app.sync_pool import sync_accounts
+    from bench.fake_hevy import account_key
+
+    results = []
+    for workers in workers_list:
+        # DB nuovo per ogni giro: stesso lavoro per ogni numero di worker
+        engine = create_engine(f"sqlite:///{tmp / f'accounts_{workers}.db'}")
+        Base.metadata.create_all(engine)
+        SessionLocal.configure(bind=engine)
+        app_db.engine = engine
+        with SessionLocal() as db:
+            backfill_accounts(db)
+            db.add_all(Account(name=f"lifter {i}", api_key=account_key(i)) for i in range(accounts))
+            db.commit()
+            ids = [a for a in db.execute(select(Account.id).where(Account.api_key.is_not(None))).scalars()]
+
+        before = httpx.get(f"{base_url}/_stats").json()
+        t0 = time.perf_counter()
+        out = asyncio.run(sync_accounts(ids, workers=workers, account_rps=account_rps, force=True))
+        elapsed = time.perf_counter() - t0
+        after = httpx.get(f"{base_url}/_stats").json()
+
+        with SessionLocal() as db:
+            sets_in_db = db.execute(select(func.count(ExerciseSet.id))).scalar() or 0
+        engine.dispose()
+
+        done = [r.seconds for r in out if r.error is None]
+        pages = sum(r.pages for r in out)
+        results.append({
+            "workers": workers,
+            "accounts": len(out),
+            "failed": sum(1 for r in out if r.error),
+            "seconds": round(elapsed, 3),
+            "accounts_per_s": round(len(done) / elapsed, 2) if elapsed else None,
+            "pages_per_s": round(pages / elapsed, 2) if elapsed else None,
+            "sets_in_db": sets_in_db,
+            "sets_per_s": round(sets_in_db / elapsed, 1) if elapsed else None,
+            "account_s_p50": _pct(done, 0.5),
+            "account_s_p95": _pct(done, 0.95),
+            "account_s_max": round(max(done), 3) if done else 0.0,
+            "account_s_mean": round(statistics.mean(done), 3) if done else 0.0,
+            "http_429": (after["errors_429"] + after["key_429"]) - (before["errors_429"] + before["key_429"]),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark sync multi-account contro fake Hevy API")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--sets", type=int, default=600, help="set per account")
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--workers", default="1,8,32", help="lista di dimensioni del pool")
+    parser.add_argument("--account-rps", type=float, default=5.0, help="limite client per account")
+    parser.add_argument("--key-rps", type=float, default=5.0, help="limite lato stand-in per chiave (429)")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    fake_args = ["--accounts", str(args.accounts), "--sets", str(args.sets), "--years", str(args.years),
+                 "--latency-ms", str(args.latency_ms), "--key-rps", str(args.key_rps)]
+    port = _free_port()
+    server = start_fake_hevy(port, fake_args)
+    try:
+        with tempfile.TemporaryDirectory(prefix="hevy-accounts-bench-") as tmp:
+            workers = [int(w) for w in args.workers.split(",") if w.strip()]
+            results = run(args.accounts, workers, args.account_rps, f"http://127.0.0.1:{port}", Path(tmp))
+    finally:
+        server.terminate()
+        server.wait()
+
+    for r in results:
+        print(json.dumps(r))
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark dei router principali su dataset sintetici di varie dimensioni.
+
+Per ogni dimensione (numero di set) si crea un DB sqlite nuovo, lo si riempie con
+bench.dataset e si chiamano gli endpoint via TestClient, misurando:
+- latenza (min / mediana / p95) su `--repeat` chiamate
+- numero di query SQL per chiamata
+- RSS di picco del processo
+
+Ogni dimensione gira in un sottoprocesso separato, così il picco di RSS è pulito
+e l'engine viene creato sul DB giusto.
+
+Uso:
+    python -m bench.bench_routers --sizes 1000,10000,100000 --repeat 5 --out bench_output.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+RESULT_CACHES = ("dashboard_summary", "records", "analysis_summary")
+
+
+def _endpoints(today: date, template_id: str) -> Dict[str, str]:
+    year = today.year
+    d_from = today - timedelta(days=27)
+    return {
+        "list_workouts": f"/api/workouts?year={year}",
+        "dashboard_summary": f"/api/dashboard/summary?year={year}",
+        "analysis_summary": f"/api/analysis/summary?from={d_from}&to={today}",
+        "records_max_weight": "/api/records",
+        "records_e1rm": "/api/records?metric=e1rm",
+        "exercise_progress": f"/api/exercises/{template_id}/progress?from={today.replace(year=year - 1)}&to={today}",
+    }
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux: KB, macOS: byte
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_one(size: int, repeat: int, years: int, db_url: str) -> Dict[str, Any]:
+    """Gira nel sottoprocesso: DATABASE_URL è già impostata."""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.cache import invalidate
+    from app.db import SessionLocal, get_engine, init_db
+    from app.main import app
+    from bench.dataset import seed_database, template_id_for
+
+    # se un .env sovrascrive DATABASE_URL non tocchiamo il DB vero
+    engine = get_engine()
+    if str(engine.url) != db_url:
+        raise RuntimeError(f"engine punta a {engine.url!s}, atteso {db_url}: controlla il .env")
+
+    init_db()
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        stats = seed_database(db, sets=size, years=years)
+    seed_s = time.perf_counter() - t0
+
+    queries = {"n": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        queries["n"] += 1
+
+    today = date.today()
+    results: Dict[str, Any] = {}
+    with TestClient(app) as client:
+        for name, url in _endpoints(today, template_id_for("Bench Press (Barbell)")).items():
+            timings: List[float] = []
+            n_queries = 0
+            status = None
+            for _ in range(repeat):
+                # si misura il calcolo, non la cache dei risultati (le cache di supporto restano)
+                invalidate(*RESULT_CACHES)
+                queries["n"] = 0
+                t = time.perf_counter()
+                resp = client.get(url)
+                timings.append((time.perf_counter() - t) * 1000)
+                n_queries = queries["n"]
+                status = resp.status_code
+            timings.sort()
+            results[name] = {
+                "status": status,
+                "min_ms": round(timings[0], 2),
+                "median_ms": round(statistics.median(timings), 2),
+                "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+                "queries": n_queries,
+                "response_bytes": len(resp.content),
+            }
+
+    return {
+        "size": size,
+        "dataset": stats,
+        "seed_seconds": round(seed_s, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "endpoints": results,
+    }
+
+
+def _spawn(size: int, repeat: int, years: int, workdir: Path) -> Dict[str, Any]:
+    db_url = f"sqlite:///{workdir / f'bench_{size}.db'}"
+    env = dict(os.environ, DATABASE_URL=db_url, PYTHONPATH=str(BACKEND_DIR), WARMUP_ENABLED="0")
+    proc = subprocess.run(
+        [sys.executable, "-m", "bench.bench_routers", "--child", str(size),
+         "--repeat", str(repeat), "--years", str(years)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark size={size} fallito:\n{proc.stderr}")
+    # l'ultima riga di stdout è il JSON (sopra possono esserci print dell'app)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _print_table(all_results: List[Dict[str, Any]]) -> None:
+    print(f"{'endpoint':<22}{'sets':>10}{'median ms':>12}{'p95 ms':>10}{'queries':>9}{'rss MB':>9}")
+    for res in all_results:
+        for name, r in res["endpoints"].items():
+            print(f"{name:<22}{res['size']:>10}{r['median_ms']:>12}{r['p95_ms']:>10}{r['queries']:>9}{res['peak_rss_mb']:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark router HevyAnalytics")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--out", default=None, help="file JSON dove salvare i risultati")
+    parser.add_argument("--child", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        res = run_one(args.child, args.repeat, args.years, os.environ["DATABASE_URL"])
+        print(json.dumps(res))
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    with tempfile.TemporaryDirectory(prefix="hevy-bench-") as tmp:
+        all_results = [_spawn(size, args.repeat, args.years, Path(tmp)) for size in sizes]
+
+    _print_table(all_results)
+    if args.out:
+        Path(args.out).write_text(json.dumps(all_results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Costo di serializzazione delle risposte grandi (per 10k righe), senza DB né HTTP.
+
+Confronta, per le forme di WorkoutOut / ExerciseSetOut / RecordRow:
+- pydantic: modelli costruiti a mano + rivalidazione contro response_model + json stdlib
+  (quello che succedeva prima negli endpoint)
+- rows: dict già pronti codificati direttamente (app.responses.dumps, orjson se presente)
+- gzip: costo e rapporto di compressione del body (stesso livello del GZipMiddleware, GZIP_LEVEL)
+
+Uso:
+    python -m bench.bench_serialization --rows 10000 --repeat 5 --out serialization.json
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from pydantic import TypeAdapter
+
+from app.config import GZIP_LEVEL
+from app.responses import dumps, orjson
+from app.schemas import ExerciseSetOut, RecordRow, WorkoutOut
+from bench.dataset import generate_workouts
+
+
+def _rows(n: int) -> Dict[str, List[Dict[str, Any]]]:
+    workouts: List[Dict[str, Any]] = []
+    sets: List[Dict[str, Any]] = []
+    records: List[Dict[str, Any]] = []
+    for w in generate_workouts(n, years=3, seed=7):
+        started = datetime.fromisoformat(w["start_time"].rstrip("Z"))
+        n_sets = sum(len(ex["sets"]) for ex in w["exercises"])
+        workouts.append({
+            "id": w["id"], "title": w["title"], "date": started, "duration_seconds": 3600,
+            "ignored": False, "type_id": None, "exercises_count": len(w["exercises"]),
+            "sets_count": n_sets, "volume_kg": 5000.0,
+        })
+        for ex in w["exercises"]:
+            for s in ex["sets"]:
+                sets.append({
+                    "workout_id": w["id"], "exercise_title": ex["title"],
+                    "exercise_template_id": ex["exercise_template_id"], "set_index": s["index"] + 1,
+                    "reps": s["reps"], "weight_kg": float(s["weight_kg"] or 0), "distance_meters": 0.0,
+                    "duration_seconds": 0, "set_type": s["type"],
+                })
+                records.append({
+                    "exercise_title": ex["title"], "metric": "max_weight", "value": float(s["weight_kg"] or 0),
+                    "reps": s["reps"], "date": started, "workout_id": w["id"], "workout_title": w["title"],
+                    "exercise_template_id": ex["exercise_template_id"],
+                })
+    # stessa quantità di righe per ogni forma
+    while len(workouts) < n:
+        workouts.extend(workouts[: n - len(workouts)])
+    return {"workouts": workouts[:n], "sets": sets[:n], "records": records[:n]}
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    timings = []
+    out = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        timings.append((time.perf_counter() - t) * 1000)
+    return statistics.median(timings), out
+
+
+def run(n: int, repeat: int) -> Dict[str, Any]:
+    models = {"workouts": WorkoutOut, "sets": ExerciseSetOut, "records": RecordRow}
+    data = _rows(n)
+    per_10k = 10_000 / n
+    results: Dict[str, Any] = {}
+
+    for name, rows in data.items():
+        model = models[name]
+        adapter = TypeAdapter(List[model])
+
+        def pydantic_path() -> bytes:
+            objs = [model(**r) for r in rows]
+            validated = adapter.validate_python(objs, from_attributes=True)
+            return json.dumps(adapter.dump_python(validated, mode="json")).encode("utf-8")
+
+        def rows_path() -> bytes:
+            return dumps(rows)
+
+        pyd_ms, _ = _time(pydantic_path, repeat)
+        rows_ms, body = _time(rows_path, repeat)
+        gz_ms, gz = _time(lambda: gzip.compress(body, GZIP_LEVEL), repeat)
+        results[name] = {
+            "pydantic_ms_per_10k": round(pyd_ms * per_10k, 2),
+            "rows_ms_per_10k": round(rows_ms * per_10k, 2),
+            "speedup": round(pyd_ms / rows_ms, 1) if rows_ms > 0 else None,
+            "bytes": len(body),
+            "gzip_ms_per_10k": round(gz_ms * per_10k, 2),
+            "gzip_ratio": round(len(gz) / len(body), 3),
+        }
+    return {"rows": n, "encoder": "orjson" if orjson is not None else "json", "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark serializzazione risposte")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default=None, help="file JSON dove salvare i risultati")
+    args = parser.parse_args()
+
+    res = run(args.rows, args.repeat)
+    print(f"encoder: {res['encoder']}  righe: {res['rows']}")
+    print(f"{'forma':<10}{'pydantic ms':>13}{'rows ms':>10}{'x':>7}{'KB':>9}{'gzip ms':>10}{'gzip %':>8}")
+    for name, r in res["results"].items():
+        print(
+            f"{name:<10}{r['pydantic_ms_per_10k']:>13}{r['rows_ms_per_10k']:>10}{r['speedup']:>7}"
+            f"{r['bytes'] // 1024:>9}{r['gzip_ms_per_10k']:>10}{round(r['gzip_ratio'] * 100, 1):>8}"
+        )
+    if args.out:
+        Path(args.out).write_text(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
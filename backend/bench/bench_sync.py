@@ -0,0 +1,159 @@
+"""
+Benchmark end-to-end del sync contro lo stand-in locale dell'API Hevy.
+
+Avvia bench.fake_hevy in un sottoprocesso, crea un DB sqlite nuovo e lancia
+full_sync (o ensure_synced) misurando pagine/s, set/s, statement SQL e memoria
+di picco. Con --runs 2 il secondo giro misura il re-sync (tutti i set già presenti).
+
+Uso:
+    python -m bench.bench_sync --sets 20000 --latency-ms 50 --rate-429 0.05 --runs 2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def start_fake_hevy(port: int, extra_args: List[str]) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_hevy", "--port", str(port), *extra_args],
+        cwd=BACKEND_DIR, env=dict(os.environ, PYTHONPATH=str(BACKEND_DIR)),
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("fake_hevy è terminato in avvio")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/_stats", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("fake_hevy non risponde")
+
+
+def run_sync(mode: str, runs: int, db_url: str, base_url: str) -> List[Dict[str, Any]]:
+    # config legge le env all'import: vanno impostate prima di importare app.*
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["HEVY_BASE_URL"] = base_url
+    os.environ["SYNC_COOLDOWN_SECONDS"] = "0"
+    os.environ["WARMUP_ENABLED"] = "0"  # si misura il sync, non il precalcolo che parte dopo
+
+    from sqlalchemy import event, func, select
+
+    from app.db import SessionLocal, get_engine, init_db
+    from app.hevy_client import HevyClient
+    from app.models import ExerciseSet
+    from app.sync_service import ensure_synced, full_sync
+
+    engine = get_engine()
+    if str(engine.url) != db_url:
+        raise RuntimeError(f"engine punta a {engine.url!s}, atteso {db_url}: controlla il .env")
+
+    init_db()
+    counter = {"statements": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        counter["statements"] += 1
+
+    results = []
+    for i in range(runs):
+        stats_before = httpx.get(f"{base_url}/_stats").json()
+        counter["statements"] = 0
+        client = HevyClient(base_url)
+
+        t0 = time.perf_counter()
+        with SessionLocal() as db:
+            if mode == "ensure":
+                asyncio.run(ensure_synced(db))
+            else:
+                asyncio.run(full_sync(db, client))
+        elapsed = time.perf_counter() - t0
+
+        stats_after = httpx.get(f"{base_url}/_stats").json()
+        with SessionLocal() as db:
+            sets_in_db = db.execute(select(func.count(ExerciseSet.id))).scalar() or 0
+
+        pages = stats_after["served_pages"] - stats_before["served_pages"]
+        results.append({
+            "run": i + 1,
+            "mode": mode,
+            "seconds": round(elapsed, 3),
+            "pages": pages,
+            "pages_per_s": round(pages / elapsed, 2) if elapsed else None,
+            "sets_in_db": sets_in_db,
+            "sets_per_s": round(sets_in_db / elapsed, 1) if elapsed else None,
+            "sql_statements": counter["statements"],
+            "http_429": stats_after["errors_429"] - stats_before["errors_429"],
+            "http_500": stats_after["errors_500"] - stats_before["errors_500"],
+            "client_retries": client.retries if mode == "full" else None,
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark sync contro fake Hevy API")
+    parser.add_argument("--mode", choices=["full", "ensure"], default="full")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--sets", type=int, default=10_000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=None)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--pages-dir", default=None)
+    args = parser.parse_args()
+
+    fake_args = ["--sets", str(args.sets), "--years", str(args.years),
+                 "--latency-ms", str(args.latency_ms), "--error-rate", str(args.error_rate),
+                 "--rate-429", str(args.rate_429), "--retry-after", "0.05"]
+    if args.page_size:
+        fake_args += ["--page-size", str(args.page_size)]
+    if args.pages_dir:
+        fake_args += ["--pages-dir", args.pages_dir]
+
+    port = _free_port()
+    server = start_fake_hevy(port, fake_args)
+    try:
+        with tempfile.TemporaryDirectory(prefix="hevy-sync-bench-") as tmp:
+            results = run_sync(args.mode, args.runs, f"sqlite:///{Path(tmp) / 'sync.db'}", f"http://127.0.0.1:{port}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    for r in results:
+        print(json.dumps(r))
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Generatore di dataset sintetici (riproducibili) per i benchmark.
+
+Riempie il DB con N anni di allenamenti "realistici": split push/pull/legs,
+catalogo esercizi con muscoli e attrezzatura, set con carichi che progrediscono
+nel tempo, qualche riscaldamento e qualche workout ignorato.
+
+Uso:
+    DATABASE_URL=sqlite:///bench.db python -m bench.dataset --sets 10000 --years 3
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+BATCH_SIZE = 5000
+
+MUSCLES = [
+    "petto", "schiena", "spalle", "addome", "bicipiti", "tricipiti",
+    "avambracci", "quadricipiti", "femorali", "glutei", "polpacci",
+]
+
+EQUIPMENT = ["bilanciere", "manubri", "macchina", "cavi", "corpo libero"]
+
+# (titolo, muscoli, attrezzatura, carico iniziale kg)
+CATALOG = [
+    ("Bench Press (Barbell)", ["petto", "tricipiti", "spalle"], ["bilanciere"], 60.0),
+    ("Incline Bench Press (Dumbbell)", ["petto", "spalle"], ["manubri"], 22.0),
+    ("Chest Fly (Cable)", ["petto"], ["cavi"], 15.0),
+    ("Overhead Press (Barbell)", ["spalle", "tricipiti"], ["bilanciere"], 40.0),
+    ("Lateral Raise (Dumbbell)", ["spalle"], ["manubri"], 8.0),
+    ("Triceps Pushdown (Cable)", ["tricipiti"], ["cavi"], 25.0),
+    ("Deadlift (Barbell)", ["schiena", "femorali", "glutei"], ["bilanciere"], 100.0),
+    ("Lat Pulldown (Cable)", ["schiena", "bicipiti"], ["cavi"], 50.0),
+    ("Seated Row (Machine)", ["schiena"], ["macchina"], 45.0),
+    ("Pull Up", ["schiena", "bicipiti"], ["corpo libero"], 0.0),
+    ("Bicep Curl (Dumbbell)", ["bicipiti", "avambracci"], ["manubri"], 12.0),
+    ("Hammer Curl (Dumbbell)", ["bicipiti", "avambracci"], ["manubri"], 12.0),
+    ("Squat (Barbell)", ["quadricipiti", "glutei"], ["bilanciere"], 80.0),
+    ("Leg Press (Machine)", ["quadricipiti", "glutei"], ["macchina"], 120.0),
+    ("Romanian Deadlift (Barbell)", ["femorali", "glutei"], ["bilanciere"], 70.0),
+    ("Leg Curl (Machine)", ["femorali"], ["macchina"], 35.0),
+    ("Standing Calf Raise (Machine)", ["polpacci"], ["macchina"], 60.0),
+    ("Crunch", ["addome"], ["corpo libero"], 0.0),
+    ("Plank", ["addome"], ["corpo libero"], 0.0),
+]
+
+SPLITS: Dict[str, List[str]] = {
+    "Push": [
+        "Bench Press (Barbell)", "Incline Bench Press (Dumbbell)", "Chest Fly (Cable)",
+        "Overhead Press (Barbell)", "Lateral Raise (Dumbbell)", "Triceps Pushdown (Cable)",
+    ],
+    "Pull": [
+        "Deadlift (Barbell)", "Lat Pulldown (Cable)", "Seated Row (Machine)",
+        "Pull Up", "Bicep Curl (Dumbbell)", "Hammer Curl (Dumbbell)",
+    ],
+    "Legs": [
+        "Squat (Barbell)", "Leg Press (Machine)", "Romanian Deadlift (Barbell)",
+        "Leg Curl (Machine)", "Standing Calf Raise (Machine)", "Crunch", "Plank",
+    ],
+}
+
+AVG_SETS_PER_WORKOUT = 20
+
+
+def template_id_for(title: str) -> str:
+    # id stabile e leggibile, simile a quelli Hevy (8 hex)
+    return f"{abs(hash_title(title)) & 0xFFFFFFFF:08X}"
+
+
+def hash_title(title: str) -> int:
+    # hash() di Python è randomizzato per processo: serve qualcosa di deterministico
+    h = 0
+    for ch in title:
+        h = (h * 131 + ord(ch)) & 0xFFFFFFFFFFFF
+    return h
+
+
+def clear_database(db: Session) -> None:
+    # import locali: generate_workouts() deve funzionare anche senza DB (fake_hevy)
+    from app.models import Equipment, Exercise, ExerciseSet, Muscle, SyncState, Workout, exercise_equipment, exercise_muscles
+
+    for tbl in (exercise_muscles, exercise_equipment):
+        db.execute(delete(tbl))
+    for model in (ExerciseSet, Workout, Exercise, Muscle, Equipment, SyncState):
+        db.execute(delete(model))
+    db.commit()
+
+
+def seed_catalog(db: Session) -> Dict[str, int]:
+    """Crea muscoli, attrezzatura ed esercizi. Ritorna title -> exercise.id"""
+    from app.models import Equipment, Exercise, Muscle, exercise_equipment, exercise_muscles
+
+    muscle_ids = {name: i + 1 for i, name in enumerate(MUSCLES)}
+    equipment_ids = {name: i + 1 for i, name in enumerate(EQUIPMENT)}
+
+    db.execute(insert(Muscle), [{"id": i, "name": n} for n, i in muscle_ids.items()])
+    db.execute(insert(Equipment), [{"id": i, "name": n} for n, i in equipment_ids.items()])
+
+    exercise_ids: Dict[str, int] = {}
+    ex_rows, em_rows, ee_rows = [], [], []
+    for i, (title, muscles, equipment, _) in enumerate(CATALOG, start=1):
+        exercise_ids[title] = i
+        ex_rows.append({"id": i, "exercise_title": title, "exercise_template_id": template_id_for(title)})
+        em_rows.extend({"exercise_id": i, "muscle_id": muscle_ids[m]} for m in muscles)
+        ee_rows.extend({"exercise_id": i, "equipment_id": equipment_ids[e]} for e in equipment)
+
+    db.execute(insert(Exercise), ex_rows)
+    db.execute(insert(exercise_muscles), em_rows)
+    db.execute(insert(exercise_equipment), ee_rows)
+    db.commit()
+    return exercise_ids
+
+
+def generate_workouts(sets: int, years: int = 3, seed: int = 42, end: datetime | None = None) -> Iterator[dict]:
+    """
+    Genera ~`sets` set distribuiti su `years` anni che finiscono a `end` (default: oggi),
+    come workout nel formato dell'API Hevy (/v1/workouts). Stesso seed -> stessi dati.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=365 * years)
+    base_load = {title: load for title, _, _, load in CATALOG}
+
+    n_workouts = max(1, sets // AVG_SETS_PER_WORKOUT)
+    span_s = (end - start).total_seconds()
+    split_names = list(SPLITS)
+    n_sets = 0
+
+    for wi in range(n_workouts):
+        # distribuzione uniforme nel periodo + orario serale/mattutino realistico
+        offset = span_s * (wi + rng.random()) / n_workouts
+        day = start + timedelta(seconds=offset)
+        started = day.replace(hour=rng.choice([7, 12, 18, 19, 20, 21]), minute=rng.randint(0, 59), second=0)
+        duration = rng.randint(45 * 60, 95 * 60)
+        progress = (started - start).total_seconds() / span_s  # 0..1 nel periodo
+
+        split = split_names[wi % len(split_names)]
+        variant = "A" if (wi // len(split_names)) % 2 == 0 else "B"
+
+        # set rimanenti per raggiungere il target (l'ultimo workout chiude il conto)
+        target = AVG_SETS_PER_WORKOUT if wi < n_workouts - 1 else sets - n_sets
+        order = SPLITS[split][:]
+        rng.shuffle(order)
+
+        per_ex: Dict[str, List[dict]] = {}
+        done = 0
+        while done < target:
+            for title in order:
+                if done >= target:
+                    break
+                ex_sets = per_ex.setdefault(title, [])
+                load = base_load[title]
+                warmup = not ex_sets and load >= 40 and rng.random() < 0.5
+                if load > 0:
+                    weight = load * (1.0 + 0.35 * progress) * rng.uniform(0.9, 1.05)
+                    if warmup:
+                        weight *= 0.5
+                    weight = round(weight / 2.5) * 2.5
+                else:
+                    weight = None
+                ex_sets.append({
+                    "index": len(ex_sets),
+                    "type": "warmup" if warmup else ("failure" if rng.random() < 0.05 else "normal"),
+                    "weight_kg": weight,
+                    "reps": rng.randint(10, 15) if warmup else rng.randint(4, 12),
+                    "distance_meters": None,
+                    "duration_seconds": 60 if title == "Plank" else None,
+                })
+                done += 1
+        n_sets += done
+
+        yield {
+            "id": f"bench-{wi:08d}",
+            "title": f"{split} {variant}",
+            "start_time": started.isoformat() + "Z",
+            "end_time": (started + timedelta(seconds=duration)).isoformat() + "Z",
+            "exercises": [
+                {
+                    "index": i,
+                    "title": title,
+                    "exercise_template_id": template_id_for(title),
+                    "sets": ex_sets,
+                }
+                for i, (title, ex_sets) in enumerate(per_ex.items())
+            ],
+        }
+
+
+def seed_database(db: Session, sets: int, years: int = 3, seed: int = 42, end: datetime | None = None) -> Dict[str, int]:
+    """Svuota il DB e lo riempie con generate_workouts() (insert bulk a batch)."""
+    from app.accounts import backfill_accounts
+    from app.config import TZ
+    from app.keys import workout_pk
+    from app.localtime import local_date_of
+    from app.models import DEFAULT_ACCOUNT_ID, ExerciseSet, SyncState, Workout
+    from app.set_metrics import set_metrics
+
+    rng = random.Random(seed)
+    clear_database(db)
+    backfill_accounts(db)  # l'account di default deve esistere (FK su MySQL)
+    exercise_ids = seed_catalog(db)
+
+    workout_rows: List[dict] = []
+    set_rows: List[dict] = []
+    n_workouts = n_sets = 0
+
+    def flush() -> None:
+        if workout_rows:
+            db.execute(insert(Workout), workout_rows)
+            workout_rows.clear()
+        if set_rows:
+            db.execute(insert(ExerciseSet), set_rows)
+            set_rows.clear()
+
+    for w in generate_workouts(sets, years=years, seed=seed, end=end):
+        started = datetime.fromisoformat(w["start_time"].rstrip("Z"))
+        ended = datetime.fromisoformat(w["end_time"].rstrip("Z"))
+        workout_rows.append({
+            "id": w["id"],
+            "pk": workout_pk(w["id"], started),
+            "user_id": DEFAULT_ACCOUNT_ID,
+            "title": w["title"],
+            "date": started,
+            "local_date": local_date_of(started),
+            "start_time": started,
+            "end_time": ended,
+            "duration_seconds": int((ended - started).total_seconds()),
+            "ignored": rng.random() < 0.02,
+            "raw_json": None,
+        })
+        for ex in w["exercises"]:
+            for s in ex["sets"]:
+                set_rows.append({
+                    "workout_id": w["id"],
+                    "workout_pk": workout_rows[-1]["pk"],
+                    "exercise_id": exercise_ids[ex["title"]],
+                    "user_id": DEFAULT_ACCOUNT_ID,
+                    "exercise_title": ex["title"],
+                    "exercise_template_id": ex["exercise_template_id"],
+                    "set_index": s["index"] + 1,
+                    "reps": s["reps"],
+                    "weight_kg": s["weight_kg"],
+                    "distance": s["distance_meters"],
+                    "duration_seconds": s["duration_seconds"],
+                    "set_type": s["type"],
+                    "raw_json": json.dumps(s),
+                    **set_metrics(s["weight_kg"], s["reps"], s["type"]),
+                })
+                n_sets += 1
+        n_workouts += 1
+
+        if len(set_rows) >= BATCH_SIZE:
+            flush()
+
+    flush()
+
+    # niente sync verso Hevy durante i benchmark: ultimo sync = adesso
+    db.add(SyncState(id=1, last_sync_ts=datetime.now(timezone.utc), local_tz=TZ))
+    db.commit()
+
+    return {"workouts": n_workouts, "sets": n_sets, "exercises": len(CATALOG)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Riempie il DB con dati sintetici")
+    parser.add_argument("--sets", type=int, default=10_000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from app.db import SessionLocal, init_db
+
+    init_db()
+    with SessionLocal() as db:
+        stats = seed_database(db, sets=args.sets, years=args.years, seed=args.seed)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
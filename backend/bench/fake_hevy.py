@@ -0,0 +1,194 @@
+"""
+Stand-in locale dell'API Hevy (/v1/workouts) per misurare il sync senza rete.
+
+Serve pagine generate (bench.dataset.generate_workouts) oppure registrate
+(una cartella con page_1.json, page_2.json, ... nel formato della risposta Hevy),
+con page size, latenza, tasso di errori 5xx e risposte 429 configurabili.
+
+Con --accounts N ogni chiave API "bench-<i>" (i < N) ha il suo storico (seed diverso, id
+distinti) e con --key-rps la chiave che supera quel ritmo riceve 429, come il limite per
+account dell'API vera.
+
+Uso:
+    python -m bench.fake_hevy --sets 20000 --latency-ms 80 --rate-429 0.05 --port 8765
+    python -m bench.fake_hevy --pages-dir recorded/ --port 8765
+    python -m bench.fake_hevy --accounts 100 --sets 2000 --key-rps 2 --latency-ms 80
+
+    # registra le pagine vere del proprio account (serve HEVY_API_KEY)
+    python -m bench.fake_hevy --record recorded/
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Header, Query
+from fastapi.responses import JSONResponse
+
+from bench.dataset import generate_workouts
+
+
+@dataclass
+class FakeHevyConfig:
+    sets: int = 10_000
+    years: int = 3
+    seed: int = 42
+    page_size: Optional[int] = None  # None = quello chiesto dal client
+    latency_ms: float = 0.0
+    error_rate: float = 0.0  # probabilità di 500
+    rate_429: float = 0.0  # probabilità di 429
+    retry_after: float = 0.1  # secondi suggeriti nell'header Retry-After
+    pages_dir: Optional[str] = None
+    accounts: int = 0  # >0: uno storico per chiave API "bench-<i>"
+    key_rps: float = 0.0  # richieste/s per chiave oltre le quali si risponde 429 (0 = nessun limite)
+
+
+ACCOUNT_KEY_PREFIX = "bench-"
+
+
+def account_key(i: int) -> str:
+    return f"{ACCOUNT_KEY_PREFIX}{i}"
+
+
+def create_app(cfg: FakeHevyConfig) -> FastAPI:
+    app = FastAPI(title="Fake Hevy API")
+    rng = random.Random(cfg.seed)
+    stats = {"requests": 0, "served_pages": 0, "errors_500": 0, "errors_429": 0, "key_429": 0}
+    per_account: Dict[str, List[dict]] = {}
+    last_hit: Dict[str, float] = {}
+
+    recorded: List[dict] = []
+    workouts: List[dict] = []
+    if cfg.pages_dir:
+        files = sorted(Path(cfg.pages_dir).glob("page_*.json"), key=lambda p: int(p.stem.split("_")[1]))
+        recorded = [json.loads(p.read_text()) for p in files]
+    elif not cfg.accounts:
+        # Hevy restituisce i workout dal più recente
+        workouts = list(generate_workouts(cfg.sets, years=cfg.years, seed=cfg.seed))
+        workouts.reverse()
+
+    def account_workouts(key: str) -> Optional[List[dict]]:
+        try:
+            i = int(key[len(ACCOUNT_KEY_PREFIX):]) if key.startswith(ACCOUNT_KEY_PREFIX) else -1
+        except ValueError:
+            return None
+        if not 0 <= i < cfg.accounts:
+            return None
+        rows = per_account.get(key)
+        if rows is None:
+            rows = list(generate_workouts(cfg.sets, years=cfg.years, seed=cfg.seed + i))
+            rows.reverse()
+            for w in rows:
+                w["id"] = f"{key}-{w['id']}"
+            per_account[key] = rows
+        return rows
+
+    @app.get("/v1/workouts")
+    async def list_workouts(
+        page: int = Query(1, ge=1),
+        pageSize: int = Query(10, ge=1),
+        api_key: str = Header(default="", alias="api-key"),
+    ):
+        stats["requests"] += 1
+        if cfg.key_rps:
+            now = time.monotonic()
+            # 20% di tolleranza: il jitter di rete non deve punire un client che rispetta il ritmo
+            if now - last_hit.get(api_key, 0.0) < 0.8 / cfg.key_rps:
+                stats["key_429"] += 1
+                return JSONResponse({"error": "Too Many Requests"}, status_code=429,
+                                    headers={"Retry-After": str(round(1.0 / cfg.key_rps, 3))})
+            last_hit[api_key] = now
+        if cfg.latency_ms:
+            await asyncio.sleep(cfg.latency_ms / 1000)
+
+        roll = rng.random()
+        if roll < cfg.rate_429:
+            stats["errors_429"] += 1
+            return JSONResponse({"error": "Too Many Requests"}, status_code=429,
+                                headers={"Retry-After": str(cfg.retry_after)})
+        if roll < cfg.rate_429 + cfg.error_rate:
+            stats["errors_500"] += 1
+            return JSONResponse({"error": "Internal Server Error"}, status_code=500)
+
+        stats["served_pages"] += 1
+        if recorded:
+            if page > len(recorded):
+                return {"page": page, "page_count": len(recorded), "workouts": []}
+            return recorded[page - 1]
+
+        rows = workouts
+        if cfg.accounts:
+            rows = account_workouts(api_key)
+            if rows is None:
+                return JSONResponse({"error": "Unauthorized"}, status_code=401)
+        size = cfg.page_size or pageSize
+        page_count = max(1, math.ceil(len(rows) / size))
+        chunk = rows[(page - 1) * size: page * size]
+        return {"page": page, "page_count": page_count, "workouts": chunk}
+
+    @app.get("/_stats")
+    def get_stats():
+        return stats
+
+    return app
+
+
+async def record_pages(out_dir: str) -> int:
+    """Scarica tutte le pagine dall'API vera e le salva come page_N.json"""
+    from app.config import DEFAULT_PAGE_SIZE, HEVY_BASE_URL
+    from app.hevy_client import HevyClient
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    client = HevyClient(HEVY_BASE_URL)
+    page, page_count = 1, 1
+    while page <= page_count:
+        data = await client.get("/v1/workouts", {"page": page, "pageSize": DEFAULT_PAGE_SIZE})
+        page_count = int(data.get("page_count") or data.get("pageCount") or 1)
+        (out / f"page_{page}.json").write_text(json.dumps(data, ensure_ascii=False))
+        page += 1
+    return page_count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stand-in locale dell'API Hevy")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sets", type=int, default=10_000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--page-size", type=int, default=None)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--pages-dir", default=None, help="serve pagine registrate invece di generarle")
+    parser.add_argument("--accounts", type=int, default=0, help="storici distinti per chiave bench-<i>")
+    parser.add_argument("--key-rps", type=float, default=0.0, help="429 oltre queste richieste/s per chiave")
+    parser.add_argument("--record", default=None, metavar="DIR", help="registra le pagine dell'API vera in DIR ed esce")
+    args = parser.parse_args()
+
+    if args.record:
+        n = asyncio.run(record_pages(args.record))
+        print(f"salvate {n} pagine in {args.record}")
+        return
+
+    import uvicorn
+
+    cfg = FakeHevyConfig(
+        sets=args.sets, years=args.years, seed=args.seed, page_size=args.page_size,
+        latency_ms=args.latency_ms, error_rate=args.error_rate, rate_429=args.rate_429,
+        retry_after=args.retry_after, pages_dir=args.pages_dir, accounts=args.accounts, key_rps=args.key_rps,
+    )
+    uvicorn.run(create_app(cfg), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
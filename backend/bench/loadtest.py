@@ -0,0 +1,377 @@
+"""
+Load test / soak del backend: più utenti che aprono le pagine del frontend mentre gira un sync.
+
+- DB sqlite nuovo riempito con bench.dataset, uvicorn in un sottoprocesso (come in produzione,
+  con il pool di calcolo e i thread veri) e bench.fake_hevy come stand-in dell'API Hevy
+- --users utenti virtuali: ognuno sceglie una pagina secondo il mix (PAGES, pesi come l'uso
+  reale), ne chiama gli endpoint in parallelo come il browser, poi aspetta un think time
+  esponenziale (media --think-ms)
+- ogni --sync-every secondi un POST /api/sync?force=true (full_sync contro lo stand-in, con
+  un seed diverso dal DB: il primo giro inserisce workout nuovi e invalida le cache)
+- ogni --sample-every secondi legge /metrics (pool DB, job di calcolo) e l'RSS del server
+
+Report: p50/p95/p99/max e tasso di errori per route, saturazione del pool (connessioni in uso
+rispetto a pool_size, attesa di checkout), crescita della memoria (MB/ora, regressione sui
+campioni dopo il warm-up). Con gli SLO (DEFAULT_SLO o --slo file.json) esce con codice 1 se
+uno è sforato, come bench.startup.
+
+Uso:
+    python -m bench.loadtest --sets 100000 --users 8 --duration 120 --out load.json
+    # soak: un'ora, sync ogni 5 minuti
+    python -m bench.loadtest --sets 100000 --users 4 --duration 3600 --sync-every 300
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench.bench_sync import BACKEND_DIR, _free_port, start_fake_hevy
+
+# pagina -> (peso, endpoint chiamati al caricamento). Le route sono i template (chiave del report),
+# i parametri si riempiono in _url
+PAGES: Dict[str, Tuple[int, List[str]]] = {
+    "dashboard": (30, ["/api/dashboard/summary", "/api/dashboard/calendar", "/api/workouts"]),
+    "workouts": (25, ["/api/workouts", "/api/workouts/{id}", "/api/workouts/{id}/compare"]),
+    "analysis": (15, ["/api/analysis/summary", "/api/analysis/muscle-volume", "/api/analysis/load",
+                      "/api/analysis/trends"]),
+    "records": (15, ["/api/records", "/api/records?metric=e1rm"]),
+    "exercise_detail": (15, ["/api/exercises/{template}/progress"]),
+}
+
+# p95 massimo (ms) per route e tasso di errori massimo; "*" vale per le route non elencate
+DEFAULT_SLO: Dict[str, Any] = {
+    "p95_ms": {
+        "*": 500,
+        "/api/analysis/summary": 2000,
+        "/api/analysis/muscle-volume": 2000,
+        "/api/analysis/trends": 3000,
+        "/api/analysis/load": 1000,
+    },
+    "error_rate": 0.01,
+    "rss_growth_mb_per_hour": 50,
+}
+# sotto questa finestra (dopo il warm-up) la pendenza dell'RSS è solo cache che si riempiono
+MIN_SOAK_FOR_MEMORY_S = 300
+
+
+@dataclass
+class Params:
+    today: date
+    workout_ids: List[str]
+    template_ids: List[str]
+
+
+@dataclass
+class Stats:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[str, Dict[str, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+    pages: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    samples: List[Dict[str, Any]] = field(default_factory=list)
+    syncs: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _pct(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(round(p * (len(s) - 1))))], 1)
+
+
+def _url(route: str, p: Params, rng: random.Random) -> str:
+    # stessi parametri che usano le pagine: anno corrente, ultime 4 settimane, ultimo anno
+    year = p.today.year
+    url = route.replace("{id}", rng.choice(p.workout_ids)).replace("{template}", rng.choice(p.template_ids))
+    if url.startswith("/api/dashboard/") or url == "/api/workouts":
+        query = f"year={year}"
+    elif url.startswith("/api/analysis/") and not url.endswith("/trends"):
+        query = f"from={p.today - timedelta(days=27)}&to={p.today}"
+    elif url.endswith("/progress"):
+        query = f"from={p.today.replace(year=year - 1)}&to={p.today}"
+    else:
+        return url
+    return f"{url}{'&' if '?' in url else '?'}{query}"
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    # solo Linux (/proc); altrove il report non ha la memoria
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _parse_metrics(text: str) -> Dict[str, float]:
+    """righe Prometheus del pool DB e del calcolo -> {nome{label}: valore}"""
+    out: Dict[str, float] = {}
+    for line in text.splitlines():
+        if line.startswith(("hevy_db_pool_", "hevy_compute_")) and " " in line:
+            name, _, value = line.rpartition(" ")
+            try:
+                out[name] = float(value)
+            except ValueError:
+                pass
+    return out
+
+
+async def _user(client: httpx.AsyncClient, p: Params, stats: Stats, stop: float, think_ms: float, seed: int) -> None:
+    rng = random.Random(seed)
+    names = list(PAGES)
+    weights = [PAGES[n][0] for n in names]
+
+    async def call(route: str) -> None:
+        t0 = time.perf_counter()
+        try:
+            r = await client.get(_url(route, p, rng))
+            status = str(r.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        stats.latencies[route].append((time.perf_counter() - t0) * 1000)
+        if not status.startswith("2"):
+            stats.errors[route][status] += 1
+
+    while time.perf_counter() < stop:
+        page = rng.choices(names, weights)[0]
+        stats.pages[page] += 1
+        await asyncio.gather(*(call(r) for r in PAGES[page][1]))
+        await asyncio.sleep(rng.expovariate(1000.0 / think_ms) if think_ms > 0 else 0)
+
+
+async def _syncer(client: httpx.AsyncClient, stats: Stats, stop: float, every: float) -> None:
+    while time.perf_counter() + every < stop:
+        await asyncio.sleep(every)
+        t0 = time.perf_counter()
+        try:
+            r = await client.post("/api/sync?force=true", timeout=None)
+            status = r.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        stats.syncs.append({"status": status, "seconds": round(time.perf_counter() - t0, 2)})
+
+
+async def _sampler(client: httpx.AsyncClient, pid: int, stats: Stats, stop: float, every: float, t_start: float) -> None:
+    while time.perf_counter() < stop:
+        try:
+            m = _parse_metrics((await client.get("/metrics")).text)
+        except httpx.HTTPError:
+            m = {}
+        stats.samples.append({"t": round(time.perf_counter() - t_start, 1), "rss_mb": _rss_mb(pid), **m})
+        await asyncio.sleep(every)
+
+
+async def _discover(client: httpx.AsyncClient) -> Params:
+    today = date.today()
+    workouts = (await client.get("/api/workouts", params={"year": today.year})).json()
+    if not workouts:
+        workouts = (await client.get("/api/workouts")).json()
+    exercises = (await client.get("/api/exercises")).json()
+    templates = [e["exercise_template_id"] for e in exercises if e.get("exercise_template_id")]
+    if not workouts or not templates:
+        raise RuntimeError("DB senza workout o esercizi: controlla --sets")
+    return Params(today, [w["id"] for w in workouts[:200]], templates)
+
+
+async def _load(base_url: str, pid: int, args: argparse.Namespace) -> Tuple[Stats, float]:
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.users * 4 + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        p = await _discover(client)
+        t_start = time.perf_counter()
+        stop = t_start + args.duration
+        tasks = [_user(client, p, stats, stop, args.think_ms, seed=i) for i in range(args.users)]
+        tasks.append(_sampler(client, pid, stats, stop, args.sample_every, t_start))
+        if args.sync_every > 0:
+            tasks.append(_syncer(client, stats, stop, args.sync_every))
+        await asyncio.gather(*tasks)
+        return stats, time.perf_counter() - t_start
+
+
+def _slope_per_hour(points: List[Tuple[float, float]]) -> Optional[float]:
+    # regressione lineare (MB contro secondi) -> MB/ora
+    n = len(points)
+    if n < 3:
+        return None
+    sx = sum(t for t, _ in points)
+    sy = sum(v for _, v in points)
+    sxx = sum(t * t for t, _ in points)
+    sxy = sum(t * v for t, v in points)
+    den = n * sxx - sx * sx
+    return round((n * sxy - sx * sy) / den * 3600, 1) if den else None
+
+
+def report(stats: Stats, elapsed: float, warmup_s: float, slo: Dict[str, Any]) -> Dict[str, Any]:
+    routes = {}
+    failures = []
+    p95_slo = slo.get("p95_ms", {})
+    for route in sorted(stats.latencies):
+        lat = stats.latencies[route]
+        n_err = sum(stats.errors[route].values())
+        row = {
+            "requests": len(lat),
+            "rps": round(len(lat) / elapsed, 2),
+            "p50_ms": _pct(lat, 0.50),
+            "p95_ms": _pct(lat, 0.95),
+            "p99_ms": _pct(lat, 0.99),
+            "max_ms": round(max(lat), 1),
+            "error_rate": round(n_err / len(lat), 4),
+            "errors": dict(stats.errors[route]),
+        }
+        routes[route] = row
+        budget = p95_slo.get(route.partition("?")[0], p95_slo.get(route, p95_slo.get("*")))
+        if budget is not None and row["p95_ms"] > budget:
+            failures.append(f"{route}: p95 {row['p95_ms']}ms > {budget}ms")
+        if row["error_rate"] > slo.get("error_rate", 1.0):
+            failures.append(f"{route}: errori {row['error_rate']:.2%} > {slo['error_rate']:.2%}")
+
+    samples = stats.samples
+    pool_size = max((s.get("hevy_db_pool_size", 0) for s in samples), default=0)
+    checked_out = [s.get("hevy_db_pool_checked_out", 0) for s in samples]
+    waits = [s for s in samples if "hevy_db_pool_checkout_wait_seconds_count" in s]
+    wait_mean_ms = None
+    if len(waits) >= 2:
+        dc = waits[-1]["hevy_db_pool_checkout_wait_seconds_count"] - waits[0]["hevy_db_pool_checkout_wait_seconds_count"]
+        ds = waits[-1]["hevy_db_pool_checkout_wait_seconds_sum"] - waits[0]["hevy_db_pool_checkout_wait_seconds_sum"]
+        wait_mean_ms = round(ds / dc * 1000, 3) if dc else 0.0
+    pool = {
+        "pool_size": pool_size or None,
+        "checked_out_max": max(checked_out, default=None),
+        "overflow_max": max((s.get("hevy_db_pool_overflow", 0) for s in samples), default=None),
+        # quota dei campioni col pool pieno (tutte le connessioni base in uso)
+        "saturated_share": round(sum(1 for c in checked_out if pool_size and c >= pool_size) / len(checked_out), 3)
+        if checked_out else None,
+        "checkout_wait_mean_ms": wait_mean_ms,
+        "compute_in_flight_max": max((s.get("hevy_compute_in_flight", 0) for s in samples), default=None),
+    }
+
+    rss = [(s["t"], s["rss_mb"]) for s in samples if s.get("rss_mb") is not None and s["t"] >= warmup_s]
+    memory = {
+        "rss_start_mb": round(rss[0][1], 1) if rss else None,
+        "rss_end_mb": round(rss[-1][1], 1) if rss else None,
+        "rss_max_mb": round(max(v for _, v in rss), 1) if rss else None,
+        "growth_mb_per_hour": _slope_per_hour(rss),
+        "window_s": round(rss[-1][0] - rss[0][0], 1) if rss else 0.0,
+    }
+    growth_budget = slo.get("rss_growth_mb_per_hour")
+    if (
+        growth_budget is not None
+        and memory["growth_mb_per_hour"] is not None
+        and memory["window_s"] >= MIN_SOAK_FOR_MEMORY_S
+        and memory["growth_mb_per_hour"] > growth_budget
+    ):
+        failures.append(f"memoria: +{memory['growth_mb_per_hour']} MB/h > {growth_budget} MB/h")
+
+    return {
+        "seconds": round(elapsed, 1),
+        "pages": dict(stats.pages),
+        "pages_per_s": round(sum(stats.pages.values()) / elapsed, 2),
+        "routes": routes,
+        "syncs": stats.syncs,
+        "db_pool": pool,
+        "memory": memory,
+        "slo": slo,
+        "slo_failures": failures,
+        "ok": not failures,
+        "samples": samples,
+    }
+
+
+def _print(rep: Dict[str, Any]) -> None:
+    print(f"{'route':40} {'req':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'err%':>6}")
+    for route, r in rep["routes"].items():
+        print(f"{route:40} {r['requests']:>6} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} "
+              f"{r['max_ms']:>8} {r['error_rate'] * 100:>6.2f}")
+    print(f"pagine/s: {rep['pages_per_s']} | sync: {rep['syncs']}")
+    print(f"pool DB: {rep['db_pool']}")
+    print(f"memoria: {rep['memory']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test / soak del backend con SLO")
+    parser.add_argument("--sets", type=int, default=100_000, help="set nel DB di partenza")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--users", type=int, default=8, help="utenti virtuali")
+    parser.add_argument("--duration", type=float, default=60.0, help="secondi di carico")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="pausa media tra due pagine")
+    parser.add_argument("--warmup", type=float, default=10.0, help="secondi esclusi dalla crescita di memoria")
+    parser.add_argument("--sync-every", type=float, default=30.0, help="secondi tra due sync forzati (0 = nessuno)")
+    parser.add_argument("--sync-sets", type=int, default=20_000, help="set serviti dallo stand-in")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="latenza dello stand-in")
+    parser.add_argument("--sample-every", type=float, default=2.0)
+    parser.add_argument("--slo", default=None, help="JSON con gli SLO (default DEFAULT_SLO)")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    slo = json.loads(Path(args.slo).read_text()) if args.slo else DEFAULT_SLO
+    fake_port, port = _free_port(), _free_port()
+    fake = start_fake_hevy(fake_port, ["--sets", str(args.sync_sets), "--years", str(args.years),
+                                       "--seed", "7", "--latency-ms", str(args.latency_ms)])
+    server = None
+    try:
+        with tempfile.TemporaryDirectory(prefix="hevy-load-") as tmp:
+            env = dict(
+                os.environ,
+                PYTHONPATH=str(BACKEND_DIR),
+                DATABASE_URL=f"sqlite:///{Path(tmp) / 'load.db'}",
+                HEVY_BASE_URL=f"http://127.0.0.1:{fake_port}",
+                HEVY_API_KEY=os.getenv("HEVY_API_KEY") or "bench",
+                SYNC_COOLDOWN_SECONDS="999999999",  # solo i sync del syncer, non quelli on-demand
+            )
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "bench.dataset", "--sets", str(args.sets), "--years", str(args.years)],
+                           cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+            print(f"DB: {args.sets} set in {time.perf_counter() - t0:.1f}s")
+
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+                 "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+            )
+            base_url = f"http://127.0.0.1:{port}"
+            deadline = time.time() + 120
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn terminato durante l'avvio")
+                try:
+                    if httpx.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.time() > deadline:
+                    raise RuntimeError("/ready non è diventato 200")
+                time.sleep(0.2)
+
+            stats, elapsed = asyncio.run(_load(base_url, server.pid, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        fake.terminate()
+        fake.wait()
+
+    rep = report(stats, elapsed, args.warmup, slo)
+    _print(rep)
+    if args.out:
+        Path(args.out).write_text(json.dumps(rep, indent=2))
+    if not rep["ok"]:
+        print("SLO SFORATI: " + "; ".join(rep["slo_failures"]), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Budget di avvio del backend (import + cold start fino a /ready).
+
+Misura:
+- tempo di import di app.main con `python -X importtime` (cumulativo, in ms)
+- cold start: da spawn di uvicorn al primo bind (prima risposta su /ready)
+  e fino a /ready == 200 (router caricati + DB inizializzato)
+
+Esce con codice 1 se un budget è superato; con --out scrive il report JSON
+(da allegare come artifact della CI).
+
+Uso:
+    python -m bench.startup --import-budget-ms 800 --ready-budget-ms 5000 --out startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _env(db_url: str) -> Dict[str, str]:
+    return dict(os.environ, DATABASE_URL=db_url, PYTHONPATH=str(BACKEND_DIR))
+
+
+def measure_import(db_url: str, module: str = "app.main") -> Dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=_env(db_url), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+
+    cumulative_us = None
+    heaviest: List[tuple] = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        if name == module and len(indent) <= 1:
+            cumulative_us = cum_us
+        heaviest.append((self_us, name))
+    heaviest.sort(reverse=True)
+    return {
+        "module": module,
+        "cumulative_ms": round((cumulative_us or 0) / 1000, 1),
+        "heaviest_self_ms": [{"module": n, "ms": round(us / 1000, 1)} for us, n in heaviest[:10]],
+    }
+
+
+def measure_cold_start(db_url: str, timeout_s: float = 60.0) -> Dict[str, Any]:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_env(db_url), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    bind_s = ready_s = None
+    try:
+        while time.perf_counter() - t0 < timeout_s:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn terminato durante l'avvio")
+            try:
+                resp = httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1)
+            except httpx.HTTPError:
+                time.sleep(0.01)
+                continue
+            if bind_s is None:
+                bind_s = time.perf_counter() - t0
+            if resp.status_code == 200:
+                ready_s = time.perf_counter() - t0
+                break
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    if ready_s is None:
+        raise RuntimeError(f"/ready non è diventato 200 entro {timeout_s}s")
+    return {"bind_ms": round(bind_s * 1000, 1), "ready_ms": round(ready_s * 1000, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Budget di avvio del backend")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--import-budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "800")))
+    parser.add_argument("--ready-budget-ms", type=float, default=float(os.getenv("STARTUP_READY_BUDGET_MS", "5000")))
+    parser.add_argument("--out", default=None, help="report JSON (artifact CI)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="hevy-startup-") as tmp:
+        db_url = f"sqlite:///{Path(tmp) / 'startup.db'}"
+        imports = [measure_import(db_url) for _ in range(args.runs)]
+        cold = [measure_cold_start(db_url) for _ in range(args.runs)]
+
+    import_ms = round(statistics.median(r["cumulative_ms"] for r in imports), 1)
+    bind_ms = round(statistics.median(r["bind_ms"] for r in cold), 1)
+    ready_ms = round(statistics.median(r["ready_ms"] for r in cold), 1)
+    report = {
+        "import_app_main_ms": import_ms,
+        "cold_start_bind_ms": bind_ms,
+        "cold_start_ready_ms": ready_ms,
+        "budgets": {"import_ms": args.import_budget_ms, "ready_ms": args.ready_budget_ms},
+        "heaviest_imports": imports[-1]["heaviest_self_ms"],
+        "runs": {"import": imports, "cold_start": cold},
+    }
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import app.main {import_ms}ms > budget {args.import_budget_ms}ms")
+    if ready_ms > args.ready_budget_ms:
+        failures.append(f"cold start {ready_ms}ms > budget {args.ready_budget_ms}ms")
+    report["ok"] = not failures
+
+    print(f"import app.main: {import_ms} ms | bind: {bind_ms} ms | ready: {ready_ms} ms")
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    if failures:
+        print("BUDGET SUPERATO: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 from pathlib import Path
 
@@ -47,4 +48,6 @@ def main():
     )
 
 if __name__ == "__main__":
+    # i processi di app/compute.py (spawn) rilanciano il binario PyInstaller: qui si fermano
+    multiprocessing.freeze_support()
     main()
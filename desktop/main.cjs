@@ -16,14 +16,15 @@ function sleep(ms) {
 
 async function waitForBackendHealth({ timeoutMs = 30_000, intervalMs = 300 } = {}) {
   const deadline = Date.now() + timeoutMs;
-  const url = `${BACKEND_BASE}/health`;
+  // /ready risponde 200 solo quando router e DB sono inizializzati (503 mentre il backend parte)
+  const url = `${BACKEND_BASE}/ready`;
 
   while (Date.now() < deadline) {
     try {
       const ok = await new Promise((resolve) => {
         const req = http.get(url, (res) => {
-          // qualsiasi 2xx/3xx = backend su
-          resolve(res.statusCode && res.statusCode >= 200 && res.statusCode < 400);
+          res.resume();
+          resolve(res.statusCode === 200);
         });
         req.on("error", () => resolve(false));
         req.setTimeout(1500, () => {
@@ -133,7 +134,7 @@ async function boot() {
 
   const ok = await waitForBackendHealth({ timeoutMs: 45_000, intervalMs: 350 });
   if (!ok) {
-    console.error("Backend non raggiungibile su /health:", `${BACKEND_BASE}/health`);
+    console.error("Backend non pronto su /ready:", `${BACKEND_BASE}/ready`);
     // Apriamo comunque la UI, ma almeno sai che il problema è backend/connessione
   }
 
@@ -32,7 +32,7 @@ export function POST<T>(path: string, body?: any): Promise<T> {
   }).then(handleRes);
 }
 
-import type { Workout, WorkoutType } from "./types";
+import type { SearchResult, Workout, WorkoutCompare, WorkoutType } from "./types";
 
 
 /** Workouts */
@@ -51,6 +51,26 @@ export function listWorkouts(params?: {
 }
 
 
+export function getWorkoutCompare(
+  workoutId: string,
+  params?: { by?: "title" | "type"; baseline?: number; includeIgnored?: boolean }
+) {
+  const qs = new URLSearchParams();
+  if (params?.by) qs.set("by", params.by);
+  if (params?.baseline) qs.set("baseline", String(params.baseline));
+  if (params?.includeIgnored) qs.set("includeIgnored", "true");
+
+  const query = qs.toString();
+  return GET<WorkoutCompare>(`/workouts/${encodeURIComponent(workoutId)}/compare${query ? `?${query}` : ""}`);
+}
+
+export function search(q: string, params?: { limit?: number; kinds?: SearchResult["results"][number]["kind"][] }) {
+  const qs = new URLSearchParams({ q });
+  if (params?.limit) qs.set("limit", String(params.limit));
+  if (params?.kinds?.length) qs.set("kinds", params.kinds.join(","));
+  return GET<SearchResult>(`/search?${qs.toString()}`);
+}
+
 export function getWorkoutTypes() {
   return GET<WorkoutType[]>(`/api/workout-types`);
 }
@@ -62,6 +82,14 @@ export function assignWorkoutType(workoutId: string, typeId: number | null) {
   });
 }
 
+/** Batch: più sotto-query in una richiesta (POST /api/batch); ogni risultato ha il suo status */
+export type BatchQuery = { query: string; id?: string; params?: Record<string, unknown> };
+export type BatchItem<T = unknown> = { status: number; data?: T; detail?: unknown };
+
+export function batch(queries: BatchQuery[]) {
+  return POST<{ results: Record<string, BatchItem> }>(`/batch`, { queries });
+}
+
 export function toggleIgnore(workoutId: string) {
   return POST<{ ok: boolean }>(`/ignored/${workoutId}`);
 }
@@ -72,7 +100,7 @@ export async function getWorkout(workoutId: string): Promise<Workout> {
   return r.json();
 }
 
-import type { ExerciseCatalogRow, ExerciseUpdateIn } from "./types";
+import type { ExerciseBulkIn, ExerciseBulkOut, ExerciseCatalogRow, ExerciseUpdateIn } from "./types";
 
 
 export async function listExercises(): Promise<ExerciseCatalogRow[]> {
@@ -91,6 +119,29 @@ export async function updateExercise(exerciseId: number, payload: ExerciseUpdate
   return (await res.json()) as ExerciseCatalogRow;
 }
 
+export async function bulkUpdateExercises(payload: ExerciseBulkIn): Promise<ExerciseBulkOut> {
+  const res = await fetch(`${API_BASE}/exercises:bulk`, {
+    method: "PATCH",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload),
+  });
+  if (!res.ok) throw new Error(`PATCH /exercises:bulk failed (${res.status})`);
+  return (await res.json()) as ExerciseBulkOut;
+}
+
+import type { ImportResult } from "./types";
+
+// export CSV dell'app Hevy, mandato così com'è nel body
+export async function importHevyCsv(file: Blob): Promise<ImportResult> {
+  const res = await fetch(`${API_BASE}/import/hevy-csv`, {
+    method: "POST",
+    headers: { "Content-Type": "text/csv" },
+    body: file,
+  });
+  if (!res.ok) throw new Error(`POST /import/hevy-csv failed (${res.status})`);
+  return (await res.json()) as ImportResult;
+}
+
 import type { AnalysisSummary } from "./types";
 
 
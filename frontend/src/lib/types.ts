@@ -24,6 +24,8 @@ export type WorkoutSet = {
   set_index: number;
   reps?: number | null;
   weight_kg?: number | null;
+  e1rm_kg?: number | null;
+  is_working_set?: boolean | null;
 };
 
 export type Workout = {
@@ -34,10 +36,64 @@ export type Workout = {
   ignored: boolean;
   type_id?: number | null;
 
+  // aggregati della lista light (GET /api/workouts)
+  exercises_count?: number;
+  sets_count?: number;
+  volume_kg?: number;
+
   // se il backend li include:
   sets?: WorkoutSet[];
 };
 
+/** GET /api/search */
+export type SearchHit = {
+  kind: "workout_title" | "exercise" | "muscle" | "equipment";
+  id: string;
+  label: string;
+  score: number;
+  extra: Record<string, any>;
+};
+
+export type SearchResult = {
+  q: string;
+  results: SearchHit[];
+};
+
+/** GET /api/workouts/{id}/compare */
+export type CompareSession = {
+  id: string;
+  title: string;
+  date?: string | null;
+  exercises_count: number;
+  sets_count: number;
+  volume_kg: number;
+};
+
+export type CompareStats = {
+  best_weight_kg: number;
+  best_reps: number;
+  volume_kg: number;
+  sessions: number;
+};
+
+export type ExerciseCompareRow = {
+  key: string; // template_id or normalized title
+  title: string;
+  current?: CompareStats | null;
+  baseline?: CompareStats | null;
+  delta_weight_kg: number;
+  delta_reps: number;
+  delta_volume_kg: number;
+};
+
+export type WorkoutCompare = {
+  by: "title" | "type";
+  workout: CompareSession;
+  baseline: CompareSession[];
+  baseline_volume_kg: number;
+  exercises: ExerciseCompareRow[];
+};
+
 
 export type ExerciseCatalogRow = {
   id: number;
@@ -52,6 +108,27 @@ export type ExerciseUpdateIn = {
   equipment?: string[] | null;
 };
 
+export type ExerciseBulkIn = {
+  mode?: "replace" | "add" | "remove";
+  items: Array<ExerciseUpdateIn & { id?: number; exercise_template_id?: string }>;
+};
+
+export type ExerciseBulkOut = {
+  updated: number;
+  links_added: number;
+  links_removed: number;
+  exercises: ExerciseCatalogRow[];
+};
+
+export type ImportResult = {
+  rows: number;
+  rows_invalid: number;
+  workouts_imported: number;
+  workouts_skipped: number;
+  sets_imported: number;
+  exercises_created: number;
+};
+
 export type AnalysisSummary = {
   from: string;
   to: string;
@@ -75,6 +152,7 @@ export type ExerciseProgress = {
   to: string;
   summary: {
     total_sets: number;
+    working_sets: number;
     workouts_count: number;
   };
   series: Array<{
@@ -82,6 +160,7 @@ export type ExerciseProgress = {
     workout_id: string;
     weight_kg: number | null;
     reps: number | null;
+    e1rm_kg: number | null;
     set_index: number | null;
   }>;
 };
\ No newline at end of file
@@ -16,6 +16,20 @@ type WorkoutDetail = Workout & {
     duration_seconds?: number | null;
     set_type?: string | null;
   }>;
+  // per esercizio: sessione precedente (best set + volume) e miglior e1RM di sempre
+  exercises?: Array<{
+    exercise_template_id: string;
+    exercise_title: string;
+    previous: {
+      workout_id: string;
+      date: string | null;
+      best_weight_kg: number;
+      best_reps: number;
+      volume_kg: number;
+      sets: number;
+    } | null;
+    best_e1rm_kg: number | null;
+  }>;
 };
 
 const API_BASE = (import.meta as any).env?.VITE_API_URL || "http://127.0.0.1:8000";
@@ -403,6 +417,20 @@ export function WorkoutDetailPage() {
     return orderBlocks(rawBlocksRecentVsTarget, exerciseOrder);
   }, [rawBlocksRecentVsTarget, exerciseOrder]);
 
+  // storico per esercizio dal backend (sessione precedente + miglior e1RM), nello stesso ordine delle tabelle
+  const exerciseHistory = useMemo(() => {
+    const pos = new Map<string, number>();
+    exerciseOrder.forEach((id, i) => pos.set(id, i));
+    return [...(target?.exercises ?? [])].sort((a, b) => {
+      const ai = pos.get(a.exercise_template_id);
+      const bi = pos.get(b.exercise_template_id);
+      if (ai !== undefined && bi !== undefined) return ai - bi;
+      if (ai !== undefined) return -1;
+      if (bi !== undefined) return 1;
+      return a.exercise_title.localeCompare(b.exercise_title);
+    });
+  }, [target, exerciseOrder]);
+
   const targetVol = target ? workoutTotalVolumeKg({ ...(target as any), sets: getSetsSafe(target) }) : 0;
   const prevOlderVol = prevOlder ? workoutTotalVolumeKg({ ...(prevOlder as any), sets: getSetsSafe(prevOlder) }) : 0;
   const recentVol = recent ? workoutTotalVolumeKg({ ...(recent as any), sets: getSetsSafe(recent) }) : 0;
@@ -453,6 +481,58 @@ export function WorkoutDetailPage() {
         </div>
       </section>
 
+      {/* Storico per esercizio: sessione precedente e miglior e1RM */}
+      {exerciseHistory.length > 0 && (
+        <section className="card p-5">
+          <div className="text-sm text-zinc-400">Storico esercizi</div>
+          <div className="font-semibold mt-1">Sessione precedente e miglior e1RM</div>
+
+          <div className="mt-4 overflow-auto">
+            <table className="w-full text-sm">
+              <thead className="text-zinc-400">
+                <tr className="border-b border-white/10">
+                  <th className="text-left py-3 pr-3">Esercizio</th>
+                  <th className="text-left py-3 px-3">Precedente</th>
+                  <th className="text-right py-3 px-3">Best set</th>
+                  <th className="text-right py-3 px-3">Volume</th>
+                  <th className="text-right py-3 pl-3">Best e1RM</th>
+                </tr>
+              </thead>
+              <tbody>
+                {exerciseHistory.map((ex) => (
+                  <tr key={ex.exercise_template_id} className="border-b border-white/5 hover:bg-white/5">
+                    <td className="py-3 pr-3">
+                      <Link className="font-medium hover:underline" to={`/exercises/${encodeURIComponent(ex.exercise_template_id)}`}>
+                        {ex.exercise_title}
+                      </Link>
+                    </td>
+                    <td className="py-3 px-3">
+                      {ex.previous ? (
+                        <Link className="text-zinc-300 hover:underline" to={`/workouts/${encodeURIComponent(ex.previous.workout_id)}`}>
+                          {fmtDate(ex.previous.date)}
+                        </Link>
+                      ) : (
+                        <span className="text-zinc-500">prima volta</span>
+                      )}
+                      {ex.previous && <div className="text-xs text-zinc-500">{ex.previous.sets} sets</div>}
+                    </td>
+                    <td className="py-3 px-3 text-right">
+                      <SetCell variant="prev" w={ex.previous?.best_weight_kg ?? null} r={ex.previous?.best_reps ?? null} />
+                    </td>
+                    <td className="py-3 px-3 text-right">
+                      {ex.previous ? `${Math.round(ex.previous.volume_kg).toLocaleString()} kg` : "—"}
+                    </td>
+                    <td className="py-3 pl-3 text-right font-semibold">
+                      {ex.best_e1rm_kg != null ? `${Math.round(ex.best_e1rm_kg * 10) / 10} kg` : "—"}
+                    </td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        </section>
+      )}
+
       {/* ORDER CONTROLS */}
       <section className="card p-5">
         <div className="flex flex-col gap-3 sm:flex-row sm:items-end sm:justify-between">
@@ -1,26 +1,15 @@
 import { useMemo, useState } from "react";
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
-import { listWorkouts, toggleIgnore } from "../lib/api";
-import type { Workout } from "../lib/types";
-import { compareWorkouts, workoutTotalVolumeKg } from "../lib/workoutCompare";
+import { getWorkoutCompare, listWorkouts, toggleIgnore } from "../lib/api";
+import type { Workout, WorkoutCompare } from "../lib/types";
 import { Link } from "react-router-dom";
 
 type Props = {
   title?: string;
 };
 
-type WorkoutDetail = Workout & {
-  sets?: Array<{
-    exercise_title?: string | null;
-    weight_kg?: number | null;
-    reps?: number | null;
-    distance_meters?: number | null;
-    duration_seconds?: number | null;
-    set_type?: string | null;
-  }>;
-};
-
-const API_BASE = (import.meta as any).env?.VITE_API_URL || "http://127.0.0.1:8000";
+// confronto con la sessione precedente o con la media delle ultime N
+const BASELINE_OPTIONS = [1, 3, 5];
 
 function fmtDate(iso?: string | null) {
   if (!iso) return "—";
@@ -55,32 +44,6 @@ function Delta({ v, suffix = "" }: { v: number; suffix?: string }) {
   );
 }
 
-async function getWorkoutDetail(workoutId: string): Promise<WorkoutDetail> {
-  const res = await fetch(`${API_BASE}/api/workouts/${encodeURIComponent(workoutId)}`);
-  if (!res.ok) {
-    const txt = await res.text().catch(() => "");
-    throw new Error(`GET /api/workouts/${workoutId} failed (${res.status}) ${txt}`);
-  }
-  return (await res.json()) as WorkoutDetail;
-}
-
-function getSetsSafe(workout: any) {
-  const s = workout?.sets ?? workout?.exercise_sets ?? workout?.exerciseSets ?? [];
-  return Array.isArray(s) ? s : [];
-}
-
-function uniqueExercisesCount(workout: any) {
-  const sets = getSetsSafe(workout);
-  const titles = sets.map((x: any) => String(x?.exercise_title ?? "")).filter(Boolean);
-  return new Set(titles).size;
-}
-
-function volumeSafe(workout: any) {
-  if (!workout) return 0;
-  const w = { ...workout, sets: getSetsSafe(workout) } as Workout;
-  return workoutTotalVolumeKg(w);
-}
-
 function titleOf(w: Workout) {
   return (w.title || "").trim() || "Senza titolo";
 }
@@ -90,6 +53,7 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
 
   const [includeIgnored, setIncludeIgnored] = useState(false);
   const [titleFilter, setTitleFilter] = useState<string>("all");
+  const [baselineN, setBaselineN] = useState<number>(1);
 
   // 1) lista light
   const workoutsQ = useQuery<Workout[], Error>({
@@ -122,36 +86,21 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
   const lastLight = filtered[0] ?? null;
   const prevLight = filtered[1] ?? null;
 
-  // 4) detail per last/prev
-  const lastDetailQ = useQuery<WorkoutDetail, Error>({
-    queryKey: ["workout-detail", lastLight?.id],
-    queryFn: () => getWorkoutDetail(lastLight!.id),
-    enabled: !!lastLight?.id,
-  });
-
-  const prevDetailQ = useQuery<WorkoutDetail, Error>({
-    queryKey: ["workout-detail", prevLight?.id],
-    queryFn: () => getWorkoutDetail(prevLight!.id),
-    enabled: !!prevLight?.id,
+  // 4) confronto calcolato dal backend: ultimo vs precedente (o media ultime N) dello stesso titolo
+  const allView = effectiveTitleFilter === "all";
+  const compareQ = useQuery<WorkoutCompare, Error>({
+    queryKey: ["workout-compare", lastLight?.id, includeIgnored, baselineN],
+    queryFn: () => getWorkoutCompare(lastLight!.id, { by: "title", baseline: baselineN, includeIgnored }),
+    enabled: !!lastLight?.id && !allView,
   });
 
-  const last = lastDetailQ.data ?? null;
-  const prev = prevDetailQ.data ?? null;
-
-  // 5) confronto
-  const [compareError, rows] = useMemo(() => {
-    if (!last || !prev) return [null, []] as const;
-    try {
-      const wl = { ...(last as any), sets: getSetsSafe(last) } as Workout;
-      const wp = { ...(prev as any), sets: getSetsSafe(prev) } as Workout;
-      return [null, compareWorkouts(wl, wp)] as const;
-    } catch (e) {
-      return [e instanceof Error ? e.message : String(e), []] as const;
-    }
-  }, [last, prev]);
+  // in "Tutti" le card mostrano gli ultimi due allenamenti: bastano gli aggregati della lista light
+  const last = allView ? lastLight : compareQ.data?.workout ?? null;
+  const prev = allView ? prevLight : compareQ.data?.baseline[0] ?? null;
+  const rows = compareQ.data?.exercises ?? [];
 
-  const lastVol = volumeSafe(last);
-  const prevVol = volumeSafe(prev);
+  const lastVol = last?.volume_kg ?? 0;
+  const prevVol = prev?.volume_kg ?? 0;
 
   const ignoreMut = useMutation<void, Error, string, { snapshots: Array<[readonly unknown[], unknown]> }>(
     {
@@ -212,11 +161,12 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
         await qc.invalidateQueries({ queryKey: ["workouts"] });
         await qc.invalidateQueries({ queryKey: ["dashboard"] });
         await qc.invalidateQueries({ queryKey: ["workout-detail"] });
+        await qc.invalidateQueries({ queryKey: ["workout-compare"] });
       },
     }
   );
 
-  const loadingTop = workoutsQ.isLoading || lastDetailQ.isLoading || prevDetailQ.isLoading;
+  const loadingTop = workoutsQ.isLoading || (!allView && compareQ.isLoading);
 
   return (
     <div className="space-y-6">
@@ -232,9 +182,9 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
               Errore lista: {(workoutsQ.error as Error).message}
             </div>
           )}
-          {(lastDetailQ.isError || prevDetailQ.isError) && (
+          {compareQ.isError && (
             <div className="text-sm text-rose-300 mt-2">
-              Errore dettaglio: {(lastDetailQ.error as any)?.message || (prevDetailQ.error as any)?.message}
+              Errore confronto: {compareQ.error.message}
             </div>
           )}
         </div>
@@ -255,6 +205,19 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
             ))}
           </select>
 
+          <select
+            className="btn"
+            value={baselineN}
+            onChange={(e) => setBaselineN(Number(e.target.value))}
+            title="Confronta con la sessione precedente o con la media delle ultime N"
+          >
+            {BASELINE_OPTIONS.map((n) => (
+              <option key={n} value={n}>
+                {n === 1 ? "vs precedente" : `vs media ultime ${n}`}
+              </option>
+            ))}
+          </select>
+
           <button
             className={`btn ${includeIgnored ? "bg-white/10" : ""}`}
             onClick={() => setIncludeIgnored((v) => !v)}
@@ -294,8 +257,8 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
           </div>
 
           <div className="mt-4 flex gap-2 flex-wrap items-center">
-            <span className="pill">Sets: {last ? getSetsSafe(last).length : "—"}</span>
-            <span className="pill">Esercizi: {last ? uniqueExercisesCount(last) : "—"}</span>
+            <span className="pill">Sets: {last?.sets_count ?? "—"}</span>
+            <span className="pill">Esercizi: {last?.exercises_count ?? "—"}</span>
             <span className="pill bg-sky-500/15 text-sky-200 border border-sky-400/20">
               Durata: {fmtDur(lastLight?.duration_seconds)}
             </span>
@@ -340,17 +303,19 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
           </div>
 
           <div className="mt-4 flex gap-2 flex-wrap items-center">
-            <span className="pill">Sets: {prev ? getSetsSafe(prev).length : "—"}</span>
-            <span className="pill">Esercizi: {prev ? uniqueExercisesCount(prev) : "—"}</span>
+            <span className="pill">Sets: {prev?.sets_count ?? "—"}</span>
+            <span className="pill">Esercizi: {prev?.exercises_count ?? "—"}</span>
             <span className="pill bg-sky-500/15 text-sky-200 border border-sky-400/20">
               Durata: {fmtDur(prevLight?.duration_seconds)}
             </span>
           </div>
 
           <div className="mt-4 pt-4 border-t border-white/10 flex items-center justify-between gap-3">
-            <div className="text-sm text-zinc-400">Delta volume vs ultimo</div>
+            <div className="text-sm text-zinc-400">
+              {baselineN === 1 || allView ? "Delta volume vs ultimo" : `Ultimo vs media ultime ${compareQ.data?.baseline.length ?? baselineN}`}
+            </div>
             <div className="text-sm">
-              <Delta v={lastVol - prevVol} suffix=" kg" />
+              <Delta v={baselineN === 1 || allView ? lastVol - prevVol : lastVol - (compareQ.data?.baseline_volume_kg ?? 0)} suffix=" kg" />
             </div>
           </div>
         </div>
@@ -375,11 +340,7 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
             Questo tipo ha meno di 2 allenamenti. Scegline uno che ne abbia almeno 2.
           </div>
         ) : loadingTop ? (
-          <div className="mt-6 text-zinc-500">Carico dettagli dei due workout…</div>
-        ) : compareError ? (
-          <div className="mt-6 text-rose-300 text-sm">
-            compareWorkouts ha crashato: <span className="text-zinc-200">{compareError}</span>
-          </div>
+          <div className="mt-6 text-zinc-500">Carico il confronto…</div>
         ) : rows.length === 0 ? (
           <div className="mt-6 text-zinc-500">
             Tabella vuota: significa che dai dettagli non stanno arrivando set validi (o exercise_title vuoto).
@@ -391,7 +352,7 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
                 <tr className="border-b border-white/10">
                   <th className="text-left py-3 pr-3">Esercizio</th>
                   <th className="text-right py-3 px-3">Ultimo best</th>
-                  <th className="text-right py-3 px-3">Prec. best</th>
+                  <th className="text-right py-3 px-3">{baselineN === 1 ? "Prec. best" : `Media ${baselineN} best`}</th>
                   <th className="text-right py-3 px-3">Δ kg</th>
                   <th className="text-right py-3 px-3">Δ reps</th>
                   <th className="text-right py-3 pl-3">Δ volume</th>
@@ -402,22 +363,22 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
                  <tr
   key={r.key}
   className={`border-b border-white/5 hover:bg-white/5 ${
-    r.deltaW > 0 ? "bg-emerald-500/5" : ""
+    r.delta_weight_kg > 0 ? "bg-emerald-500/5" : ""
   }`}
 >
                     <td className="py-3 pr-3">
                       <div className="font-medium">{r.title}</div>
                       <div className="text-xs text-zinc-500">
-                        Ultimo vol: {Math.round(r.last?.volume ?? 0).toLocaleString()} • Prec:{" "}
-                        {Math.round(r.prev?.volume ?? 0).toLocaleString()}
+                        Ultimo vol: {Math.round(r.current?.volume_kg ?? 0).toLocaleString()} • Prec:{" "}
+                        {Math.round(r.baseline?.volume_kg ?? 0).toLocaleString()}
                       </div>
                     </td>
                    <td className="py-3 px-3 text-right">
   <BestSetCell
     label=""
     variant="last"
-    w={r.last?.bestW ?? null}
-    r={r.last?.bestR ?? null}
+    w={r.current?.best_weight_kg ?? null}
+    r={r.current?.best_reps ?? null}
   />
 </td>
 
@@ -425,13 +386,13 @@ export function WorkoutsPage({ title = "Allenamenti" }: Props) {
   <BestSetCell
     label=""
     variant="prev"
-    w={r.prev?.bestW ?? null}
-    r={r.prev?.bestR ?? null}
+    w={r.baseline?.best_weight_kg ?? null}
+    r={r.baseline?.best_reps ?? null}
   />
 </td>
-                    <td className="py-3 px-3 text-right"><Delta v={r.deltaW} /></td>
-                    <td className="py-3 px-3 text-right"><Delta v={r.deltaR} /></td>
-                    <td className="py-3 pl-3 text-right"><Delta v={r.deltaV} suffix=" kg" /></td>
+                    <td className="py-3 px-3 text-right"><Delta v={r.delta_weight_kg} /></td>
+                    <td className="py-3 px-3 text-right"><Delta v={r.delta_reps} /></td>
+                    <td className="py-3 pl-3 text-right"><Delta v={r.delta_volume_kg} suffix=" kg" /></td>
                   </tr>
                 ))}
               </tbody>